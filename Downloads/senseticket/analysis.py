@@ -11,6 +11,7 @@ from sklearn.cluster import KMeans
 from sklearn.preprocessing import StandardScaler
 from models.database import db_manager, Message, AIResponse, Action
 from sqlalchemy import desc
+from sqlalchemy.orm import aliased
 
 def get_all_conversations_v2():
     """Retrieve all user messages from V2 database"""
@@ -114,197 +115,864 @@ def perform_clustering(n_clusters=3):
         'feature_names': features.columns.tolist()
     }
 
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+from core.config import SMART_INDEX_DIR, SMART_INDEX_SAVE_INTERVAL
+import numpy as np
+import scipy.sparse as sp
+import hashlib
+import json
+import re
+import shutil
+import threading
 import time
 
-# Global Cache
-_SMART_CACHE = {
-    'matrix': None,
-    'vectorizer': None,
-    'conversations': [],
-    'last_count': 0,
-    'last_update': 0
-}
-
-# Global Cache for AI Responses
-_RESPONSE_CACHE = {
-    'matrix': None,
-    'vectorizer': None,
-    'pairs': [], # List of (request_content, response_content)
-    'last_count': 0,
-    'last_update': 0
-}
-
-def find_smart_context(query, limit=3, threshold=0.2):
+# Hashed feature space for the smart context index (1-3 grams)
+SMART_INDEX_FEATURES = 2 ** 20
+SMART_INDEX_NGRAMS = (1, 3)
+SMART_INDEX_TOKEN_PATTERN = r'\b\w+\b'
+
+# Bump when the on-disk layout or vectorizer settings change
+SMART_INDEX_FORMAT = 3
+
+# Posting segments kept before they are merged back into one
+MAX_POSTING_SEGMENTS = 8
+
+
+def smart_vectorizer(n_features=SMART_INDEX_FEATURES):
     """
-    Find most relevant past conversations using TF-IDF cosine similarity.
+    Stateless 1-3 gram term counter shared by the context index and the
+    response cache (handlers/response_cache.py)
     """
-    global _SMART_CACHE
-    
-    session = db_manager.get_session()
-    try:
-        current_count = session.query(Message).count()
-    finally:
-        session.close()
-        
-    time_since_update = time.time() - _SMART_CACHE['last_update']
-    
-    should_reload = (
-        _SMART_CACHE['matrix'] is None or 
-        (current_count > _SMART_CACHE['last_count'] and time_since_update > 30) or
-        time_since_update > 300
+    return HashingVectorizer(
+        n_features=n_features,
+        ngram_range=SMART_INDEX_NGRAMS,
+        lowercase=True,
+        analyzer='word',
+        token_pattern=SMART_INDEX_TOKEN_PATTERN,
+        alternate_sign=False,
+        norm=None
     )
-    
-    if should_reload:
-        # print(f"🔄 Reloading Smart Memory (Count: {current_count})")
-        conversations = get_all_conversations_v2()
-        
-        valid_convs = [
-            c for c in conversations 
-            if c['content'] and len(c['content']) > 5 and not c['content'].startswith('!')
-        ]
-        
-        if not valid_convs:
-            return []
-        
-        corpus = [c['content'] for c in valid_convs]
-        
-        vectorizer = TfidfVectorizer(
-            stop_words=None,
-            min_df=1,
-            ngram_range=(1, 3),
-            max_features=20000,
-            lowercase=True,
-            analyzer='word',
-            token_pattern=r'\b\w+\b'
-        )
-        
+
+
+def top_k_scores(matrix, query_vec, k, threshold=0.0):
+    """
+    Best k rows of an L2-normalized CSR matrix for an L2-normalized query.
+
+    Scores come from one sparse dot product, so rows sharing no term with
+    the query are never materialized. Rows under threshold are masked out,
+    np.argpartition picks the k best survivors in O(n) and only those k
+    are sorted.
+
+    Returns (row_indices, scores), best first
+    """
+    if k <= 0 or matrix.shape[0] == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+    hits = (matrix @ query_vec.T).tocsc()
+    rows, scores = hits.indices, hits.data
+
+    keep = scores >= threshold
+    rows, scores = rows[keep], scores[keep]
+
+    if scores.size > k:
+        best = np.argpartition(scores, -k)[-k:]
+        rows, scores = rows[best], scores[best]
+
+    order = np.argsort(-scores, kind='stable')
+    return rows[order], scores[order]
+
+
+def is_indexable(content):
+    """Messages worth keeping as retrieval context"""
+    return bool(content) and len(content) > 5 and not content.startswith('!')
+
+
+class PostingIndex:
+    """
+    Inverted index (term -> rows) over the weighted TF-IDF rows.
+
+    Each segment is a CSC matrix covering a contiguous block of rows, so a
+    column is a posting list sorted by row, plus the largest weight in every
+    column. New rows are added as small segments; once there are more than
+    MAX_POSTING_SEGMENTS the owner rebuilds a single segment.
+
+    Instances are never modified after construction, so a search can keep
+    using the one it started with while the owner swaps in a new one.
+    """
+    def __init__(self, segments=()):
+        self.segments = tuple(segments)  # (row_offset, csc_matrix, column_max)
+
+    @staticmethod
+    def _segment(row_offset, matrix):
+        csc = matrix.tocsc()
+        csc.sort_indices()
+        column_max = csc.max(axis=0).toarray().ravel().astype(np.float32)
+        return row_offset, csc, column_max
+
+    @classmethod
+    def from_matrix(cls, matrix):
+        return cls([cls._segment(0, matrix)] if matrix.shape[0] else [])
+
+    def appended(self, row_offset, matrix):
+        """New index with matrix added as a segment starting at row_offset"""
+        return PostingIndex(self.segments + (self._segment(row_offset, matrix),))
+
+    @property
+    def needs_merge(self):
+        return len(self.segments) > MAX_POSTING_SEGMENTS
+
+    def search(self, query_vec, k, threshold=0.0, row_labels=None, label=None):
+        """
+        Top-k rows for an L2-normalized query using MaxScore pruning.
+
+        Query terms are visited in order of their score upper bound
+        (query weight x largest weight in the posting list). While unseen
+        rows could still reach the current k-th best score, a term's whole
+        posting list is merged into the candidates; after that, later terms
+        only look up existing candidates with a binary search, and
+        candidates that can no longer reach the cut-off are dropped. Work
+        is proportional to the postings actually touched, not corpus size.
+
+        If row_labels is given, only rows whose label equals label are
+        considered (used to scope a guild index to one channel).
+
+        Returns (row_indices, scores), best first
+        """
+        empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+        if k <= 0 or query_vec.nnz == 0:
+            return empty
+
+        terms = query_vec.indices
+        weights = query_vec.data.astype(np.float32)
+        tolerance = 1e-6
+
+        found_rows, found_scores = [], []
+        cutoff = threshold
+
+        for row_offset, csc, column_max in self.segments:
+            upper = weights * column_max[terms]
+            order = np.argsort(-upper, kind='stable')
+            seg_terms, seg_weights, seg_upper = terms[order], weights[order], upper[order]
+            # Upper bound contributed by the terms after position i
+            rest_after = np.append(np.cumsum(seg_upper[::-1])[::-1][1:], 0.0)
+
+            def posting(i):
+                start, end = csc.indptr[seg_terms[i]], csc.indptr[seg_terms[i] + 1]
+                rows, scores = csc.indices[start:end], csc.data[start:end] * seg_weights[i]
+                if row_labels is not None:
+                    keep = row_labels[rows + row_offset] == label
+                    rows, scores = rows[keep], scores[keep]
+                return rows, scores
+
+            # Essential terms: unseen rows could still make the cut, so whole
+            # posting lists are scattered into an accumulator. A running top-k
+            # pool gives the cut-off without re-sorting all candidates.
+            scores_acc = None
+            touched = []
+            pool = np.empty(0, dtype=np.int64)
+            i = 0
+            while (i < seg_terms.size and seg_upper[i] > 0
+                   and seg_upper[i] + rest_after[i] >= cutoff - tolerance):
+                post_rows, post_scores = posting(i)
+                if scores_acc is None:
+                    scores_acc = np.zeros(csc.shape[0], dtype=np.float32)
+                # Rows are unique within a posting list, so fancy-index add is exact
+                scores_acc[post_rows] += post_scores
+                touched.append(post_rows)
+
+                if post_rows.size:
+                    pos = np.minimum(np.searchsorted(post_rows, pool), post_rows.size - 1)
+                    pool = np.concatenate([pool[post_rows[pos] != pool], post_rows])
+                if pool.size >= k:
+                    pool_scores = scores_acc[pool]
+                    best = np.argpartition(pool_scores, -k)[-k:]
+                    pool = pool[best]
+                    cutoff = max(cutoff, float(pool_scores[best].min()))
+                i += 1
+
+            if scores_acc is None:
+                continue
+
+            floor = cutoff - rest_after[i - 1] - tolerance
+            touched_total = sum(rows.size for rows in touched)
+            if touched_total * 8 > scores_acc.size:
+                # Postings cover much of the segment: one vectorized scan of the
+                # accumulator is cheaper than de-duplicating them
+                cand_rows = np.flatnonzero(scores_acc >= max(floor, tolerance))
+            else:
+                cand_rows = np.unique(np.concatenate(touched)) if len(touched) > 1 else touched[0]
+                cand_rows = cand_rows[scores_acc[cand_rows] >= floor]
+            cand_scores = scores_acc[cand_rows]
+
+            # Non-essential terms: only existing candidates can gain, found
+            # with a binary search into the (row-sorted) posting list
+            for j in range(i, seg_terms.size):
+                if seg_upper[j] <= 0 or cand_rows.size == 0:
+                    break
+                post_rows, post_scores = posting(j)
+                if post_rows.size:
+                    pos = np.minimum(np.searchsorted(post_rows, cand_rows), post_rows.size - 1)
+                    hit = post_rows[pos] == cand_rows
+                    cand_scores[hit] += post_scores[pos[hit]]
+
+                if cand_scores.size >= k:
+                    cutoff = max(cutoff, float(np.partition(cand_scores, -k)[-k]))
+                keep = cand_scores + rest_after[j] >= cutoff - tolerance
+                cand_rows, cand_scores = cand_rows[keep], cand_scores[keep]
+
+            keep = cand_scores >= threshold
+            found_rows.append(cand_rows[keep].astype(np.int64) + row_offset)
+            found_scores.append(cand_scores[keep])
+
+        if not found_rows:
+            return empty
+
+        rows = np.concatenate(found_rows)
+        scores = np.concatenate(found_scores)
+        if scores.size > k:
+            best = np.argpartition(scores, -k)[-k:]
+            rows, scores = rows[best], scores[best]
+
+        order = np.argsort(-scores, kind='stable')
+        return rows[order], scores[order]
+
+
+class SmartContextIndex:
+    """
+    Incremental TF-IDF retrieval index over member messages of one guild
+    (or of every guild when guild_id is None).
+
+    Term counts come from a stateless HashingVectorizer, so new messages can
+    be vectorized without refitting a vocabulary. Document frequencies are
+    kept as running totals (online IDF); only messages with
+    id > last_indexed_id are fetched and appended. Rows are re-weighted with
+    the current IDF once the corpus has grown by reweight_growth.
+    Every row also records its channel so a search can be narrowed to one
+    channel without a separate index.
+    """
+    def __init__(self, db=None, n_features=SMART_INDEX_FEATURES,
+                 refresh_interval=10, reweight_growth=0.1, fetch_batch=20000,
+                 storage_dir=None, save_interval=SMART_INDEX_SAVE_INTERVAL, guild_id=None):
+        self.db = db or db_manager
+        self.guild_id = guild_id
+        self.n_features = n_features
+        self.storage_dir = storage_dir
+        self.save_interval = save_interval
+        self.refresh_interval = refresh_interval
+        self.reweight_growth = reweight_growth
+        self.fetch_batch = fetch_batch
+
+        self.vectorizer = smart_vectorizer(n_features)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Drop everything; the next update() rebuilds from the database"""
+        self.counts = sp.csr_matrix((0, self.n_features), dtype=np.float32)  # raw term counts
+        self.matrix = self.counts                                           # L2-normalized TF-IDF rows
+        self.postings = PostingIndex()                                       # term -> rows
+        self.row_ids = np.empty(0, dtype=np.int64)                           # row -> Message.id
+        self.row_channels = np.empty(0, dtype=np.int32)                      # row -> channel code
+        self.channels = []                                                   # channel code -> channel_id
+        self.channel_codes = {}
+        self.df = np.zeros(self.n_features, dtype=np.int64)
+        self.idf = np.ones(self.n_features, dtype=np.float32)
+        self.last_indexed_id = 0
+        self.docs_at_reweight = 0
+        self.last_update = 0
+        self.last_save = time.time()
+        self.dirty = False
+        self.load_attempted = False
+
+    @property
+    def n_docs(self):
+        return self.counts.shape[0]
+
+    def _fetch_new_rows(self, after_id):
+        """Next chunk of member messages above the high-water mark"""
+        session = self.db.get_session()
+        try:
+            query = session.query(Message.id, Message.content, Message.channel_id).filter(
+                Message.id > after_id,
+                Message.is_bot == False
+            )
+            if self.guild_id is not None:
+                query = query.filter(Message.guild_id == self.guild_id)
+            return query.order_by(Message.id).limit(self.fetch_batch).all()
+        finally:
+            session.close()
+
+    def _channel_code(self, channel_id):
+        code = self.channel_codes.get(channel_id)
+        if code is None:
+            code = len(self.channels)
+            self.channels.append(channel_id)
+            self.channel_codes[channel_id] = code
+        return code
+
+    def _compute_idf(self):
+        # Same smoothing as TfidfVectorizer(smooth_idf=True)
+        n = self.n_docs
+        return (np.log((1 + n) / (1 + self.df)) + 1).astype(np.float32)
+
+    def _weight(self, counts):
+        weighted = normalize(counts @ sp.diags(self.idf), norm='l2', copy=False)
+        # Keep the same sorted layout as counts so both can share indices on disk
+        weighted.sort_indices()
+        return weighted
+
+    def update(self, force=False):
+        """
+        Index messages added since the last call
+        Returns the number of new rows indexed
+        """
+        if not force and time.time() - self.last_update < self.refresh_interval:
+            return 0
+
+        with self._lock:
+            added = 0
+            last_id = self.last_indexed_id
+
+            while True:
+                rows = self._fetch_new_rows(last_id)
+                if not rows:
+                    break
+                # Advance past filtered-out messages too
+                last_id = rows[-1].id
+
+                valid = [(r.id, r.content, self._channel_code(r.channel_id))
+                         for r in rows if is_indexable(r.content)]
+                if valid:
+                    ids, corpus, channel_codes = zip(*valid)
+                    new_counts = self.vectorizer.transform(corpus).astype(np.float32)
+                    new_counts.sum_duplicates()
+                    new_counts.sort_indices()
+
+                    self.df += np.bincount(new_counts.indices, minlength=self.n_features)
+                    self.counts = sp.vstack([self.counts, new_counts], format='csr')
+                    self.row_ids = np.concatenate([self.row_ids, np.asarray(ids, dtype=np.int64)])
+                    self.row_channels = np.concatenate([self.row_channels, np.asarray(channel_codes, dtype=np.int32)])
+                    added += len(ids)
+
+                if len(rows) < self.fetch_batch:
+                    break
+
+            if added:
+                grown = self.n_docs - self.docs_at_reweight
+                if self.docs_at_reweight == 0 or grown > self.docs_at_reweight * self.reweight_growth:
+                    # IDF drifted enough: re-weight every row from the stored counts
+                    self.idf = self._compute_idf()
+                    self.matrix = self._weight(self.counts)
+                    self.postings = PostingIndex.from_matrix(self.matrix)
+                    self.docs_at_reweight = self.n_docs
+                else:
+                    # Weight only the new rows with the current IDF
+                    offset = self.n_docs - added
+                    tail = self._weight(self.counts[offset:])
+                    self.matrix = sp.vstack([self.matrix, tail], format='csr')
+                    self.postings = self.postings.appended(offset, tail)
+                    if self.postings.needs_merge:
+                        self.postings = PostingIndex.from_matrix(self.matrix)
+
+            self.last_indexed_id = last_id
+            self.last_update = time.time()
+            self.dirty = self.dirty or added > 0
+
+            if self.dirty and self.storage_dir and time.time() - self.last_save > self.save_interval:
+                self._save_locked()
+
+            return added
+
+    # ----- persistence -----
+    #
+    # <storage_dir>/CURRENT names the active snapshot directory, which holds:
+    #   meta.json                      format version, vectorizer params, high-water mark
+    #   indptr.npy / indices.npy       CSR structure shared by counts and matrix
+    #   counts.npy / matrix.npy        raw term counts and L2-normalized TF-IDF values
+    #   row_ids.npy / df.npy / idf.npy row -> Message.id, document frequencies, IDF
+    #   row_channels.npy               row -> channel code (codes listed in meta.json)
+    #   post_*.npy                     posting lists (CSC of matrix) and per-term max weight
+    # Snapshots are written to a fresh directory and CURRENT is swapped
+    # atomically, so a crash mid-save never leaves a half-written index.
+
+    def _params(self):
+        return {
+            'format': SMART_INDEX_FORMAT,
+            'n_features': self.n_features,
+            'ngram_range': list(SMART_INDEX_NGRAMS),
+            'token_pattern': SMART_INDEX_TOKEN_PATTERN
+        }
+
+    def save(self):
+        """Write a snapshot to storage_dir"""
+        with self._lock:
+            self._save_locked()
+
+    def _save_locked(self):
+        if not self.storage_dir:
+            return
+
+        os.makedirs(self.storage_dir, exist_ok=True)
+        name = f"v{SMART_INDEX_FORMAT}-{self.last_indexed_id}-{int(time.time() * 1000)}"
+        target = os.path.join(self.storage_dir, name)
+        os.makedirs(target)
+
+        counts, matrix = self.counts, self.matrix
+        assert counts.nnz == matrix.nnz, "counts and matrix must share structure"
+
+        np.save(os.path.join(target, 'indptr.npy'), counts.indptr)
+        np.save(os.path.join(target, 'indices.npy'), counts.indices)
+        np.save(os.path.join(target, 'counts.npy'), counts.data)
+        np.save(os.path.join(target, 'matrix.npy'), matrix.data)
+        np.save(os.path.join(target, 'row_ids.npy'), self.row_ids)
+        np.save(os.path.join(target, 'row_channels.npy'), self.row_channels)
+        np.save(os.path.join(target, 'df.npy'), self.df)
+        np.save(os.path.join(target, 'idf.npy'), self.idf)
+
+        if len(self.postings.segments) != 1:
+            self.postings = PostingIndex.from_matrix(matrix)
+        if self.postings.segments:
+            _, csc, column_max = self.postings.segments[0]
+            np.save(os.path.join(target, 'post_indptr.npy'), csc.indptr)
+            np.save(os.path.join(target, 'post_indices.npy'), csc.indices)
+            np.save(os.path.join(target, 'post_data.npy'), csc.data)
+            np.save(os.path.join(target, 'post_max.npy'), column_max)
+
+        meta = dict(self._params(),
+                    guild_id=self.guild_id,
+                    channels=self.channels,
+                    n_docs=self.n_docs,
+                    last_indexed_id=int(self.last_indexed_id),
+                    docs_at_reweight=int(self.docs_at_reweight),
+                    saved_at=time.time())
+        with open(os.path.join(target, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+
+        pointer = os.path.join(self.storage_dir, 'CURRENT')
+        with open(pointer + '.tmp', 'w') as f:
+            f.write(name)
+        os.replace(pointer + '.tmp', pointer)
+
+        # Remove older snapshots (ignore failures, e.g. still mapped on Windows)
+        for entry in os.listdir(self.storage_dir):
+            path = os.path.join(self.storage_dir, entry)
+            if entry != name and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+
+        self.last_save = time.time()
+        self.dirty = False
+
+    def load(self):
+        """
+        Memory-map the latest snapshot from storage_dir
+        Returns False (leaving the index empty) if there is no compatible snapshot
+        """
+        self.load_attempted = True
+        if not self.storage_dir:
+            return False
+
+        try:
+            with open(os.path.join(self.storage_dir, 'CURRENT')) as f:
+                target = os.path.join(self.storage_dir, f.read().strip())
+            with open(os.path.join(target, 'meta.json')) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return False
+
+        if any(meta.get(k) != v for k, v in self._params().items()):
+            print("⚠️ Smart index snapshot is from another format, rebuilding")
+            return False
+
+        def mapped(name):
+            return np.load(os.path.join(target, name), mmap_mode='r')
+
         try:
-            tfidf_matrix = vectorizer.fit_transform(corpus)
-            
-            _SMART_CACHE['matrix'] = tfidf_matrix
-            _SMART_CACHE['vectorizer'] = vectorizer
-            _SMART_CACHE['conversations'] = valid_convs
-            _SMART_CACHE['last_count'] = current_count
-            _SMART_CACHE['last_update'] = time.time()
-            
-        except Exception as e:
-            print(f"Error training smart model: {e}")
+            indptr, indices = mapped('indptr.npy'), mapped('indices.npy')
+            shape = (meta['n_docs'], self.n_features)
+            counts = sp.csr_matrix((mapped('counts.npy'), indices, indptr), shape=shape, copy=False)
+            matrix = sp.csr_matrix((mapped('matrix.npy'), indices, indptr), shape=shape, copy=False)
+            row_ids = mapped('row_ids.npy')
+            row_channels = mapped('row_channels.npy')
+            # df/idf are updated in place by update(), so keep them in memory
+            df = np.array(mapped('df.npy'))
+            idf = np.array(mapped('idf.npy'))
+
+            postings = PostingIndex()
+            if meta['n_docs']:
+                csc = sp.csc_matrix(
+                    (mapped('post_data.npy'), mapped('post_indices.npy'), mapped('post_indptr.npy')),
+                    shape=shape, copy=False
+                )
+                postings = PostingIndex([(0, csc, mapped('post_max.npy'))])
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Could not load smart index snapshot: {e}")
+            return False
+
+        with self._lock:
+            self.counts, self.matrix, self.postings = counts, matrix, postings
+            self.row_ids, self.df, self.idf = row_ids, df, idf
+            self.row_channels = row_channels
+            self.channels = list(meta['channels'])
+            self.channel_codes = {channel: code for code, channel in enumerate(self.channels)}
+            self.last_indexed_id = meta['last_indexed_id']
+            self.docs_at_reweight = meta['docs_at_reweight']
+            self.last_update = 0
+            self.last_save = time.time()
+            self.dirty = False
+        return True
+
+    def ensure_loaded(self):
+        """Load the on-disk snapshot once per process"""
+        if not self.load_attempted:
+            self.load()
+
+    def _hydrate(self, message_ids):
+        """Load result rows for the given message ids"""
+        session = self.db.get_session()
+        try:
+            rows = session.query(
+                Message.id, Message.author_id, Message.channel_id,
+                Message.content, Message.timestamp
+            ).filter(Message.id.in_(message_ids)).all()
+        finally:
+            session.close()
+        return {r.id: r for r in rows}
+
+    def search(self, query, limit=3, threshold=0.2, channel_id=None):
+        """
+        Top matches for query as dicts (user_id, channel_id, content,
+        category, timestamp, score), best first, unique by content.
+        Pass channel_id to only match messages from that channel.
+        """
+        # Postings first: row arrays are replaced after them, so they always cover them
+        postings, row_ids, idf = self.postings, self.row_ids, self.idf
+        row_channels, label = None, None
+        if channel_id is not None:
+            label = self.channel_codes.get(str(channel_id))
+            if label is None:
+                return []
+            row_channels = self.row_channels
+        if not postings.segments:
             return []
-    
-    try:
-        if _SMART_CACHE['matrix'] is None:
+
+        query_vec = self.vectorizer.transform([query]).astype(np.float32)
+        query_vec = normalize(query_vec @ sp.diags(idf), norm='l2')
+
+        # Over-fetch so duplicate contents can be skipped
+        rows, scores = postings.search(query_vec, limit * 4, threshold,
+                                       row_labels=row_channels, label=label)
+        if rows.size == 0:
             return []
-            
-        vectorizer = _SMART_CACHE['vectorizer']
-        tfidf_matrix = _SMART_CACHE['matrix']
-        valid_convs = _SMART_CACHE['conversations']
-        
-        query_vec = vectorizer.transform([query])
-        cosine_sim = cosine_similarity(query_vec, tfidf_matrix)
-        sim_scores = cosine_sim.flatten()
-        related_indices = sim_scores.argsort()[::-1]
-        
+        found = self._hydrate([int(row_ids[i]) for i in rows])
+
         results = []
         seen_content = set()
-        
-        for idx in related_indices:
-            score = sim_scores[idx]
-            if score < threshold:
-                break
-                
-            match = valid_convs[idx]
-            if match['content'] not in seen_content:
-                match['score'] = float(score)
-                results.append(match)
-                seen_content.add(match['content'])
-                
+        for idx, score in zip(rows, scores):
+            msg = found.get(int(row_ids[idx]))
+            if msg is None or msg.content in seen_content:
+                continue
+            results.append({
+                'user_id': msg.author_id,
+                'channel_id': msg.channel_id,
+                'content': msg.content,
+                'category': 'General',
+                'timestamp': msg.timestamp,
+                'score': float(score)
+            })
+            seen_content.add(msg.content)
             if len(results) >= limit:
                 break
-                
+
+        return results
+
+
+class ScopedContextIndex:
+    """
+    Retrieval partitioned by guild: one SmartContextIndex per guild_id, each
+    with its own high-water mark, snapshot directory and IDF statistics, so
+    partitions update and rebuild independently. Queries start in the
+    narrowest scope (channel, then guild) and widen to every guild while
+    there are fewer than min_results hits.
+    """
+    def __init__(self, db=None, storage_dir=None, discover_interval=300, **index_options):
+        self.db = db or db_manager
+        self.storage_dir = storage_dir
+        self.discover_interval = discover_interval
+        self.index_options = index_options
+        self.partitions = {}
+        self.last_discover = 0
+        self._lock = threading.Lock()
+
+    def _partition_dir(self, guild_id):
+        if not self.storage_dir:
+            return None
+        name = guild_id if re.fullmatch(r'[\w-]+', guild_id) else hashlib.sha1(guild_id.encode()).hexdigest()
+        return os.path.join(self.storage_dir, f'guild-{name}')
+
+    def partition(self, guild_id):
+        """The index for one guild, created (and loaded from disk) on first use"""
+        guild_id = str(guild_id)
+        with self._lock:
+            index = self.partitions.get(guild_id)
+            if index is None:
+                index = SmartContextIndex(
+                    db=self.db,
+                    storage_dir=self._partition_dir(guild_id),
+                    guild_id=guild_id,
+                    **self.index_options
+                )
+                self.partitions[guild_id] = index
+        index.ensure_loaded()
+        return index
+
+    def discover(self, force=False):
+        """Create partitions for guilds that appeared in the database"""
+        if not force and time.time() - self.last_discover < self.discover_interval:
+            return
+        session = self.db.get_session()
+        try:
+            guild_ids = [row[0] for row in session.query(Message.guild_id).distinct()]
+        finally:
+            session.close()
+        for guild_id in guild_ids:
+            self.partition(guild_id)
+        self.last_discover = time.time()
+
+    def _search_guild(self, query, limit, threshold, guild_id, channel_id=None):
+        index = self.partition(guild_id)
+        index.update()
+        return index.search(query, limit=limit, threshold=threshold, channel_id=channel_id)
+
+    def _search_all(self, query, limit, threshold, exclude=None):
+        self.discover()
+        hits = []
+        for guild_id in list(self.partitions):
+            if guild_id == exclude:
+                continue
+            hits.extend(self._search_guild(query, limit, threshold, guild_id))
+        hits.sort(key=lambda hit: hit['score'], reverse=True)
+        return hits
+
+    def search(self, query, limit=3, threshold=0.2, guild_id=None, channel_id=None, min_results=3):
+        """
+        Best matches, narrowest scope first. Hits from a wider scope are only
+        appended when the narrower ones number fewer than min_results.
+        """
+        scopes = []
+        if guild_id is not None:
+            if channel_id is not None:
+                scopes.append((str(guild_id), str(channel_id)))
+            scopes.append((str(guild_id), None))
+        scopes.append((None, None))
+
+        results = []
+        seen_content = set()
+        for scope_guild, scope_channel in scopes:
+            if scope_guild is None:
+                # The guild itself was already searched in the previous scope
+                hits = self._search_all(query, limit, threshold, exclude=scopes[0][0])
+            else:
+                hits = self._search_guild(query, limit, threshold, scope_guild, scope_channel)
+
+            for hit in hits:
+                if hit['content'] not in seen_content and len(results) < limit:
+                    results.append(hit)
+                    seen_content.add(hit['content'])
+
+            if len(results) >= min(min_results, limit):
+                break
+
         return results
-        
+
+    def save(self):
+        """Persist every partition that changed since its last save"""
+        for index in list(self.partitions.values()):
+            if index.dirty:
+                index.save()
+
+    def clear(self, guild_id=None):
+        """Reset one partition (or all); they rebuild from the database on next use"""
+        targets = [self.partitions.get(str(guild_id))] if guild_id is not None else list(self.partitions.values())
+        for index in targets:
+            if index is None:
+                continue
+            with index._lock:
+                index.reset()
+                # Skip the snapshot too, otherwise the next query would just reload it
+                index.load_attempted = True
+
+
+class ResponsePairStore:
+    """
+    Past (request, response) AI pairs, searchable by request text, used to
+    answer when the AI API is down.
+
+    Pairs are read with one joined query that selects only the two message
+    contents, and only for AIResponse.id above the high-water mark, so
+    new pairs are appended without refitting anything (term counts come
+    from the hashing vectorizer, IDF from running document frequencies).
+    Feedback scores change after a pair is stored, so they are re-read
+    with a light id/score query every feedback_interval seconds.
+    """
+    def __init__(self, db=None, n_features=SMART_INDEX_FEATURES, refresh_interval=10,
+                 feedback_interval=300, feedback_weight=0.1, fetch_batch=20000):
+        self.db = db or db_manager
+        self.n_features = n_features
+        self.refresh_interval = refresh_interval
+        self.feedback_interval = feedback_interval
+        self.feedback_weight = feedback_weight
+        self.fetch_batch = fetch_batch
+
+        self.vectorizer = smart_vectorizer(n_features)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Drop everything; the next update() rebuilds from the database"""
+        self.counts = sp.csr_matrix((0, self.n_features), dtype=np.float32)
+        self.matrix = self.counts
+        self.df = np.zeros(self.n_features, dtype=np.int64)
+        self.idf = np.ones(self.n_features, dtype=np.float32)
+        self.pair_ids = np.empty(0, dtype=np.int64)         # row -> AIResponse.id
+        self.feedback = np.empty(0, dtype=np.float32)       # row -> feedback_score
+        self.responses = []                                 # row -> response content
+        self.last_pair_id = 0
+        self.last_update = 0
+        self.last_feedback_update = time.time()
+
+    def _fetch_new_pairs(self, after_id):
+        Request = aliased(Message)
+        Response = aliased(Message)
+        session = self.db.get_session()
+        try:
+            return session.query(
+                AIResponse.id,
+                AIResponse.feedback_score,
+                Request.content.label('request'),
+                Response.content.label('response')
+            ).join(
+                Request, AIResponse.request_message_id == Request.id
+            ).join(
+                Response, AIResponse.response_message_id == Response.id
+            ).filter(
+                AIResponse.id > after_id
+            ).order_by(AIResponse.id).limit(self.fetch_batch).all()
+        finally:
+            session.close()
+
+    def _refresh_feedback(self):
+        session = self.db.get_session()
+        try:
+            scores = dict(session.query(AIResponse.id, AIResponse.feedback_score).filter(
+                AIResponse.id <= self.last_pair_id
+            ).all())
+        finally:
+            session.close()
+        self.feedback = np.asarray([scores.get(int(i)) or 0 for i in self.pair_ids], dtype=np.float32)
+        self.last_feedback_update = time.time()
+
+    def update(self, force=False):
+        """
+        Append pairs stored since the last call
+        Returns the number of new pairs
+        """
+        if not force and time.time() - self.last_update < self.refresh_interval:
+            return 0
+
+        with self._lock:
+            added = 0
+            while True:
+                rows = self._fetch_new_pairs(self.last_pair_id)
+                if not rows:
+                    break
+                self.last_pair_id = rows[-1].id
+
+                new_counts = self.vectorizer.transform([r.request for r in rows]).astype(np.float32)
+                new_counts.sum_duplicates()
+                self.df += np.bincount(new_counts.indices, minlength=self.n_features)
+                self.counts = sp.vstack([self.counts, new_counts], format='csr')
+                self.pair_ids = np.concatenate([self.pair_ids, [r.id for r in rows]]).astype(np.int64)
+                self.feedback = np.concatenate([self.feedback, [r.feedback_score or 0 for r in rows]]).astype(np.float32)
+                self.responses.extend(r.response for r in rows)
+                added += len(rows)
+
+                if len(rows) < self.fetch_batch:
+                    break
+
+            if added:
+                # Same smoothing as TfidfVectorizer(smooth_idf=True); the pair
+                # corpus is small, so every row is re-weighted with the new IDF
+                n = self.counts.shape[0]
+                self.idf = (np.log((1 + n) / (1 + self.df)) + 1).astype(np.float32)
+                self.matrix = normalize(self.counts @ sp.diags(self.idf), norm='l2', copy=False)
+            if time.time() - self.last_feedback_update > self.feedback_interval:
+                self._refresh_feedback()
+
+            self.last_update = time.time()
+            return added
+
+    def search(self, query, threshold=0.5, candidates=10):
+        """
+        Response of the best pair whose request is at least threshold
+        similar to query; among those, higher feedback ranks higher
+        """
+        matrix, idf, feedback, responses = self.matrix, self.idf, self.feedback, self.responses
+        if matrix.shape[0] == 0:
+            return None
+
+        query_vec = normalize(self.vectorizer.transform([query]).astype(np.float32) @ sp.diags(idf), norm='l2')
+        rows, scores = top_k_scores(matrix, query_vec, candidates, threshold)
+        if rows.size == 0:
+            return None
+
+        # Feedback scales the ranking, never the relevance threshold
+        weights = np.clip(1 + self.feedback_weight * feedback[rows], 0.5, 1.5)
+        return responses[int(rows[int(np.argmax(scores * weights))])]
+
+
+# Global index, partitioned by guild
+_SMART_INDEX = ScopedContextIndex(storage_dir=SMART_INDEX_DIR)
+
+# Past AI answers, served when the AI API is down
+_RESPONSE_PAIRS = ResponsePairStore()
+
+def find_smart_context(query, limit=3, threshold=0.2, guild_id=None, channel_id=None, min_results=3):
+    """
+    Find most relevant past conversations using TF-IDF cosine similarity.
+    Searches the channel, then the guild, then every guild until at least
+    min_results matches are found.
+    """
+    try:
+        return _SMART_INDEX.search(
+            query, limit=limit, threshold=threshold,
+            guild_id=guild_id, channel_id=channel_id, min_results=min_results
+        )
     except Exception as e:
         print(f"Error in smart context search: {e}")
         return []
 
+def save_smart_index():
+    """Persist smart context partitions that changed since the last save"""
+    _SMART_INDEX.save()
+
+def clear_cache(guild_id=None):
+    """Drop in-memory retrieval state; it is rebuilt on the next query"""
+    _SMART_INDEX.clear(guild_id)
+    _RESPONSE_PAIRS.reset()
+
 def find_best_cached_response(query: str, threshold: float = 0.5) -> str:
     """
     Find the best matching response from past successful AI interactions.
     Used when the AI API is down.
     """
-    global _RESPONSE_CACHE
-    
-    session = db_manager.get_session()
     try:
-        current_count = session.query(AIResponse).count()
-        
-        time_since_update = time.time() - _RESPONSE_CACHE['last_update']
-        should_reload = (
-            _RESPONSE_CACHE['matrix'] is None or 
-            (current_count > _RESPONSE_CACHE['last_count'] and time_since_update > 60)
-        )
-        
-        if should_reload:
-            # Fetch successful AI pairs
-            # Join AIResponse with Message (request) and Message (response)
-            ai_pairs = session.query(AIResponse).all()
-            
-            valid_pairs = []
-            for pair in ai_pairs:
-                if pair.request_message and pair.response_message:
-                    valid_pairs.append({
-                        'request': pair.request_message.content,
-                        'response': pair.response_message.content
-                    })
-            
-            if not valid_pairs:
-                return None
-                
-            corpus = [p['request'] for p in valid_pairs]
-            
-            vectorizer = TfidfVectorizer(
-                min_df=1,
-                ngram_range=(1, 2),
-                lowercase=True
-            )
-            
-            tfidf_matrix = vectorizer.fit_transform(corpus)
-            
-            _RESPONSE_CACHE['matrix'] = tfidf_matrix
-            _RESPONSE_CACHE['vectorizer'] = vectorizer
-            _RESPONSE_CACHE['pairs'] = valid_pairs
-            _RESPONSE_CACHE['last_count'] = current_count
-            _RESPONSE_CACHE['last_update'] = time.time()
-            
+        _RESPONSE_PAIRS.update()
     except Exception as e:
         print(f"Error updating response cache: {e}")
-        return None
-    finally:
-        session.close()
-        
-    # Search
+    
     try:
-        if _RESPONSE_CACHE['matrix'] is None:
-            return None
-            
-        vectorizer = _RESPONSE_CACHE['vectorizer']
-        tfidf_matrix = _RESPONSE_CACHE['matrix']
-        pairs = _RESPONSE_CACHE['pairs']
-        
-        query_vec = vectorizer.transform([query])
-        cosine_sim = cosine_similarity(query_vec, tfidf_matrix)
-        
-        # Get best match
-        best_idx = cosine_sim.argmax()
-        best_score = cosine_sim[0, best_idx]
-        
-        if best_score >= threshold:
-            return pairs[best_idx]['response']
-            
-        return None
-        
+        return _RESPONSE_PAIRS.search(query, threshold)
     except Exception as e:
         print(f"Error searching response cache: {e}")
         return None
@@ -2,11 +2,16 @@
 # Enhanced Flask dashboard with API endpoints and control panel
 
 from flask import Flask, render_template, jsonify, request
-from models.database import db_manager, Message, AIResponse, ChannelSettings, BotStatus, Action
-from sqlalchemy import func, desc
+from models.database import db_manager, Message, AIResponse, ChannelSettings, BotStatus, Action, ServiceStatus
+from models.settings_cache import channel_settings_cache
+from models.rollups import dashboard_stats
+from sqlalchemy import desc
 from datetime import datetime, timedelta
 import analysis
 
+# service_status row holding the bot's chat activity counters
+ACTIVITY_STATUS = 'chat_activity'
+
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-here'
 
@@ -18,11 +23,12 @@ def dashboard():
     session = db_manager.get_session()
     
     try:
-        # Get statistics
-        total_messages = session.query(Message).count()
-        total_ai_responses = session.query(AIResponse).count()
+        # Get statistics (message counts come from the rollup tables)
+        rollup = dashboard_stats(session)
+        total_messages = rollup['total_messages']
+        total_ai_responses = rollup['ai_messages']
         total_actions = session.query(Action).count()
-        unique_users = session.query(func.count(func.distinct(Message.author_id))).scalar()
+        unique_users = rollup['unique_users']  # HyperLogLog estimate
         
         # Bot status
         bot_status = session.query(BotStatus).first()
@@ -32,6 +38,23 @@ def dashboard():
         else:
             is_online = False
         
+        # Component health (e.g. Gemini circuit breaker)
+        services = [{
+            'name': row.name,
+            'state': row.state,
+            'updated_at': row.updated_at.strftime('%Y-%m-%d %H:%M:%S')
+        } for row in session.query(ServiceStatus).filter(
+            ServiceStatus.name != ACTIVITY_STATUS
+        ).order_by(ServiceStatus.name).all()]
+        
+        # Chat activity published by the bot's heartbeat
+        activity_row = session.get(ServiceStatus, ACTIVITY_STATUS)
+        activity = {
+            'state': activity_row.state,
+            'count': (activity_row.details or {}).get('count', 0),
+            'per_minute': (activity_row.details or {}).get('per_minute', [])
+        } if activity_row else None
+        
         # Recent conversations (20 for initial load)
         recent_convs = session.query(Message).order_by(desc(Message.timestamp)).limit(20).all()
         
@@ -72,6 +95,8 @@ def dashboard():
         return render_template('dashboard.html', 
                              stats=stats, 
                              recent_conversations=recent_conversations,
+                             services=services,
+                             activity=activity,
                              clustering=clustering_data)
         
     finally:
@@ -90,32 +115,71 @@ def api_stats():
         today = datetime.utcnow().date()
         today_start = datetime.combine(today, datetime.min.time())
         
-        ai_messages_today = session.query(Message).filter(
-            Message.is_ai_response == True,
-            Message.timestamp >= today_start
-        ).count()
-        
-        member_messages_today = session.query(Message).filter(
-            Message.is_bot == False,
-            Message.timestamp >= today_start
-        ).count()
+        rollup = dashboard_stats(session, since=today_start)
+        ai_messages_today = rollup['ai_messages_since']
+        member_messages_today = rollup['member_messages_since']
         
         # Top channels
-        top_channels = session.query(
-            Message.channel_id,
-            func.count(Message.id).label('count')
-        ).group_by(Message.channel_id).order_by(desc('count')).limit(5).all()
+        top_channels = rollup['top_channels']
         
         # Average response length
-        avg_length = session.query(func.avg(func.length(Message.content))).filter(
-            Message.is_ai_response == True
-        ).scalar() or 0
+        avg_length = rollup['avg_response_length']
         
         return jsonify({
             'ai_messages_today': ai_messages_today,
             'member_messages_today': member_messages_today,
             'top_channels': [{'channel_id': ch[0], 'count': ch[1]} for ch in top_channels],
-            'avg_response_length': round(avg_length, 2)
+            'avg_response_length': round(float(avg_length), 2)
+        })
+        
+    finally:
+        session.close()
+
+
+@app.route('/api/discord/services')
+def api_services():
+    """
+    API endpoint for component health (circuit breaker state and counters)
+    """
+    session = db_manager.get_session()
+    
+    try:
+        rows = session.query(ServiceStatus).filter(
+            ServiceStatus.name != ACTIVITY_STATUS
+        ).order_by(ServiceStatus.name).all()
+        return jsonify({
+            'services': [{
+                'name': row.name,
+                'state': row.state,
+                'details': row.details or {},
+                'updated_at': row.updated_at.isoformat()
+            } for row in rows]
+        })
+        
+    finally:
+        session.close()
+
+
+@app.route('/api/discord/activity')
+def api_activity():
+    """
+    API endpoint for messages-per-minute series (overall and per guild)
+    """
+    session = db_manager.get_session()
+    
+    try:
+        row = session.get(ServiceStatus, ACTIVITY_STATUS)
+        if row is None:
+            return jsonify({'state': 'LOW', 'count': 0, 'per_minute': [], 'guilds': {}, 'updated_at': None})
+        
+        details = row.details or {}
+        return jsonify({
+            'state': row.state,
+            'window_minutes': details.get('window_minutes'),
+            'count': details.get('count', 0),
+            'per_minute': details.get('per_minute', []),
+            'guilds': details.get('guilds', {}),
+            'updated_at': row.updated_at.isoformat()
         })
         
     finally:
@@ -197,6 +261,8 @@ def api_toggle_ai():
             )
             session.add(settings)
         
+        # Tell the bot's settings cache to reload
+        channel_settings_cache.invalidate(session)
         session.commit()
         
         return jsonify({
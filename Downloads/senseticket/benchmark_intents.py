@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# benchmark_intents.py
+# Micro-benchmark: keyword-combo intent rules, if-chain vs compiled matcher
+#
+# Usage:
+#   python benchmark_intents.py            # 20k messages
+#   python benchmark_intents.py 100000     # custom count
+
+import random
+import sys
+import time
+sys.path.insert(0, '.')
+
+from handlers.intent_matcher import IntentMatcher
+from handlers.responses import COMMON_INTENT_RULES
+from handlers.registration_detector import STATEMENT_RULES
+
+FILLER = ['bang', 'gue', 'mau', 'tanya', 'dong', 'ini', 'itu', 'server', 'sense', 'wkwk',
+          'lah', 'sih', 'kapan', 'main', 'bareng', 'yuk', 'guys', 'ok', 'nanti', 'malam']
+
+
+def legacy_match(rules, text):
+    """Previous approach: one `in` test per keyword, rule by rule"""
+    for intent, combos in rules:
+        for combo in combos:
+            if isinstance(combo, str):
+                if combo in text:
+                    return intent
+            elif all(k in text for k in combo):
+                return intent
+    return None
+
+
+def synthetic_messages(rng, count, rules):
+    """Chat-like messages; about one in five carries a rule keyword"""
+    keywords = [k for _, combos in rules for c in combos
+                for k in ((c,) if isinstance(c, str) else c)]
+    messages = []
+    for _ in range(count):
+        words = [rng.choice(FILLER) for _ in range(rng.randint(3, 15))]
+        if rng.random() < 0.2:
+            words.insert(rng.randrange(len(words)), rng.choice(keywords))
+        messages.append(' '.join(words))
+    return messages
+
+
+def time_per_message(func, messages):
+    started = time.perf_counter()
+    for text in messages:
+        func(text)
+    return (time.perf_counter() - started) / len(messages) * 1_000_000
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    rng = random.Random(42)
+
+    print(f"{'rule set':>10} | {'if-chain us/msg':>16} | {'matcher us/msg':>15} | {'speedup':>7}")
+    print("-" * 58)
+
+    for name, rules in (('common', COMMON_INTENT_RULES), ('statement', STATEMENT_RULES)):
+        matcher = IntentMatcher(rules)
+        messages = synthetic_messages(rng, count, rules)
+
+        # Both must classify every message the same before timing anything
+        for text in messages:
+            assert matcher.match(text) == legacy_match(rules, text), text
+
+        legacy_us = time_per_message(lambda t: legacy_match(rules, t), messages)
+        matcher_us = time_per_message(matcher.match, messages)
+        print(f"{name:>10} | {legacy_us:>16.2f} | {matcher_us:>15.2f} | {legacy_us / matcher_us:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
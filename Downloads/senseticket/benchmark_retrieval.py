@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# benchmark_retrieval.py
+# Micro-benchmark: per-query latency of smart context top-k retrieval
+#
+# Usage:
+#   python benchmark_retrieval.py                 # 10k, 100k, 1M rows
+#   python benchmark_retrieval.py 10000 50000     # custom sizes
+
+import sys
+import time
+sys.path.insert(0, '.')
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
+
+from analysis import top_k_scores, PostingIndex, SMART_INDEX_FEATURES
+
+TERMS_PER_ROW = 24      # roughly a chat message with 1-3 grams
+TERMS_PER_QUERY = 12
+QUERIES = 50
+LIMIT = 10
+THRESHOLD = 0.1
+
+
+def zipf_terms(rng, size, vocab=200000):
+    """Term ids with a Zipf-like frequency distribution, like real chat text"""
+    return (rng.zipf(1.3, size=size) % vocab).astype(np.int32) * 7919 % SMART_INDEX_FEATURES
+
+
+def idf_weights(counts):
+    """Smoothed IDF, as the real index applies before normalizing"""
+    df = np.bincount(counts.indices, minlength=SMART_INDEX_FEATURES)
+    return (np.log((1 + counts.shape[0]) / (1 + df)) + 1).astype(np.float32)
+
+
+def synthetic_counts(rng, n_rows, terms_per_row):
+    indptr = np.arange(0, (n_rows + 1) * terms_per_row, terms_per_row, dtype=np.int64)
+    indices = zipf_terms(rng, n_rows * terms_per_row)
+    data = np.ones(n_rows * terms_per_row, dtype=np.float32)
+    counts = sp.csr_matrix((data, indices, indptr), shape=(n_rows, SMART_INDEX_FEATURES))
+    counts.sum_duplicates()
+    return counts
+
+
+def synthetic_matrix(rng, n_rows):
+    """L2-normalized TF-IDF rows and the IDF used to weight them"""
+    counts = synthetic_counts(rng, n_rows, TERMS_PER_ROW)
+    idf = idf_weights(counts)
+    return normalize(counts @ sp.diags(idf), norm='l2', copy=False), idf
+
+
+def synthetic_queries(rng, count, idf):
+    queries = synthetic_counts(rng, count, TERMS_PER_QUERY)
+    return normalize(queries @ sp.diags(idf), norm='l2', copy=False)
+
+
+def baseline_top_k(matrix, query_vec, k, threshold):
+    """Previous approach: dense cosine_similarity + full argsort"""
+    scores = cosine_similarity(query_vec, matrix).flatten()
+    ordered = scores.argsort()[::-1]
+    top = [i for i in ordered[:k] if scores[i] >= threshold]
+    return np.asarray(top), scores[top]
+
+
+def time_per_query(func, matrix, queries):
+    started = time.perf_counter()
+    for i in range(queries.shape[0]):
+        func(matrix, queries[i], LIMIT, THRESHOLD)
+    return (time.perf_counter() - started) / queries.shape[0] * 1000
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    rng = np.random.default_rng(42)
+
+    print(f"{'rows':>10} | {'baseline ms/query':>18} | {'top_k ms/query':>15} | {'postings ms/query':>18} | {'speedup':>7}")
+    print("-" * 81)
+
+    for n_rows in sizes:
+        matrix, idf = synthetic_matrix(rng, n_rows)
+        queries = synthetic_queries(rng, QUERIES, idf)
+        postings = PostingIndex.from_matrix(matrix)
+
+        # Both must return the same top scores before timing anything
+        _, expected = baseline_top_k(matrix, queries[0], LIMIT, THRESHOLD)
+        _, got = top_k_scores(matrix, queries[0], LIMIT, THRESHOLD)
+        _, pruned = postings.search(queries[0], LIMIT, THRESHOLD)
+        assert np.allclose(expected, got, atol=1e-5)
+        assert np.allclose(expected, pruned, atol=1e-5)
+
+        baseline_ms = time_per_query(baseline_top_k, matrix, queries)
+        top_k_ms = time_per_query(top_k_scores, matrix, queries)
+        postings_ms = time_per_query(lambda _, q, k, t: postings.search(q, k, t), matrix, queries)
+        print(f"{n_rows:>10,} | {baseline_ms:>18.2f} | {top_k_ms:>15.2f} | {postings_ms:>18.2f} | {baseline_ms / postings_ms:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
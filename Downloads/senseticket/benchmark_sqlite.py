@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# benchmark_sqlite.py
+# Benchmark: concurrent dashboard reads vs. bot writes on SQLite, default vs. tuned profile
+#
+# Usage:
+#   python benchmark_sqlite.py              # 5 second run per profile
+#   python benchmark_sqlite.py 10           # custom duration (seconds)
+
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+sys.path.insert(0, '.')
+
+from sqlalchemy import func, desc
+
+from models.database import DatabaseManager, Message
+
+SEED_ROWS = 20_000
+WRITE_BATCH = 50        # rows per ingest flush, as the logging cog writes them
+READERS = 2             # dashboard workers
+
+
+def make_rows(start, count):
+    now = datetime.utcnow()
+    return [{
+        'discord_message_id': str(start + i),
+        'guild_id': '1',
+        'channel_id': str(10 + (start + i) % 5),
+        'author_id': str(100 + (start + i) % 300),
+        'content': f"pesan nomor {start + i} lagi rame nih",
+        'timestamp': now,
+        'is_bot': False,
+        'is_ai_response': False
+    } for i in range(count)]
+
+
+def writer(url, tuned, duration, results):
+    """Bot side: batched message inserts"""
+    db = DatabaseManager(url, tune_sqlite=tuned)
+    start, batches, errors = SEED_ROWS, 0, 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        try:
+            db.insert_messages(make_rows(start, WRITE_BATCH))
+            start += WRITE_BATCH
+            batches += 1
+        except Exception:
+            errors += 1
+    results.put(('write', batches * WRITE_BATCH, errors))
+
+
+def reader(url, tuned, duration, results):
+    """Dashboard side: the statistics and recent-conversation queries of app.py"""
+    db = DatabaseManager(url, tune_sqlite=tuned)
+    reads, errors = 0, 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        session = db.get_session()
+        try:
+            session.query(Message).count()
+            session.query(func.count(func.distinct(Message.author_id))).scalar()
+            session.query(Message).order_by(desc(Message.timestamp)).limit(20).all()
+            reads += 1
+        except Exception:
+            errors += 1
+        finally:
+            session.close()
+    results.put(('read', reads, errors))
+
+
+def run(tuned, duration):
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    url = f'sqlite:///{path}'
+    db = DatabaseManager(url, tune_sqlite=tuned)
+    db.create_tables()
+    for start in range(0, SEED_ROWS, 1000):
+        db.insert_messages(make_rows(start, 1000))
+    db.engine.dispose()
+
+    results = mp.Queue()
+    workers = [mp.Process(target=writer, args=(url, tuned, duration, results))]
+    workers += [mp.Process(target=reader, args=(url, tuned, duration, results)) for _ in range(READERS)]
+    for worker in workers:
+        worker.start()
+    totals = {'write': [0, 0], 'read': [0, 0]}
+    for _ in workers:
+        kind, done, errors = results.get()
+        totals[kind][0] += done
+        totals[kind][1] += errors
+    for worker in workers:
+        worker.join()
+    return totals
+
+
+def main():
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+
+    print(f"{'profile':>8} | {'rows written/s':>14} | {'write errors':>12} | {'dashboard reads/s':>17} | {'read errors':>11}")
+    print("-" * 75)
+    for name, tuned in (('default', False), ('tuned', True)):
+        totals = run(tuned, duration)
+        writes, write_errors = totals['write']
+        reads, read_errors = totals['read']
+        print(f"{name:>8} | {writes / duration:>14,.0f} | {write_errors:>12} | {reads / duration:>17,.1f} | {read_errors:>11}")
+
+
+if __name__ == "__main__":
+    main()
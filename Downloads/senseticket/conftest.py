@@ -0,0 +1,15 @@
+# conftest.py
+# Shared pytest fixtures
+
+import pytest
+
+from models.database import DatabaseManager
+
+
+@pytest.fixture
+def tmp_db(tmp_path):
+    """Fresh SQLite database with all tables, in pytest's per-test temp directory"""
+    db = DatabaseManager(f"sqlite:///{tmp_path / 'test.db'}")
+    db.create_tables()
+    yield db
+    db.shutdown()
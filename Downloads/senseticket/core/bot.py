@@ -6,6 +6,8 @@ from discord.ext import commands
 import asyncio
 from core.config import DISCORD_BOT_TOKEN, TICKET_CATEGORY_ID
 from models.database import db_manager
+from core.compute import compute_executor
+from handlers.http_client import http_client
 
 class SenseBot(commands.Bot):
     """
@@ -26,11 +28,22 @@ class SenseBot(commands.Bot):
         
         # Initialize database
         db_manager.create_tables()
+        try:
+            # Indexes added after the tables existed (alembic, migrations/versions)
+            db_manager.upgrade_schema()
+        except Exception as e:
+            print(f"⚠️ Schema migration failed: {e}")
         
     async def setup_hook(self):
         """
         Load all cogs before bot starts
         """
+        # Worker process for retrieval, started before any cog needs it
+        compute_executor.start()
+        
+        # Pooled HTTP session reused by every Gemini call
+        await http_client.start()
+        
         print("🔄 Loading cogs...")
         
         # List of cogs to load
@@ -59,6 +72,15 @@ class SenseBot(commands.Bot):
         except Exception as e:
             print(f"❌ Failed to sync commands: {e}")
     
+    async def close(self):
+        """
+        Shut down cogs first (they flush pending writes), then the HTTP session and worker pools
+        """
+        await super().close()
+        await http_client.close()
+        compute_executor.shutdown()
+        db_manager.shutdown()
+    
     async def on_ready(self):
         """
         Bot ready event
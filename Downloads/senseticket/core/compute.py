@@ -0,0 +1,75 @@
+# core/compute.py
+# Process pool for CPU-heavy work (retrieval, clustering) off the bot loop
+
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from core.config import COMPUTE_WORKERS, COMPUTE_TIMEOUT
+
+
+def _init_worker():
+    """Import the heavy modules once per worker instead of on the first call"""
+    import analysis  # noqa: F401
+
+
+class ComputeExecutor:
+    """
+    Long-lived worker processes that hold the retrieval index in memory.
+    Calls are awaitable and bounded by a timeout, so a slow refit can delay
+    an answer but never freezes the gateway.
+
+    The bot's executor has a single worker: each worker would keep its own
+    index and prune the others' snapshots while saving, and a call such as
+    save_smart_index() lands on just one of them.
+    """
+    def __init__(self, workers=COMPUTE_WORKERS, timeout=COMPUTE_TIMEOUT, warm_up=True):
+        self.workers = workers
+        self.timeout = timeout
+        self.warm_up = warm_up
+        self._pool = None
+        self.timeouts = 0
+        self.restarts = 0
+
+    def start(self):
+        """Start the worker processes (spawned, so no event loop state is forked)"""
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker if self.warm_up else None
+            )
+
+    async def run(self, func, *args, timeout=None, **kwargs):
+        """
+        Run a picklable module-level function in a worker process
+        Raises asyncio.TimeoutError if it takes longer than timeout seconds
+        """
+        self.start()
+        loop = asyncio.get_running_loop()
+        call = partial(func, *args, **kwargs)
+
+        try:
+            future = loop.run_in_executor(self._pool, call)
+            return await asyncio.wait_for(future, timeout=timeout or self.timeout)
+        except asyncio.TimeoutError:
+            # The worker finishes the call in the background; only the wait is abandoned
+            self.timeouts += 1
+            raise
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM); replace the pool so later calls recover
+            print("⚠️ Compute worker crashed, restarting pool")
+            self.restarts += 1
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+            raise
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+
+# Singleton instance
+compute_executor = ComputeExecutor()
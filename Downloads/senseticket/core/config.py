@@ -12,7 +12,54 @@ DISCORD_BOT_TOKEN = os.getenv('DISCORD_BOT_TOKEN')
 DISCORD_GUILD_ID = os.getenv('DISCORD_GUILD_ID', '')
 
 # Database Configuration
-DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///bot_data_v2.db')
+DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///bot_data_v2.db')  # relative SQLite paths are under the project dir
+
+# Connection pool for server databases (PostgreSQL); SQLite ignores these
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 20))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 15000))
+
+# SQLite tuning applied to every connection (bot and dashboard share the file)
+SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', 64 * 1024))
+SQLITE_MAINTENANCE_SECONDS = int(os.getenv('SQLITE_MAINTENANCE_SECONDS', 600))  # wal_checkpoint + optimize
+
+# Threads used to run blocking database calls off the bot's event loop
+DB_EXECUTOR_WORKERS = int(os.getenv('DB_EXECUTOR_WORKERS', 4))
+
+# Message ingestion (write-behind queue used by the logging cog)
+INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', 100))
+INGEST_FLUSH_INTERVAL_MS = int(os.getenv('INGEST_FLUSH_INTERVAL_MS', 500))
+INGEST_MAX_QUEUE = int(os.getenv('INGEST_MAX_QUEUE', 10000))
+INGEST_MAX_RETRIES = int(os.getenv('INGEST_MAX_RETRIES', 3))  # then the batch is written row by row
+
+# Dashboard statistics rollups (models/rollups.py)
+ROLLUP_INTERVAL_SECONDS = int(os.getenv('ROLLUP_INTERVAL_SECONDS', 60))
+ROLLUP_BATCH_SIZE = int(os.getenv('ROLLUP_BATCH_SIZE', 20000))
+
+# Per-minute message counts kept in memory for "rame gak?" and the dashboard
+ACTIVITY_WINDOW_MINUTES = int(os.getenv('ACTIVITY_WINDOW_MINUTES', 60))
+
+# How often the bot checks whether the dashboard changed channel settings
+CHANNEL_SETTINGS_POLL_SECONDS = int(os.getenv('CHANNEL_SETTINGS_POLL_SECONDS', 5))
+
+# Smart context index (persisted retrieval index used by analysis.py)
+SMART_INDEX_DIR = os.getenv(
+    'SMART_INDEX_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'smart_index')
+)
+SMART_INDEX_SAVE_INTERVAL = int(os.getenv('SMART_INDEX_SAVE_INTERVAL', 300))
+
+# Compute worker process for retrieval/clustering (keeps CPU work off the bot loop)
+# Fixed at one: the worker owns the smart index and is the only writer of its
+# snapshots in SMART_INDEX_DIR, and save_smart_index() must reach that worker
+COMPUTE_WORKERS = 1
+COMPUTE_TIMEOUT = float(os.getenv('COMPUTE_TIMEOUT', 5.0))
 
 # Redis Configuration (optional, for caching)
 REDIS_URL = os.getenv('REDIS_URL', None)
@@ -34,6 +81,48 @@ REQUIRED_ROLE_NAME = "💚・Our Lovely Sense Member"
 # Gemini API Configuration
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
 GEMINI_MODEL = "gemini-2.0-flash"
+GEMINI_API_BASE = os.getenv('GEMINI_API_BASE', 'https://generativelanguage.googleapis.com/v1beta')
+
+# Ticket analysis micro-batching (several tickets per Gemini request)
+TICKET_BATCH_SIZE = int(os.getenv('TICKET_BATCH_SIZE', 8))
+TICKET_ANALYSIS_SLO_MS = int(os.getenv('TICKET_ANALYSIS_SLO_MS', 1500))  # max wait before a batch is sent anyway
+
+# Stream replies with streamGenerateContent and edit the message as text arrives
+AI_STREAMING = os.getenv('AI_STREAMING', 'false').lower() == 'true'
+AI_STREAM_EDIT_INTERVAL = float(os.getenv('AI_STREAM_EDIT_INTERVAL', 1.5))  # Discord rate-limits edits
+
+# Gemini rate limits (shared by chat replies and ticket analysis)
+GEMINI_RPM = int(os.getenv('GEMINI_RPM', 15))
+GEMINI_TPM = int(os.getenv('GEMINI_TPM', 1000000))
+GEMINI_MAX_CONCURRENCY = int(os.getenv('GEMINI_MAX_CONCURRENCY', 4))
+GEMINI_PRIORITY_RESERVE = float(os.getenv('GEMINI_PRIORITY_RESERVE', 0.2))  # headroom kept for tickets
+GEMINI_CHAT_MAX_WAIT = float(os.getenv('GEMINI_CHAT_MAX_WAIT', 2.0))
+GEMINI_TICKET_MAX_WAIT = float(os.getenv('GEMINI_TICKET_MAX_WAIT', 20.0))
+
+# Circuit breaker around Gemini (fail fast to the cached/template replies)
+BREAKER_FAILURE_RATE = float(os.getenv('BREAKER_FAILURE_RATE', 0.5))
+BREAKER_MIN_CALLS = int(os.getenv('BREAKER_MIN_CALLS', 5))
+BREAKER_WINDOW_SECONDS = float(os.getenv('BREAKER_WINDOW_SECONDS', 60))
+BREAKER_COOLDOWN_SECONDS = float(os.getenv('BREAKER_COOLDOWN_SECONDS', 30))
+BREAKER_HALF_OPEN_PROBES = int(os.getenv('BREAKER_HALF_OPEN_PROBES', 1))
+
+# Response cache in front of Gemini (handlers/response_cache.py)
+RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', 512))
+RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', 600))
+RESPONSE_CACHE_NEAR_DUPLICATES = os.getenv('RESPONSE_CACHE_NEAR_DUPLICATES', 'true').lower() == 'true'
+RESPONSE_CACHE_SIMILARITY = float(os.getenv('RESPONSE_CACHE_SIMILARITY', 0.85))
+RESPONSE_CACHE_CONTEXT_DEPTH = int(os.getenv('RESPONSE_CACHE_CONTEXT_DEPTH', 3))
+
+# Request coalescing: near-identical queries in one channel share a Gemini call
+COALESCE_WINDOW_MS = int(os.getenv('COALESCE_WINDOW_MS', 1500))
+COALESCE_SIMILARITY = float(os.getenv('COALESCE_SIMILARITY', 0.85))
+
+# Shared HTTP client (one pooled aiohttp session for the whole bot)
+HTTP_POOL_LIMIT = int(os.getenv('HTTP_POOL_LIMIT', 20))
+HTTP_KEEPALIVE_SECONDS = float(os.getenv('HTTP_KEEPALIVE_SECONDS', 60))
+HTTP_DNS_CACHE_SECONDS = int(os.getenv('HTTP_DNS_CACHE_SECONDS', 300))
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 5))
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 30))
 
 # AI Configuration
 AI_SYSTEM_PROMPT = """
@@ -0,0 +1,146 @@
+# handlers/activity_counter.py
+# Sliding-window message counters for chat activity
+
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from core.config import ACTIVITY_WINDOW_MINUTES
+from models.database import db_manager, Message
+
+HIGH_THRESHOLD = 20     # more than this many messages -> HIGH
+MEDIUM_THRESHOLD = 5    # more than this many messages -> MEDIUM
+
+
+def _epoch_minute(timestamp) -> int:
+    """Minute number since the epoch; naive datetimes are taken as UTC"""
+    if isinstance(timestamp, datetime):
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        timestamp = timestamp.timestamp()
+    return int(timestamp // 60)
+
+
+class _Ring:
+    """Fixed number of per-minute slots; a slot is reset when its minute comes round again"""
+    __slots__ = ('counts', 'minutes')
+
+    def __init__(self, size):
+        self.counts = [0] * size
+        self.minutes = [-1] * size
+
+    def add(self, minute):
+        i = minute % len(self.counts)
+        if self.minutes[i] != minute:
+            self.minutes[i] = minute
+            self.counts[i] = 0
+        self.counts[i] += 1
+
+    def series(self, now, minutes):
+        size = len(self.counts)
+        return [self.counts[m % size] if self.minutes[m % size] == m else 0
+                for m in range(now - minutes + 1, now + 1)]
+
+
+class ActivityCounter:
+    """
+    Per-minute message counts for the whole bot, each guild and each
+    channel, kept for window_minutes. Fed by the logging cog as messages
+    arrive, so "is the server busy?" never touches the database.
+    """
+    def __init__(self, window_minutes=ACTIVITY_WINDOW_MINUTES, clock=time.time):
+        self.window = window_minutes
+        self.clock = clock
+        self._rings = {}    # None (all), ('guild', id) or ('channel', id) -> _Ring
+        # Recorded on the event loop, read from DB worker threads
+        self._lock = threading.Lock()
+
+    def _keys(self, guild_id, channel_id):
+        keys = [None]
+        if guild_id is not None:
+            keys.append(('guild', str(guild_id)))
+        if channel_id is not None:
+            keys.append(('channel', str(channel_id)))
+        return keys
+
+    def _key(self, guild_id, channel_id):
+        if channel_id is not None:
+            return ('channel', str(channel_id))
+        if guild_id is not None:
+            return ('guild', str(guild_id))
+        return None
+
+    def record(self, guild_id=None, channel_id=None, timestamp=None):
+        """Count one message (timestamp defaults to now)"""
+        now = _epoch_minute(self.clock())
+        minute = now if timestamp is None else _epoch_minute(timestamp)
+        if minute <= now - self.window:
+            return
+
+        with self._lock:
+            for key in self._keys(guild_id, channel_id):
+                ring = self._rings.get(key)
+                if ring is None:
+                    ring = self._rings[key] = _Ring(self.window)
+                ring.add(minute)
+
+    def series(self, minutes=None, guild_id=None, channel_id=None) -> list:
+        """Messages per minute, oldest first, ending with the current minute"""
+        minutes = min(minutes or self.window, self.window)
+        with self._lock:
+            ring = self._rings.get(self._key(guild_id, channel_id))
+            if ring is None:
+                return [0] * minutes
+            return ring.series(_epoch_minute(self.clock()), minutes)
+
+    def count(self, minutes=15, guild_id=None, channel_id=None) -> int:
+        """Messages in the last N minutes (including the current one)"""
+        return sum(self.series(minutes, guild_id, channel_id))
+
+    def level(self, minutes=15, guild_id=None, channel_id=None) -> str:
+        """'HIGH', 'MEDIUM' or 'LOW'"""
+        count = self.count(minutes, guild_id, channel_id)
+        if count > HIGH_THRESHOLD:
+            return 'HIGH'
+        elif count > MEDIUM_THRESHOLD:
+            return 'MEDIUM'
+        return 'LOW'
+
+    def load(self, db=None) -> int:
+        """Warm the counters from the last window of logged messages (blocking)"""
+        db = db or db_manager
+        since = datetime.utcnow() - timedelta(minutes=self.window)
+        session = db.get_session()
+        try:
+            rows = session.query(
+                Message.guild_id,
+                Message.channel_id,
+                Message.timestamp
+            ).filter(
+                Message.timestamp >= since,
+                Message.is_bot == False
+            ).all()
+        finally:
+            session.close()
+
+        with self._lock:
+            self._rings = {}
+        for row in rows:
+            self.record(row.guild_id, row.channel_id, row.timestamp)
+        return len(rows)
+
+    def snapshot(self, minutes=15) -> dict:
+        """Current level and per-minute series, as stored in service_status.details"""
+        with self._lock:
+            guilds = [key[1] for key in self._rings if key and key[0] == 'guild']
+        return {
+            'state': self.level(minutes),
+            'window_minutes': minutes,
+            'count': self.count(minutes),
+            'per_minute': self.series(),
+            'guilds': {guild_id: self.series(guild_id=guild_id) for guild_id in guilds}
+        }
+
+
+# Singleton instance
+activity_counter = ActivityCounter()
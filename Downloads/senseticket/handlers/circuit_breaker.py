@@ -0,0 +1,132 @@
+# handlers/circuit_breaker.py
+# Circuit breaker so callers fail fast while an upstream API is unhealthy
+
+import time
+from collections import deque
+
+from core.config import (
+    BREAKER_FAILURE_RATE, BREAKER_MIN_CALLS, BREAKER_WINDOW_SECONDS,
+    BREAKER_COOLDOWN_SECONDS, BREAKER_HALF_OPEN_PROBES
+)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """
+    closed: calls go through; outcomes are kept for window seconds and the
+        breaker opens once at least min_calls have failed at failure_rate.
+    open: allow() returns False immediately until cooldown has passed.
+    half_open: up to half_open_probes calls are let through; one success
+        closes the breaker, one failure opens it for another cooldown.
+
+    on_state_change(breaker) is called after every transition, so the bot
+    can publish the state for the dashboard.
+    """
+    def __init__(self, name, failure_rate=BREAKER_FAILURE_RATE, min_calls=BREAKER_MIN_CALLS,
+                 window=BREAKER_WINDOW_SECONDS, cooldown=BREAKER_COOLDOWN_SECONDS,
+                 half_open_probes=BREAKER_HALF_OPEN_PROBES, clock=time.monotonic):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.cooldown = cooldown
+        self.half_open_probes = half_open_probes
+        self.clock = clock
+        self.on_state_change = None
+
+        self.state = CLOSED
+        self._outcomes = deque()  # (time, ok)
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+
+        self.short_circuited = 0
+        self.times_opened = 0
+        self.last_error = None
+        self.changed_at = time.time()
+
+    def _transition(self, state):
+        self.state = state
+        self.changed_at = time.time()
+        if state == OPEN:
+            self._opened_at = self.clock()
+            self.times_opened += 1
+        if state != CLOSED:
+            self._outcomes.clear()
+            self._failures = 0
+        self._probes = 0
+        print(f"⚡ Circuit '{self.name}' is now {state}")
+        if self.on_state_change is not None:
+            self.on_state_change(self)
+
+    def _trim(self, now):
+        while self._outcomes and now - self._outcomes[0][0] > self.window:
+            _, ok = self._outcomes.popleft()
+            if not ok:
+                self._failures -= 1
+
+    def allow(self) -> bool:
+        """True if a call may go upstream now; never blocks"""
+        if self.state == OPEN:
+            if self.clock() - self._opened_at < self.cooldown:
+                self.short_circuited += 1
+                return False
+            self._transition(HALF_OPEN)
+
+        if self.state == HALF_OPEN:
+            if self._probes >= self.half_open_probes:
+                self.short_circuited += 1
+                return False
+            self._probes += 1
+
+        return True
+
+    def record_success(self):
+        if self.state == HALF_OPEN:
+            self._transition(CLOSED)
+            return
+        self._record(True)
+
+    def record_failure(self, error=None):
+        self.last_error = str(error) if error else None
+        if self.state == HALF_OPEN:
+            self._transition(OPEN)
+            return
+        if self.state == CLOSED:
+            self._record(False)
+            calls = len(self._outcomes)
+            if calls >= self.min_calls and self._failures / calls >= self.failure_rate:
+                self._transition(OPEN)
+
+    def record_ignored(self):
+        """The allowed call never reached upstream (e.g. rate limited locally)"""
+        if self.state == HALF_OPEN and self._probes:
+            self._probes -= 1
+
+    def _record(self, ok):
+        now = self.clock()
+        self._outcomes.append((now, ok))
+        if not ok:
+            self._failures += 1
+        self._trim(now)
+
+    def snapshot(self) -> dict:
+        """State and counters, as stored in service_status.details"""
+        self._trim(self.clock())
+        calls = len(self._outcomes)
+        return {
+            'state': self.state,
+            'recent_calls': calls,
+            'recent_failure_rate': round(self._failures / calls, 3) if calls else 0.0,
+            'times_opened': self.times_opened,
+            'short_circuited': self.short_circuited,
+            'last_error': self.last_error,
+            'changed_at': self.changed_at
+        }
+
+
+# Breaker shared by every Gemini call
+gemini_breaker = CircuitBreaker('gemini')
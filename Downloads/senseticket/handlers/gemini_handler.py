@@ -1,17 +1,140 @@
 # handlers/gemini_handler.py
 # Handler for Google Gemini API interactions
 
+import asyncio
 import aiohttp
 import json
-from core.config import GEMINI_API_KEY, GEMINI_MODEL, AI_SYSTEM_PROMPT
+import time
+from core.config import GEMINI_API_KEY, GEMINI_MODEL, GEMINI_API_BASE, AI_SYSTEM_PROMPT
+from handlers.http_client import http_client
+from handlers.circuit_breaker import gemini_breaker
+from handlers.rate_limiter import rate_limiter, estimate_tokens, GeminiBusy, PRIORITY_CHAT, PRIORITY_TICKET
+from handlers.response_cache import response_cache
+from handlers.single_flight import single_flight
 
-async def generate_response(user_query: str, context_messages: list = None) -> str:
+
+def _generate_url() -> str:
+    return f"{GEMINI_API_BASE}/models/{GEMINI_MODEL}:generateContent?key={GEMINI_API_KEY}"
+
+
+def _stream_url() -> str:
+    return f"{GEMINI_API_BASE}/models/{GEMINI_MODEL}:streamGenerateContent?alt=sse&key={GEMINI_API_KEY}"
+
+
+class LatencyStats:
+    """Time to first byte and total time of Gemini calls, in milliseconds"""
+    def __init__(self):
+        self.calls = 0
+        self.last_ttfb_ms = 0.0
+        self.last_total_ms = 0.0
+        self._ttfb_sum = 0.0
+        self._total_sum = 0.0
+
+    def record(self, ttfb_ms, total_ms):
+        self.calls += 1
+        self.last_ttfb_ms = ttfb_ms
+        self.last_total_ms = total_ms
+        self._ttfb_sum += ttfb_ms
+        self._total_sum += total_ms
+
+    def stats(self) -> dict:
+        return {
+            'calls': self.calls,
+            'last_ttfb_ms': round(self.last_ttfb_ms, 1),
+            'last_total_ms': round(self.last_total_ms, 1),
+            'avg_ttfb_ms': round(self._ttfb_sum / self.calls, 1) if self.calls else 0.0,
+            'avg_total_ms': round(self._total_sum / self.calls, 1) if self.calls else 0.0
+        }
+
+
+# Blocking replies: first byte = response headers; streamed replies: first text chunk
+gemini_latency = {'generate': LatencyStats(), 'stream': LatencyStats()}
+
+
+def _record_status(status: int):
+    """Feed an HTTP status to the breaker: only 429 and 5xx mean Gemini is unhealthy"""
+    if status == 429 or status >= 500:
+        gemini_breaker.record_failure(f"HTTP {status}")
+    else:
+        gemini_breaker.record_success()
+
+
+def _record_error(error: Exception):
+    """Network errors and timeouts count against the breaker; parsing bugs do not"""
+    if isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError)):
+        gemini_breaker.record_failure(error)
+    else:
+        gemini_breaker.record_ignored()
+
+
+class _GeminiCall:
+    """
+    Breaker bookkeeping for one Gemini request, so each allowed call reports
+    exactly one outcome:
+
+        call = _GeminiCall("chat reply")
+        if not call.allowed:
+            return None
+        async with call:
+            ...
+            call.record_status(response.status)
+            ...
+        return None  # reached when the block failed (call.failed is True)
+
+    Errors inside the block are logged and swallowed. An error after the
+    status was recorded (e.g. the body read fails on a 200) does not count
+    twice, and a call that ends without a status (busy, cancelled, closed
+    stream) gives its half-open probe slot back.
+    """
+    def __init__(self, purpose: str):
+        self.purpose = purpose
+        self.recorded = False
+        self.failed = False
+        self.allowed = gemini_breaker.allow()
+        if not self.allowed:
+            print(f"[WARN] Gemini circuit open, skipping {purpose}")
+
+    def record_status(self, status: int):
+        if not self.recorded:
+            self.recorded = True
+            _record_status(status)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        outcome_pending = not self.recorded
+        self.recorded = True
+
+        if exc_type is not None and issubclass(exc_type, GeminiBusy):
+            if outcome_pending:
+                gemini_breaker.record_ignored()
+            print(f"[WARN] Gemini busy, skipping {self.purpose}")
+        elif exc_type is not None and issubclass(exc_type, Exception):
+            if outcome_pending:
+                _record_error(exc)
+            print(f"[ERROR] Gemini {self.purpose} failed: {exc}")
+        else:
+            # Success, or cancelled / closed before a status arrived
+            if outcome_pending:
+                gemini_breaker.record_ignored()
+            return False
+
+        self.failed = True
+        return True
+
+
+async def generate_response(user_query: str, context_messages: list = None, use_cache: bool = True,
+                            coalesce_scope: str = None) -> str:
     """
     Generate a response using Google Gemini API
     
     Args:
         user_query: The user's message
         context_messages: List of previous messages for context (optional)
+        use_cache: Reuse a cached reply for the same (or a near-identical) query
+        coalesce_scope: Share one upstream call with concurrent near-identical
+            queries in the same scope, e.g. a channel id (optional)
         
     Returns:
         str: The AI's response
@@ -20,8 +143,21 @@ async def generate_response(user_query: str, context_messages: list = None) -> s
         print("[ERROR] Gemini API Key is missing!")
         return None
 
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_MODEL}:generateContent?key={GEMINI_API_KEY}"
-    
+    if use_cache:
+        cached = response_cache.get(user_query, context_messages)
+        if cached:
+            return cached
+
+    if coalesce_scope is None:
+        return await _request_response(user_query, context_messages, use_cache)
+
+    return await single_flight.do(
+        coalesce_scope, user_query,
+        lambda: _request_response(user_query, context_messages, use_cache)
+    )
+
+def _chat_payload(user_query: str, context_messages: list):
+    """Prompt and request body for a chat reply"""
     # Prepare the prompt with system instructions and context
     full_prompt = AI_SYSTEM_PROMPT + "\n\n"
     
@@ -46,28 +182,124 @@ async def generate_response(user_query: str, context_messages: list = None) -> s
             "topK": 40
         }
     }
+    return full_prompt, payload
+
+async def _request_response(user_query: str, context_messages: list, use_cache: bool) -> str:
+    """One generateContent call for generate_response"""
+    url = _generate_url()
+    full_prompt, payload = _chat_payload(user_query, context_messages)
     
-    try:
-        async with aiohttp.ClientSession() as session:
+    # Circuit open: skip the call so the caller falls back right away
+    call = _GeminiCall("chat reply")
+    if not call.allowed:
+        return None
+    
+    async with call:
+        tokens = estimate_tokens(full_prompt, payload["generationConfig"]["maxOutputTokens"])
+        async with rate_limiter.limit(PRIORITY_CHAT, tokens) as permit:
+            session = await http_client.session()
+            started = time.perf_counter()
             async with session.post(url, json=payload) as response:
+                ttfb_ms = (time.perf_counter() - started) * 1000
+                call.record_status(response.status)
                 if response.status == 200:
                     data = await response.json()
+                    gemini_latency['generate'].record(ttfb_ms, (time.perf_counter() - started) * 1000)
+                    permit.record_usage(data.get('usageMetadata', {}).get('totalTokenCount'))
                     # Extract text from Gemini response
                     if 'candidates' in data and len(data['candidates']) > 0:
                         candidate = data['candidates'][0]
                         if 'content' in candidate and 'parts' in candidate['content']:
-                            text = candidate['content']['parts'][0]['text']
-                            return text.strip()
+                            text = candidate['content']['parts'][0]['text'].strip()
+                            if use_cache:
+                                response_cache.put(user_query, context_messages, text)
+                            return text
                     print(f"[DEBUG] Full API Response: {json.dumps(data)}")
                     return None
                 else:
                     error_text = await response.text()
                     print(f"[ERROR] Gemini API Error {response.status}: {error_text}")
                     return None
-                    
-    except Exception as e:
-        print(f"[ERROR] Error calling Gemini API: {e}")
-        return None
+    return None
+
+async def _sse_events(response):
+    """Decode a text/event-stream body into JSON payloads"""
+    data_lines = []
+    async for raw in response.content:
+        line = raw.decode('utf-8').rstrip('\r\n')
+        if line.startswith('data:'):
+            data_lines.append(line[5:].lstrip())
+        elif not line and data_lines:
+            yield json.loads('\n'.join(data_lines))
+            data_lines = []
+    if data_lines:
+        yield json.loads('\n'.join(data_lines))
+
+def _candidate_text(data: dict) -> str:
+    """Text of the first candidate in one (partial) Gemini response"""
+    candidates = data.get('candidates') or []
+    if not candidates:
+        return ''
+    parts = candidates[0].get('content', {}).get('parts', [])
+    return ''.join(part.get('text', '') for part in parts)
+
+async def stream_response(user_query: str, context_messages: list = None, use_cache: bool = True):
+    """
+    Stream a reply from streamGenerateContent (SSE), yielding text chunks
+    as they arrive. Yields nothing when Gemini is unavailable, so callers
+    can fall back just like when generate_response returns None.
+    
+    Use with contextlib.aclosing() so an abandoned stream releases its
+    rate limit slot.
+    """
+    if not GEMINI_API_KEY:
+        print("[ERROR] Gemini API Key is missing!")
+        return
+
+    if use_cache:
+        cached = response_cache.get(user_query, context_messages)
+        if cached:
+            yield cached
+            return
+
+    call = _GeminiCall("chat reply")
+    if not call.allowed:
+        return
+
+    url = _stream_url()
+    full_prompt, payload = _chat_payload(user_query, context_messages)
+    chunks = []
+    
+    async with call:
+        tokens = estimate_tokens(full_prompt, payload["generationConfig"]["maxOutputTokens"])
+        async with rate_limiter.limit(PRIORITY_CHAT, tokens) as permit:
+            session = await http_client.session()
+            started = time.perf_counter()
+            ttfb_ms = None
+            usage = None
+            async with session.post(url, json=payload) as response:
+                call.record_status(response.status)
+                if response.status != 200:
+                    error_text = await response.text()
+                    print(f"[ERROR] Gemini API Error {response.status}: {error_text}")
+                    return
+
+                async for data in _sse_events(response):
+                    # usageMetadata is cumulative; the last one is the total
+                    usage = data.get('usageMetadata', usage)
+                    text = _candidate_text(data)
+                    if text:
+                        if ttfb_ms is None:
+                            ttfb_ms = (time.perf_counter() - started) * 1000
+                        chunks.append(text)
+                        yield text
+
+            if ttfb_ms is not None:
+                gemini_latency['stream'].record(ttfb_ms, (time.perf_counter() - started) * 1000)
+            permit.record_usage((usage or {}).get('totalTokenCount'))
+
+    if use_cache and chunks and not call.failed:
+        response_cache.put(user_query, context_messages, ''.join(chunks).strip())
 
 async def analyze_ticket(content: str) -> dict:
     """
@@ -77,7 +309,7 @@ async def analyze_ticket(content: str) -> dict:
     if not GEMINI_API_KEY:
         return None
 
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_MODEL}:generateContent?key={GEMINI_API_KEY}"
+    url = _generate_url()
     
     system_prompt = """Analisis pesan tiket berikut dan berikan respons dalam format JSON.
     
@@ -105,11 +337,19 @@ async def analyze_ticket(content: str) -> dict:
         }
     }
     
-    try:
-        async with aiohttp.ClientSession() as session:
+    call = _GeminiCall("ticket analysis")
+    if not call.allowed:
+        return None
+    
+    async with call:
+        tokens = estimate_tokens(full_prompt, payload["generationConfig"]["maxOutputTokens"])
+        async with rate_limiter.limit(PRIORITY_TICKET, tokens) as permit:
+            session = await http_client.session()
             async with session.post(url, json=payload) as response:
+                call.record_status(response.status)
                 if response.status == 200:
                     data = await response.json()
+                    permit.record_usage(data.get('usageMetadata', {}).get('totalTokenCount'))
                     if 'candidates' in data and len(data['candidates']) > 0:
                         candidate = data['candidates'][0]
                         if 'content' in candidate and 'parts' in candidate['content']:
@@ -122,6 +362,86 @@ async def analyze_ticket(content: str) -> dict:
                 else:
                     print(f"[ERROR] Gemini Analysis Error {response.status}")
                     return None
-    except Exception as e:
-        print(f"[ERROR] Error analyzing ticket: {e}")
-        return None
+    return None
+
+async def analyze_tickets(contents: list) -> list:
+    """
+    Analyze several tickets in one Gemini request
+    Returns one dict (summary, sentiment, urgency, category) or None per
+    ticket, in the same order as contents
+    """
+    if not GEMINI_API_KEY or not contents:
+        return [None] * len(contents)
+
+    url = _generate_url()
+    
+    system_prompt = """Analisis setiap pesan tiket berikut dan berikan respons dalam format JSON.
+    
+    Kembalikan JSON array dengan tepat satu objek per tiket:
+    [
+        {
+            "id": "Nomor tiket (angka, sama seperti di input)",
+            "summary": "Ringkasan 1 kalimat tentang masalah (dalam Bahasa Indonesia)",
+            "sentiment": "Status emosional user (Frustrated/Confused/Polite/Angry)",
+            "urgency": "Tingkat urgensi (Low/Medium/High)",
+            "category": "Kategori masalah (Technical/Account/Report/General)"
+        }
+    ]
+    
+    Hanya kembalikan JSON murni, tanpa markdown atau formatting lain."""
+    
+    tickets = "\n\n".join(f"Tiket {i}:\n{content}" for i, content in enumerate(contents, start=1))
+    full_prompt = f"{system_prompt}\n\n{tickets}\n\nJSON:"
+    
+    payload = {
+        "contents": [{
+            "parts": [{
+                "text": full_prompt
+            }]
+        }],
+        "generationConfig": {
+            "temperature": 0.3,  # Low temperature for consistent analysis
+            "maxOutputTokens": 200 * len(contents),
+            "responseMimeType": "application/json"
+        }
+    }
+    
+    call = _GeminiCall("ticket analysis")
+    if not call.allowed:
+        return [None] * len(contents)
+    
+    async with call:
+        tokens = estimate_tokens(full_prompt, payload["generationConfig"]["maxOutputTokens"])
+        async with rate_limiter.limit(PRIORITY_TICKET, tokens) as permit:
+            session = await http_client.session()
+            async with session.post(url, json=payload) as response:
+                call.record_status(response.status)
+                if response.status != 200:
+                    print(f"[ERROR] Gemini Analysis Error {response.status}")
+                    return [None] * len(contents)
+                data = await response.json()
+                permit.record_usage(data.get('usageMetadata', {}).get('totalTokenCount'))
+    if call.failed:
+        return [None] * len(contents)
+
+    # Demultiplex by ticket number; anything missing or malformed stays None
+    results = [None] * len(contents)
+    try:
+        raw_content = _candidate_text(data).strip()
+        if raw_content.startswith('```json'):
+            raw_content = raw_content.replace('```json', '').replace('```', '').strip()
+        items = json.loads(raw_content)
+    except ValueError as e:
+        print(f"[ERROR] Could not parse batched ticket analysis: {e}")
+        return results
+
+    if isinstance(items, dict):
+        items = [items]
+    for item in items if isinstance(items, list) else []:
+        try:
+            index = int(item.pop('id')) - 1
+        except (TypeError, KeyError, ValueError, AttributeError):
+            continue
+        if 0 <= index < len(results):
+            results[index] = item
+    return results
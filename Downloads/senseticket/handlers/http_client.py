@@ -0,0 +1,65 @@
+# handlers/http_client.py
+# Shared pooled aiohttp session for outbound API calls
+
+import asyncio
+import aiohttp
+from core.config import (
+    HTTP_POOL_LIMIT, HTTP_KEEPALIVE_SECONDS, HTTP_DNS_CACHE_SECONDS,
+    HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT
+)
+
+
+class HttpClient:
+    """
+    One long-lived ClientSession per bot, so repeated Gemini calls reuse
+    warm keep-alive connections instead of paying DNS + TCP + TLS each time
+    """
+    def __init__(self, limit=HTTP_POOL_LIMIT, keepalive=HTTP_KEEPALIVE_SECONDS,
+                 dns_cache=HTTP_DNS_CACHE_SECONDS, connect_timeout=HTTP_CONNECT_TIMEOUT,
+                 read_timeout=HTTP_READ_TIMEOUT):
+        self.limit = limit
+        self.keepalive = keepalive
+        self.dns_cache = dns_cache
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self._session = None
+        self._loop = None
+        self.sessions_created = 0
+
+    async def start(self):
+        """Create the session (must be called inside the event loop)"""
+        loop = asyncio.get_running_loop()
+        # A session is bound to the loop that created it
+        if self._session is not None and not self._session.closed and self._loop is loop:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            keepalive_timeout=self.keepalive,
+            ttl_dns_cache=self.dns_cache,
+            use_dns_cache=True
+        )
+        timeout = aiohttp.ClientTimeout(
+            connect=self.connect_timeout,
+            sock_read=self.read_timeout
+        )
+        self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        self._loop = loop
+        self.sessions_created += 1
+
+    async def session(self) -> aiohttp.ClientSession:
+        """
+        The shared session, started on first use so scripts that never run
+        setup_hook (test_api.py, debug tools) still work
+        """
+        await self.start()
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+            self._loop = None
+
+
+# Singleton instance
+http_client = HttpClient()
@@ -0,0 +1,75 @@
+# handlers/intent_matcher.py
+# Precompiled keyword-combo intent matching in one pass over the text
+
+import re
+
+
+class IntentMatcher:
+    """
+    Rules are (intent, combos) in priority order. A combo is a keyword or a
+    tuple of keywords that must all occur as substrings of the text (the
+    same test as `all(k in text for k in combo)`); an intent matches when
+    any of its combos does.
+
+    Every keyword of every rule is compiled into one lookahead alternation
+    ordered longest first, so a single regex scan reports, at each offset,
+    the longest keyword starting there. The keywords that are prefixes of
+    it also occur at that offset, so each hit ORs in a precomputed
+    prefix-closure bitmask. Combos are then plain bitmask tests.
+    """
+    def __init__(self, rules):
+        keywords = []
+        for _, combos in rules:
+            for combo in combos:
+                for keyword in ((combo,) if isinstance(combo, str) else combo):
+                    if keyword not in keywords:
+                        keywords.append(keyword)
+
+        self.keywords = keywords
+        bit = {keyword: 1 << i for i, keyword in enumerate(keywords)}
+
+        # Keyword -> its bit plus the bits of every keyword that is a prefix of it
+        self._closure = {
+            keyword: sum(bit[other] for other in keywords if keyword.startswith(other))
+            for keyword in keywords
+        }
+
+        ordered = sorted(keywords, key=len, reverse=True)
+        self._pattern = re.compile('(?=(' + '|'.join(re.escape(k) for k in ordered) + '))')
+
+        # intent -> list of combo masks, in rule order
+        self.rules = [
+            (intent, [sum(bit[k] for k in ((combo,) if isinstance(combo, str) else combo))
+                      for combo in combos])
+            for intent, combos in rules
+        ]
+        self._rule_masks = dict(self.rules)
+
+    def scan(self, text: str) -> int:
+        """Bitmask of every keyword that occurs in text"""
+        found = 0
+        closure = self._closure
+        for keyword in self._pattern.findall(text):
+            found |= closure[keyword]
+        return found
+
+    def matched(self, found: int, intent: str) -> bool:
+        """Whether intent matches, given a mask from scan()"""
+        return any(found & mask == mask for mask in self._rule_masks[intent])
+
+    def match(self, text: str):
+        """Highest priority intent whose rule matches text, or None"""
+        found = self.scan(text)
+        if not found:
+            return None
+        for intent, masks in self.rules:
+            for mask in masks:
+                if found & mask == mask:
+                    return intent
+        return None
+
+    def matches(self, text: str) -> list:
+        """Every matching intent, in priority order"""
+        found = self.scan(text)
+        return [intent for intent, masks in self.rules
+                if any(found & mask == mask for mask in masks)]
@@ -0,0 +1,170 @@
+# handlers/rate_limiter.py
+# Shared async rate limiter for all Gemini calls
+
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+
+from core.config import (
+    GEMINI_RPM, GEMINI_TPM, GEMINI_MAX_CONCURRENCY, GEMINI_PRIORITY_RESERVE,
+    GEMINI_CHAT_MAX_WAIT, GEMINI_TICKET_MAX_WAIT
+)
+
+# Lower number wins
+PRIORITY_TICKET = 0
+PRIORITY_CHAT = 1
+
+
+class GeminiBusy(Exception):
+    """Raised when a call cannot get a slot within its wait budget"""
+
+
+def estimate_tokens(prompt: str, max_output_tokens: int) -> int:
+    """Rough prompt + completion size (about 4 characters per token)"""
+    return len(prompt) // 4 + max_output_tokens
+
+
+class _Permit:
+    __slots__ = ('limiter', 'estimated')
+
+    def __init__(self, limiter, estimated):
+        self.limiter = limiter
+        self.estimated = estimated
+
+    def record_usage(self, actual_tokens):
+        """Correct the token budget once the real usage is known"""
+        if actual_tokens:
+            self.limiter.token_budget -= actual_tokens - self.estimated
+            self.estimated = actual_tokens
+
+
+class RateLimiter:
+    """
+    Two token buckets (requests/minute and estimated tokens/minute) plus a
+    concurrency cap, shared by every Gemini call.
+
+    Casual chat may not dip into the last `reserve` fraction of either
+    bucket, may not take the last concurrency slot, and always yields to a
+    waiting ticket analysis. A caller that cannot get through within its
+    max wait gets GeminiBusy right away instead of queuing indefinitely.
+    """
+    def __init__(self, rpm=GEMINI_RPM, tpm=GEMINI_TPM, max_concurrency=GEMINI_MAX_CONCURRENCY,
+                 reserve=GEMINI_PRIORITY_RESERVE, chat_max_wait=GEMINI_CHAT_MAX_WAIT,
+                 ticket_max_wait=GEMINI_TICKET_MAX_WAIT, clock=time.monotonic):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_concurrency = max_concurrency
+        self.max_wait = {PRIORITY_TICKET: ticket_max_wait, PRIORITY_CHAT: chat_max_wait}
+        self.clock = clock
+
+        # Headroom only high priority callers may use
+        self.request_reserve = math.ceil(rpm * reserve)
+        self.token_reserve = tpm * reserve
+        self.slot_reserve = 1 if max_concurrency > 1 else 0
+
+        self.request_budget = float(rpm)
+        self.token_budget = float(tpm)
+        self.active = 0
+        self._waiting = {PRIORITY_TICKET: 0, PRIORITY_CHAT: 0}
+        self._refilled_at = clock()
+        self._condition = None
+        self._loop = None
+
+        self.granted = {PRIORITY_TICKET: 0, PRIORITY_CHAT: 0}
+        self.rejected = {PRIORITY_TICKET: 0, PRIORITY_CHAT: 0}
+
+    def _refill(self):
+        now = self.clock()
+        elapsed = now - self._refilled_at
+        self._refilled_at = now
+        self.request_budget = min(self.rpm, self.request_budget + elapsed * self.rpm / 60)
+        self.token_budget = min(self.tpm, self.token_budget + elapsed * self.tpm / 60)
+
+    def _try_take(self, priority, tokens):
+        """
+        Take a request slot if allowed; returns 0 on success, otherwise the
+        seconds until the buckets could allow it (None if only a release can)
+        """
+        high = priority == PRIORITY_TICKET
+        request_floor = 0 if high else self.request_reserve
+        token_floor = 0 if high else self.token_reserve
+        slots = self.max_concurrency if high else self.max_concurrency - self.slot_reserve
+
+        if not high and self._waiting[PRIORITY_TICKET]:
+            return None
+        if self.active >= slots:
+            return None
+
+        # Never demand more than a full bucket, or a huge prompt would wait forever
+        tokens = min(tokens, self.tpm - token_floor)
+        request_short = request_floor + 1 - self.request_budget
+        token_short = token_floor + tokens - self.token_budget
+        if request_short > 0 or token_short > 0:
+            return max(request_short * 60 / self.rpm, token_short * 60 / self.tpm, 0.01)
+
+        self.request_budget -= 1
+        self.token_budget -= tokens
+        self.active += 1
+        return 0
+
+    async def acquire(self, priority=PRIORITY_CHAT, tokens=0) -> _Permit:
+        """Wait (up to this priority's max wait) for a slot"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # asyncio primitives are bound to the loop that first uses them
+            self._condition = asyncio.Condition()
+            self._loop = loop
+
+        deadline = self.clock() + self.max_wait[priority]
+        self._waiting[priority] += 1
+        try:
+            async with self._condition:
+                while True:
+                    self._refill()
+                    delay = self._try_take(priority, tokens)
+                    if delay == 0:
+                        self.granted[priority] += 1
+                        return _Permit(self, tokens)
+
+                    remaining = deadline - self.clock()
+                    if remaining <= 0:
+                        self.rejected[priority] += 1
+                        raise GeminiBusy("Gemini rate limit reached")
+
+                    try:
+                        await asyncio.wait_for(self._condition.wait(), timeout=min(remaining, delay or remaining))
+                    except asyncio.TimeoutError:
+                        pass
+        finally:
+            self._waiting[priority] -= 1
+
+    async def release(self):
+        self.active -= 1
+        async with self._condition:
+            self._condition.notify_all()
+
+    @asynccontextmanager
+    async def limit(self, priority=PRIORITY_CHAT, tokens=0):
+        """async with limiter.limit(...) as permit: make one Gemini call"""
+        permit = await self.acquire(priority, tokens)
+        try:
+            yield permit
+        finally:
+            await self.release()
+
+    def stats(self) -> dict:
+        self._refill()
+        return {
+            'active': self.active,
+            'requests_left': int(self.request_budget),
+            'tokens_left': int(self.token_budget),
+            'granted_ticket': self.granted[PRIORITY_TICKET],
+            'granted_chat': self.granted[PRIORITY_CHAT],
+            'rejected_ticket': self.rejected[PRIORITY_TICKET],
+            'rejected_chat': self.rejected[PRIORITY_CHAT]
+        }
+
+
+# Singleton instance
+rate_limiter = RateLimiter()
@@ -1,26 +1,18 @@
 # handlers/registration_detector.py
 # Dynamic registration status detection from chat history
 
-from datetime import datetime, timedelta
-from models.database import db_manager, Message
-from sqlalchemy import and_
+from datetime import datetime, timedelta, timezone
+from models.database import (
+    db_manager, dialect_insert, Message, RegistrationBucket, RegistrationSample
+)
+from sqlalchemy import and_, delete, func, select
 
-def is_open_statement(text: str) -> bool:
-    """
-    Detect if text indicates registration is OPEN
-    """
-    text_lower = text.lower()
-    
-    # Ignore questions
-    if '?' in text:
-        return False
-    
-    # Check for negations (these flip the meaning)
-    negations = ['gak', 'ga', 'tidak', 'bukan', 'belum', 'ngga']
-    has_negation = any(neg in text_lower for neg in negations)
-    
+from handlers.intent_matcher import IntentMatcher
+
+# Statement rules; negations flip the meaning of a matched indicator
+STATEMENT_RULES = [
     # OPEN indicators
-    open_keywords = [
+    ('open', [
         ('lagi', 'open', 'member'),
         ('udah', 'open', 'member'),
         ('member', 'lagi', 'buka'),
@@ -30,60 +22,188 @@ def is_open_statement(text: str) -> bool:
         ('member', 'udah', 'buka'),
         ('sekarang', 'open'),
         ('lagi', 'buka'),
-    ]
+    ]),
+    # CLOSE indicators
+    ('close', [
+        ('lagi', 'close', 'member'),
+        ('masih', 'close', 'member'),
+        ('member', 'masih', 'tutup'),
+        ('close', 'member', 'dulu'),
+        ('belum', 'buka', 'member'),
+        ('member', 'belum', 'open'),
+        ('masih', 'tutup'),
+        ('belum', 'open'),
+        ('close', 'dulu'),
+        ('tutup', 'member'),
+    ]),
+    ('open_negation', ['gak', 'ga', 'tidak', 'bukan', 'belum', 'ngga']),
+    ('close_negation', ['gak', 'ga', 'tidak', 'bukan']),
+]
+
+STATEMENTS = IntentMatcher(STATEMENT_RULES)
+
+
+def classify_statement(text: str):
+    """
+    Classify a chat message in one scan
+    Returns 'OPEN', 'CLOSE' or None (open indicators take precedence)
+    """
+    # Ignore questions
+    if '?' in text:
+        return None
     
-    # Check if any keyword combo matches
-    for combo in open_keywords:
-        if all(k in text_lower for k in combo):
-            # If negation exists, flip the result
-            return not has_negation
+    found = STATEMENTS.scan(text.lower())
+    if not found:
+        return None
     
-    return False
+    if STATEMENTS.matched(found, 'open') and not STATEMENTS.matched(found, 'open_negation'):
+        return 'OPEN'
+    if STATEMENTS.matched(found, 'close') and not STATEMENTS.matched(found, 'close_negation'):
+        return 'CLOSE'
+    return None
+
+
+def is_open_statement(text: str) -> bool:
+    """
+    Detect if text indicates registration is OPEN
+    """
+    if '?' in text:
+        return False
+    found = STATEMENTS.scan(text.lower())
+    return STATEMENTS.matched(found, 'open') and not STATEMENTS.matched(found, 'open_negation')
 
 
 def is_close_statement(text: str) -> bool:
     """
     Detect if text indicates registration is CLOSED
     """
-    text_lower = text.lower()
-    
-    # Ignore questions
     if '?' in text:
         return False
+    found = STATEMENTS.scan(text.lower())
+    return STATEMENTS.matched(found, 'close') and not STATEMENTS.matched(found, 'close_negation')
+
+
+def _hour(timestamp: datetime) -> datetime:
+    """Naive UTC timestamp truncated to its hourly bucket"""
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+
+def record_registration_signals(conn, rows):
+    """
+    Ingestion hook: classify newly written messages once and add them to
+    the hourly open/close buckets (runs inside the insert transaction)
+    """
+    buckets = {}
+    engine = conn.engine
     
-    # Check for negations
-    negations = ['gak', 'ga', 'tidak', 'bukan']
-    has_negation = any(neg in text_lower for neg in negations)
+    for row in rows:
+        if row.get('is_bot'):
+            continue
+        signal = classify_statement(row['content'])
+        if signal is None:
+            continue
+        
+        # The sample row doubles as the de-duplication key for re-delivered messages
+        inserted = conn.execute(
+            dialect_insert(engine, RegistrationSample.__table__).on_conflict_do_nothing(
+                index_elements=['discord_message_id']
+            ),
+            {
+                'discord_message_id': row['discord_message_id'],
+                'signal': signal,
+                'author_id': row['author_id'],
+                'content': row['content'],
+                'timestamp': row['timestamp']
+            }
+        ).rowcount
+        if not inserted:
+            continue
+        
+        counts = buckets.setdefault(_hour(row['timestamp']), [0, 0])
+        counts[0 if signal == 'OPEN' else 1] += 1
     
-    # CLOSE indicators
-    close_keywords = [
-        ('lagi', 'close', 'member'),
-        ('masih', 'close', 'member'),
-        ('member', 'masih', 'tutup'),
-        ('close', 'member', 'dulu'),
-        ('belum', 'buka', 'member'),
-        ('member', 'belum', 'open'),
-        ('masih', 'tutup'),
-        ('belum', 'open'),
-        ('close', 'dulu'),
-        ('tutup', 'member'),
-    ]
+    for hour, (open_count, close_count) in buckets.items():
+        stmt = dialect_insert(engine, RegistrationBucket.__table__).values(
+            hour=hour, open_count=open_count, close_count=close_count
+        )
+        conn.execute(stmt.on_conflict_do_update(
+            index_elements=['hour'],
+            set_={
+                'open_count': RegistrationBucket.open_count + stmt.excluded.open_count,
+                'close_count': RegistrationBucket.close_count + stmt.excluded.close_count
+            }
+        ))
+
+
+def rebuild_registration_signals(days: int = 7, db=None) -> int:
+    """
+    Rebuild the buckets and samples from stored messages (one scan)
+    Used to backfill history logged before the counters existed
+    Returns the number of signals found
+    """
+    db = db or db_manager
+    time_threshold = datetime.utcnow() - timedelta(days=days)
     
-    # Check if any keyword combo matches
-    for combo in close_keywords:
-        if all(k in text_lower for k in combo):
-            # If negation exists, flip the result
-            return not has_negation
+    with db.engine.begin() as conn:
+        conn.execute(delete(RegistrationBucket.__table__))
+        conn.execute(delete(RegistrationSample.__table__))
+        
+        rows = conn.execute(
+            select(Message.discord_message_id, Message.author_id, Message.content,
+                   Message.timestamp, Message.is_bot)
+            .where(and_(Message.timestamp >= time_threshold, Message.is_bot == False))
+        ).mappings().all()
+        record_registration_signals(conn, rows)
+        
+        return conn.execute(select(func.count()).select_from(RegistrationSample.__table__)).scalar()
+
+
+def backfill_registration_signals(days: int = 7, db=None) -> int:
+    """Rebuild the counters only if they have never been populated"""
+    db = db or db_manager
+    with db.session_scope() as session:
+        if session.query(RegistrationSample).first() is not None:
+            return 0
+    return rebuild_registration_signals(days, db)
+
+
+def _signal_counts(session, days: int):
+    """(open_count, close_count) summed over the hourly buckets of the last N days"""
+    since = _hour(datetime.utcnow() - timedelta(days=days))
+    open_count, close_count = session.query(
+        func.coalesce(func.sum(RegistrationBucket.open_count), 0),
+        func.coalesce(func.sum(RegistrationBucket.close_count), 0)
+    ).filter(RegistrationBucket.hour >= since).one()
+    return int(open_count), int(close_count)
+
+
+def _status_from_counts(open_count: int, close_count: int, min_threshold: int) -> str:
+    total_relevant = open_count + close_count
+    
+    # If not enough data, return default
+    if total_relevant < min_threshold:
+        return 'DEFAULT'
+    
+    # Calculate sentiment score
+    score = open_count - close_count
     
-    return False
+    if score > 0:
+        return 'OPEN'
+    elif score < 0:
+        return 'CLOSE'
+    else:
+        # Tie - return default
+        return 'DEFAULT'
 
 
 def get_registration_sentiment(days: int = 7, min_threshold: int = 5) -> str:
     """
-    Analyze chat history to determine registration status
+    Determine registration status from the precomputed hourly buckets
     
     Args:
-        days: Number of days to look back
+        days: Number of days to look back (hour granularity)
         min_threshold: Minimum number of messages needed to make determination
     
     Returns:
@@ -92,45 +212,8 @@ def get_registration_sentiment(days: int = 7, min_threshold: int = 5) -> str:
     session = db_manager.get_session()
     
     try:
-        # Calculate time threshold
-        time_threshold = datetime.utcnow() - timedelta(days=days)
-        
-        # Query messages from last N days
-        messages = session.query(Message).filter(
-            and_(
-                Message.timestamp >= time_threshold,
-                Message.is_bot == False  # Only user messages
-            )
-        ).all()
-        
-        # Analyze each message
-        open_count = 0
-        close_count = 0
-        
-        for msg in messages:
-            content = msg.content
-            
-            if is_open_statement(content):
-                open_count += 1
-            elif is_close_statement(content):
-                close_count += 1
-        
-        total_relevant = open_count + close_count
-        
-        # If not enough data, return default
-        if total_relevant < min_threshold:
-            return 'DEFAULT'
-        
-        # Calculate sentiment score
-        score = open_count - close_count
-        
-        if score > 0:
-            return 'OPEN'
-        elif score < 0:
-            return 'CLOSE'
-        else:
-            # Tie - return default
-            return 'DEFAULT'
+        open_count, close_count = _signal_counts(session, days)
+        return _status_from_counts(open_count, close_count, min_threshold)
     
     except Exception as e:
         print(f"Error in get_registration_sentiment: {e}")
@@ -151,57 +234,36 @@ def get_registration_status_details(days: int = 7) -> dict:
     session = db_manager.get_session()
     
     try:
-        time_threshold = datetime.utcnow() - timedelta(days=days)
-        
-        messages = session.query(Message).filter(
-            and_(
-                Message.timestamp >= time_threshold,
-                Message.is_bot == False
-            )
-        ).order_by(Message.timestamp.desc()).all()
-        
-        open_messages = []
-        close_messages = []
-        
-        for msg in messages:
-            content = msg.content
-            
-            if is_open_statement(content):
-                open_messages.append({
-                    'content': content,
-                    'timestamp': msg.timestamp,
-                    'user_id': msg.user_id
-                })
-            elif is_close_statement(content):
-                close_messages.append({
-                    'content': content,
-                    'timestamp': msg.timestamp,
-                    'user_id': msg.user_id
-                })
+        open_count, close_count = _signal_counts(session, days)
+        total = open_count + close_count
+        score = open_count - close_count
         
-        total = len(open_messages) + len(close_messages)
-        score = len(open_messages) - len(close_messages)
+        status = _status_from_counts(open_count, close_count, 5)
+        confidence = (abs(score) / total * 100) if total > 0 else 0
         
-        if total >= 5:
-            if score > 0:
-                status = 'OPEN'
-            elif score < 0:
-                status = 'CLOSE'
-            else:
-                status = 'DEFAULT'
-        else:
-            status = 'DEFAULT'
+        since = datetime.utcnow() - timedelta(days=days)
         
-        confidence = (abs(score) / total * 100) if total > 0 else 0
+        def samples(signal):
+            rows = session.query(RegistrationSample).filter(
+                and_(
+                    RegistrationSample.signal == signal,
+                    RegistrationSample.timestamp >= since
+                )
+            ).order_by(RegistrationSample.timestamp.desc()).limit(3).all()
+            return [{
+                'content': row.content,
+                'timestamp': row.timestamp,
+                'user_id': row.author_id
+            } for row in rows]
         
         return {
             'status': status,
             'confidence': confidence,
-            'open_count': len(open_messages),
-            'close_count': len(close_messages),
+            'open_count': open_count,
+            'close_count': close_count,
             'total_count': total,
-            'open_samples': open_messages[:3],  # Top 3
-            'close_samples': close_messages[:3]  # Top 3
+            'open_samples': samples('OPEN'),  # Top 3
+            'close_samples': samples('CLOSE')  # Top 3
         }
     
     except Exception as e:
@@ -220,35 +282,10 @@ def get_registration_status_details(days: int = 7) -> dict:
         session.close()
 
 
-def get_chat_activity(minutes: int = 15) -> str:
+def get_chat_activity(minutes: int = 15, guild_id=None) -> str:
     """
-    Analyze chat activity in the last N minutes
+    Chat activity in the last N minutes, from the in-memory counters
     Returns: 'HIGH', 'MEDIUM', 'LOW'
     """
-    session = db_manager.get_session()
-    
-    try:
-        time_threshold = datetime.utcnow() - timedelta(minutes=minutes)
-        
-        # Count recent messages
-        count = session.query(Message).filter(
-            and_(
-                Message.timestamp >= time_threshold,
-                Message.is_bot == False
-            )
-        ).count()
-        
-        if count > 20:
-            return 'HIGH'
-        elif count > 5:
-            return 'MEDIUM'
-        else:
-            return 'LOW'
-            
-    except Exception as e:
-        print(f"Error in get_chat_activity: {e}")
-        return 'LOW'
-    
-    finally:
-        session.close()
-
+    from handlers.activity_counter import activity_counter
+    return activity_counter.level(minutes, guild_id=guild_id)
@@ -0,0 +1,171 @@
+# handlers/response_cache.py
+# TTL + LRU cache of Gemini replies, keyed on query and context
+
+import hashlib
+import re
+import time
+from collections import OrderedDict
+
+import scipy.sparse as sp
+from sklearn.preprocessing import normalize
+
+from analysis import smart_vectorizer
+from core.config import (
+    RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, RESPONSE_CACHE_NEAR_DUPLICATES,
+    RESPONSE_CACHE_SIMILARITY, RESPONSE_CACHE_CONTEXT_DEPTH
+)
+
+# Discord user/role/channel mentions and custom emoji carry no meaning for matching
+_MENTION_PATTERN = re.compile(r'<(?:@[!&]?|#|a?:\w+:)\d+>')
+_WORD_PATTERN = re.compile(r'\w+')
+
+_vectorizer = None
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase words only, so punctuation and mentions do not split keys"""
+    query = _MENTION_PATTERN.sub(' ', query or '')
+    return ' '.join(_WORD_PATTERN.findall(query.lower()))
+
+
+def query_vector(normalized_query: str):
+    """L2-normalized hashed 1-3 gram counts of a normalized query"""
+    global _vectorizer
+    if _vectorizer is None:
+        _vectorizer = smart_vectorizer()
+    return normalize(_vectorizer.transform([normalized_query]), norm='l2')
+
+
+class _Entry:
+    __slots__ = ('response', 'fingerprint', 'vector', 'expires_at')
+
+    def __init__(self, response, fingerprint, vector, expires_at):
+        self.response = response
+        self.fingerprint = fingerprint
+        self.vector = vector
+        self.expires_at = expires_at
+
+
+class ResponseCache:
+    """
+    Remembers generated replies so repeated questions skip the Gemini call.
+
+    Entries are keyed on the normalized query plus a fingerprint of the
+    retrieved context, expire after ttl seconds and are evicted least
+    recently used first. With near_duplicates on, a miss falls back to the
+    closest cached query under the same fingerprint, scored with the same
+    hashed 1-3 grams as the smart context index.
+    """
+    def __init__(self, max_size=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL,
+                 near_duplicates=RESPONSE_CACHE_NEAR_DUPLICATES,
+                 similarity=RESPONSE_CACHE_SIMILARITY,
+                 context_depth=RESPONSE_CACHE_CONTEXT_DEPTH, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.near_duplicates = near_duplicates
+        self.similarity = similarity
+        self.context_depth = context_depth
+        self.clock = clock
+        self.clear()
+
+    def clear(self):
+        self._entries = OrderedDict()   # (query, fingerprint) -> _Entry, oldest first
+        self._by_fingerprint = {}       # fingerprint -> set of keys
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def context_fingerprint(self, context_messages) -> str:
+        """Hash of the top context messages the prompt would include"""
+        if not context_messages:
+            return ''
+        top = [msg['content'] for msg in context_messages[:self.context_depth]]
+        return hashlib.sha1('\n'.join(top).encode('utf-8')).hexdigest()[:16]
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        keys = self._by_fingerprint.get(entry.fingerprint)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_fingerprint[entry.fingerprint]
+
+    def _live(self, key, now):
+        """Entry for key unless it has expired (expired entries are dropped)"""
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= now:
+            self._remove(key)
+            self.expirations += 1
+            return None
+        return entry
+
+    def _closest(self, normalized_query, fingerprint, now):
+        keys = [key for key in list(self._by_fingerprint.get(fingerprint, ()))
+                if self._live(key, now) is not None]
+        if not keys:
+            return None
+
+        vectors = sp.vstack([self._entries[key].vector for key in keys])
+        scores = (vectors @ query_vector(normalized_query).T).toarray().ravel()
+        best = int(scores.argmax())
+        return keys[best] if scores[best] >= self.similarity else None
+
+    def get(self, query: str, context_messages=None):
+        """Cached reply for query under this context, or None"""
+        normalized = normalize_query(query)
+        if not normalized:
+            return None
+
+        now = self.clock()
+        fingerprint = self.context_fingerprint(context_messages)
+        key = (normalized, fingerprint)
+
+        if self._live(key, now) is not None:
+            self.hits += 1
+        else:
+            key = self._closest(normalized, fingerprint, now) if self.near_duplicates else None
+            if key is None:
+                self.misses += 1
+                return None
+            self.near_hits += 1
+
+        self._entries.move_to_end(key)
+        return self._entries[key].response
+
+    def put(self, query: str, context_messages, response: str):
+        """Store a generated reply"""
+        normalized = normalize_query(query)
+        if not normalized or not response:
+            return
+
+        fingerprint = self.context_fingerprint(context_messages)
+        key = (normalized, fingerprint)
+        if key in self._entries:
+            self._remove(key)
+
+        vector = query_vector(normalized) if self.near_duplicates else None
+        self._entries[key] = _Entry(response, fingerprint, vector, self.clock() + self.ttl)
+        self._by_fingerprint.setdefault(fingerprint, set()).add(key)
+
+        while len(self._entries) > self.max_size:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        """Hit/miss counters for monitoring"""
+        lookups = self.hits + self.near_hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'near_hits': self.near_hits,
+            'misses': self.misses,
+            'hit_rate': round((self.hits + self.near_hits) / lookups, 3) if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations
+        }
+
+
+# Singleton instance
+response_cache = ResponseCache()
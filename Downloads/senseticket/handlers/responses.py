@@ -1,6 +1,8 @@
 # handlers/responses.py
 # Common question responses untuk bot
 
+from handlers.intent_matcher import IntentMatcher
+
 RULES_TEXT = """**ᴛᴇʀᴍꜱ ᴀɴᴅ ᴄᴏɴᴅɪᴛɪᴏɴꜱ.**
 follow the discord terms of server, meaning that you are fifteen or older. limited cursing, some may be sensitive to excessive swearing, so please be aware of that.
 
@@ -111,6 +113,61 @@ COMMON_RESPONSES = {
     ]
 }
 
+# Intent rules in priority order: the first matching intent wins.
+# Each entry is a keyword, or a tuple of keywords that must all appear.
+COMMON_INTENT_RULES = [
+    ('greeting', ['hi', 'hello', 'halo', 'hai', 'hey']),
+    ('identity', ['siapa kamu', 'kamu siapa', 'who are you', 'nama kamu']),
+    ('capability', ['bisa apa', 'what can you do', 'fungsi']),
+    ('status', ['apa kabar', 'how are you', 'kabar']),
+    ('thanks', ['thanks', 'makasih', 'terima kasih', 'thx']),
+    ('join', ['gabung', 'join', 'daftar', 'register', 'cara masuk', 'how to join', 'cara gabung']),
+    ('rules', ['rules', 'rule', 'aturan', 'peraturan', 'regulation', 'guideline']),
+    # Registration Status (open member?) - DYNAMIC DETECTION
+    ('registration_status', [
+        ('open', 'member'),
+        ('buka', 'member'),
+        ('udah', 'open'),
+        ('kapan', 'open'),
+        ('kapan', 'buka'),
+        ('member', 'dibuka'),
+        ('registrasi', 'buka'),
+        ('registration', 'open')
+    ]),
+    # Crowd Status (rame gak?)
+    ('crowd_status', [
+        ('rame', 'gak'),
+        ('sepi', 'gak'),
+        ('lagi', 'rame'),
+        ('lagi', 'sepi'),
+        ('server', 'sepi'),
+        ('server', 'rame'),
+        ('ada', 'orang'),
+        ('pada', 'kemana')
+    ]),
+    # Fun: Siapa paling ganteng/cantik?
+    ('fun_handsome', [
+        ('siapa', 'ganteng'),
+        ('siapa', 'cantik'),
+        ('siapa', 'paling', 'kece'),
+        ('siapa', 'cakep'),
+        ('orang', 'ganteng'),
+        ('orang', 'cantik')
+    ])
+]
+
+COMMON_INTENTS = IntentMatcher(COMMON_INTENT_RULES)
+
+JOIN_TEXT = """✨ **Gabung ke Sense & Jadi Bagian dari Sense!** ✨
+
+1️⃣ Join Discord Sense
+2️⃣ Follow TikTok Sense
+3️⃣ Join Group Resmi
+4️⃣ Ubah display name kamu jadi Sense/Senz
+  Contoh: dipsysense atau dipsysenz
+
+Kamu siap jadi bagian dari kita? 👀🔥"""
+
 def check_common_question(query_lower):
     """
     Check if query matches common questions
@@ -118,55 +175,19 @@ def check_common_question(query_lower):
     """
     import random
     
-    # Greeting
-    if any(w in query_lower for w in ['hi', 'hello', 'halo', 'hai', 'hey']):
-        return True, random.choice(COMMON_RESPONSES['greeting'])
-    
-    # Identity
-    if any(w in query_lower for w in ['siapa kamu', 'kamu siapa', 'who are you', 'nama kamu']):
-        return True, random.choice(COMMON_RESPONSES['identity'])
+    # All rules are evaluated in one scan; the highest priority match wins
+    intent = COMMON_INTENTS.match(query_lower)
     
-    # Capability
-    if any(w in query_lower for w in ['bisa apa', 'what can you do', 'fungsi']):
-        return True, random.choice(COMMON_RESPONSES['capability'])
+    if intent is None:
+        return False, None
     
-    # Status
-    if any(w in query_lower for w in ['apa kabar', 'how are you', 'kabar']):
-        return True, random.choice(COMMON_RESPONSES['status'])
+    if intent == 'join':
+        return True, JOIN_TEXT
     
-    # Thanks
-    if any(w in query_lower for w in ['thanks', 'makasih', 'terima kasih', 'thx']):
-        return True, random.choice(COMMON_RESPONSES['thanks'])
-    
-    # How to Join Sense
-    if any(w in query_lower for w in ['gabung', 'join', 'daftar', 'register', 'cara masuk', 'how to join', 'cara gabung']):
-        join_text = """✨ **Gabung ke Sense & Jadi Bagian dari Sense!** ✨
-
-1️⃣ Join Discord Sense
-2️⃣ Follow TikTok Sense
-3️⃣ Join Group Resmi
-4️⃣ Ubah display name kamu jadi Sense/Senz
-  Contoh: dipsysense atau dipsysenz
-
-Kamu siap jadi bagian dari kita? 👀🔥"""
-        return True, join_text
-    
-    # Rules
-    if any(w in query_lower for w in ['rules', 'rule', 'aturan', 'peraturan', 'regulation', 'guideline']):
+    if intent == 'rules':
         return True, RULES_TEXT
     
-    # Registration Status (open member?) - DYNAMIC DETECTION
-    registration_keywords = [
-        ('open', 'member'),
-        ('buka', 'member'),
-        ('udah', 'open'),
-        ('kapan', 'open'),
-        ('kapan', 'buka'),
-        ('member', 'dibuka'),
-        ('registrasi', 'buka'),
-        ('registration', 'open')
-    ]
-    if any(all(k in query_lower for k in combo) for combo in registration_keywords):
+    if intent == 'registration_status':
         # Use dynamic detection from chat history
         from handlers.registration_detector import get_registration_sentiment
         
@@ -179,18 +200,7 @@ Kamu siap jadi bagian dari kita? 👀🔥"""
         else:  # DEFAULT
             return True, random.choice(COMMON_RESPONSES['registration_status_default'])
     
-    # Crowd Status (rame gak?)
-    crowd_keywords = [
-        ('rame', 'gak'),
-        ('sepi', 'gak'),
-        ('lagi', 'rame'),
-        ('lagi', 'sepi'),
-        ('server', 'sepi'),
-        ('server', 'rame'),
-        ('ada', 'orang'),
-        ('pada', 'kemana')
-    ]
-    if any(all(k in query_lower for k in combo) for combo in crowd_keywords):
+    if intent == 'crowd_status':
         from handlers.registration_detector import get_chat_activity
         status = get_chat_activity(minutes=15)
         
@@ -200,19 +210,6 @@ Kamu siap jadi bagian dari kita? 👀🔥"""
             return True, random.choice(COMMON_RESPONSES['crowd_status_medium'])
         else:
             return True, random.choice(COMMON_RESPONSES['crowd_status_low'])
-            
-
-            
-    # Fun: Siapa paling ganteng/cantik?
-    fun_keywords = [
-        ('siapa', 'ganteng'),
-        ('siapa', 'cantik'),
-        ('siapa', 'paling', 'kece'),
-        ('siapa', 'cakep'),
-        ('orang', 'ganteng'),
-        ('orang', 'cantik')
-    ]
-    if any(all(k in query_lower for k in combo) for combo in fun_keywords):
-        return True, random.choice(COMMON_RESPONSES['fun_handsome'])
-
-    return False, None
+    
+    # greeting, identity, capability, status, thanks, fun_handsome
+    return True, random.choice(COMMON_RESPONSES[intent])
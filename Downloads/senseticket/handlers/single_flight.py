@@ -0,0 +1,130 @@
+# handlers/single_flight.py
+# Request coalescing: concurrent near-identical queries share one upstream call
+
+import asyncio
+import time
+
+import scipy.sparse as sp
+
+from core.config import COALESCE_WINDOW_MS, COALESCE_SIMILARITY
+from handlers.response_cache import normalize_query, query_vector
+
+# Result handed to followers when the leader was cancelled: they retry instead
+_ABANDONED = object()
+
+
+class _Flight:
+    __slots__ = ('normalized', 'vector', 'future', 'started_at')
+
+    def __init__(self, normalized, vector, future, started_at):
+        self.normalized = normalized
+        self.vector = vector
+        self.future = future
+        self.started_at = started_at
+
+
+class SingleFlight:
+    """
+    The first request for a query becomes the leader and makes the call;
+    requests in the same scope (channel) that match it while it is running,
+    or within window seconds of it starting, wait for the leader's result
+    instead of calling upstream themselves. Exact matches (after
+    normalization) always join; near-identical ones join when their cosine
+    similarity reaches similarity.
+    """
+    def __init__(self, window_ms=COALESCE_WINDOW_MS, similarity=COALESCE_SIMILARITY,
+                 clock=time.monotonic):
+        self.window = window_ms / 1000
+        self.similarity = similarity
+        self.clock = clock
+        self._flights = {}  # scope -> [_Flight]
+        self.leaders = 0
+        self.coalesced = 0
+
+    def _live_flights(self, scope, now):
+        """Flights still running or inside the window; stale ones are pruned"""
+        flights = [f for f in self._flights.get(scope, ())
+                   if not f.future.done() or now - f.started_at <= self.window]
+        if flights:
+            self._flights[scope] = flights
+        else:
+            self._flights.pop(scope, None)
+        return flights
+
+    def _drop(self, scope, flight):
+        """Stop new requests from joining a flight that did not produce a result"""
+        flights = self._flights.get(scope)
+        if flights and flight in flights:
+            flights.remove(flight)
+            if not flights:
+                self._flights.pop(scope, None)
+
+    def _match(self, flights, normalized, now):
+        for flight in flights:
+            if flight.normalized == normalized:
+                return flight, None
+
+        vector = query_vector(normalized)
+        recent = [f for f in flights if now - f.started_at <= self.window]
+        if recent:
+            scores = (sp.vstack([f.vector for f in recent]) @ vector.T).toarray().ravel()
+            best = int(scores.argmax())
+            if scores[best] >= self.similarity:
+                return recent[best], vector
+        return None, vector
+
+    async def do(self, scope, query: str, call):
+        """
+        Await call() once per group of matching queries in scope
+        call is a zero-argument coroutine function; its result (or
+        exception) is handed to every waiter in the group
+        """
+        normalized = normalize_query(query)
+        if not normalized:
+            return await call()
+
+        now = self.clock()
+        flight, vector = self._match(self._live_flights(scope, now), normalized, now)
+        if flight is not None:
+            self.coalesced += 1
+            # Shield so a cancelled follower cannot cancel the leader's call
+            result = await asyncio.shield(flight.future)
+            if result is _ABANDONED:
+                # Only the leader was cancelled: regroup without it
+                self.coalesced -= 1
+                return await self.do(scope, query, call)
+            return result
+
+        future = asyncio.get_running_loop().create_future()
+        flight = _Flight(normalized, vector, future, now)
+        self._flights.setdefault(scope, []).append(flight)
+        self.leaders += 1
+
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            self._drop(scope, flight)
+            future.set_result(_ABANDONED)
+            raise
+        except Exception as e:
+            # Waiting followers share the error; later requests call again
+            self._drop(scope, flight)
+            future.set_exception(e)
+            # Followers see the error; mark it retrieved so it is not logged as lost
+            future.exception()
+            raise
+        future.set_result(result)
+        return result
+
+    def stats(self) -> dict:
+        """Upstream calls made vs. requests that piggybacked on one"""
+        return {
+            'in_flight': sum(1 for flights in self._flights.values()
+                             for f in flights if not f.future.done()),
+            'leaders': self.leaders,
+            'coalesced': self.coalesced
+        }
+
+
+# Singleton instance
+single_flight = SingleFlight()
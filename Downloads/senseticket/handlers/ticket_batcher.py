@@ -0,0 +1,135 @@
+# handlers/ticket_batcher.py
+# Micro-batching queue for ticket analysis
+
+import asyncio
+import time
+
+from core.config import TICKET_BATCH_SIZE, TICKET_ANALYSIS_SLO_MS
+
+
+class TicketAnalysisBatcher:
+    """
+    Collects ticket texts and analyzes them several at a time with one
+    Gemini request. A batch is sent as soon as it is full, or when its
+    oldest ticket has waited slo_ms, whichever comes first; each caller
+    gets back only its own ticket's result.
+    """
+    def __init__(self, analyze=None, max_batch=TICKET_BATCH_SIZE, slo_ms=TICKET_ANALYSIS_SLO_MS):
+        if analyze is None:
+            from handlers.gemini_handler import analyze_tickets
+            analyze = analyze_tickets
+        self.analyze = analyze
+        self.max_batch = max_batch
+        self.slo = slo_ms / 1000
+
+        self._pending = []      # [(content, future, deadline, enqueued_at)]
+        self._wakeup = None
+        self._task = None
+        self._sending = set()
+        self._closing = False
+
+        # Metrics
+        self.total_tickets = 0
+        self.total_batches = 0
+        self.max_wait_ms = 0.0
+        self._wait_ms_sum = 0.0
+
+    def start(self):
+        """Start the background batching task (must be called inside the event loop)"""
+        if self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._closing = False
+        self._task = asyncio.create_task(self._run(), name="ticket-analysis-batcher")
+
+    async def submit(self, content: str):
+        """Queue one ticket and wait for its analysis (dict or None)"""
+        self.start()
+        loop = asyncio.get_running_loop()
+        now = time.perf_counter()
+        future = loop.create_future()
+        self._pending.append((content, future, now + self.slo, now))
+        self._wakeup.set()
+        return await future
+
+    @property
+    def depth(self) -> int:
+        """Tickets waiting for a batch"""
+        return len(self._pending)
+
+    async def _run(self):
+        while not self._closing:
+            if not self._pending:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+
+            # Sleep until the oldest ticket's SLO, unless the batch fills first
+            timeout = self._pending[0][2] - time.perf_counter()
+            if len(self._pending) < self.max_batch and timeout > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+
+            self._dispatch()
+
+    def _dispatch(self):
+        """Send the next batch without waiting for it, so collection continues"""
+        batch = self._pending[:self.max_batch]
+        del self._pending[:self.max_batch]
+        task = asyncio.create_task(self._send(batch))
+        self._sending.add(task)
+        task.add_done_callback(self._sending.discard)
+
+    async def _send(self, batch):
+        sent_at = time.perf_counter()
+        for _, _, _, enqueued_at in batch:
+            wait_ms = (sent_at - enqueued_at) * 1000
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+            self._wait_ms_sum += wait_ms
+        self.total_tickets += len(batch)
+        self.total_batches += 1
+
+        try:
+            results = await self.analyze([content for content, _, _, _ in batch])
+        except Exception as e:
+            print(f"❌ Ticket analysis batch failed: {e}")
+            results = [None] * len(batch)
+
+        # A short reply must never leave a caller waiting forever
+        results = list(results or [])[:len(batch)]
+        results += [None] * (len(batch) - len(results))
+        for (_, future, _, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def close(self):
+        """Stop batching and send whatever is still queued"""
+        if self._task is None:
+            return
+
+        self._closing = True
+        self._wakeup.set()
+        try:
+            await self._task
+        finally:
+            self._task = None
+
+        while self._pending:
+            self._dispatch()
+        if self._sending:
+            await asyncio.gather(*self._sending, return_exceptions=True)
+
+    def stats(self) -> dict:
+        """Batch sizes and queueing delay for monitoring"""
+        return {
+            'queue_depth': self.depth,
+            'tickets': self.total_tickets,
+            'batches': self.total_batches,
+            'avg_batch_size': round(self.total_tickets / self.total_batches, 2) if self.total_batches else 0.0,
+            'avg_wait_ms': round(self._wait_ms_sum / self.total_tickets, 1) if self.total_tickets else 0.0,
+            'max_wait_ms': round(self.max_wait_ms, 1)
+        }
@@ -47,7 +47,7 @@ class MainMenuView(View):
     
     @discord.ui.button(emoji="📝", style=discord.ButtonStyle.primary, row=0, custom_id="main_menu:register")
     async def register_button(self, interaction: discord.Interaction, button: Button):
-        db_manager.log_action(interaction.user.id, "Click Register Guide")
+        await db_manager.log_action_async(interaction.user.id, "Click Register Guide")
         embed = discord.Embed(title="📝 Member Registration Guide", description="**𝜗𝜚⋆₊˚ HOW TO JOIN SENSE CLAN ⋆₊˚𝜗𝜚**\n", color=COLOR_PINK)
         embed.add_field(name="", value="```text\n📌 Step 1: Join Our Roblox Community\n• Change your display name to: username+sense\n• Example: dipsysense\n```", inline=False)
         embed.add_field(name="", value="🔗 [Click to Join Community](https://www.roblox.com/communities/35908807/SENSE-of-our-heart#!/about)", inline=False)
@@ -57,7 +57,7 @@ class MainMenuView(View):
     
     @discord.ui.button(emoji="❓", style=discord.ButtonStyle.primary, row=0, custom_id="main_menu:question")
     async def question_button(self, interaction: discord.Interaction, button: Button):
-        db_manager.log_action(interaction.user.id, "Click FAQ Menu")
+        await db_manager.log_action_async(interaction.user.id, "Click FAQ Menu")
         embed = discord.Embed(title="❓ Frequently Asked Questions", description="Select a question below to get help! 💡\n", color=COLOR_PRIMARY)
         embed.add_field(name="", value=(
             "```text\n1️⃣ How do I join SENSE?\nRegistration schedule and how to become a member\n```\n"
@@ -70,7 +70,7 @@ class MainMenuView(View):
     
     @discord.ui.button(emoji="✨", style=discord.ButtonStyle.primary, row=0, custom_id="main_menu:request_role")
     async def request_role_button(self, interaction: discord.Interaction, button: Button):
-        db_manager.log_action(interaction.user.id, "Click Request Role Menu")
+        await db_manager.log_action_async(interaction.user.id, "Click Request Role Menu")
         embed = discord.Embed(title="✨ Request Attuned Soul Role", description="**Choose your verification method:**\n", color=COLOR_WARNING)
         embed.add_field(name="", value="```text\n🎮 Automatic Verification\nClick 'Request Attuned Soul' to verify automatically.\nBot will check your SENSE Roblox group membership.\n```", inline=False)
         embed.add_field(name="", value="```text\n✅ Requirements:\n• Must be in SENSE Roblox group\n• Must have role: 💚・Our Lovely Sense Member\n• Discord name must show Roblox username (via Bloxlink)\n```", inline=False)
@@ -80,7 +80,7 @@ class MainMenuView(View):
     
     @discord.ui.button(emoji="💬", style=discord.ButtonStyle.primary, row=0, custom_id="main_menu:livechat")
     async def livechat_button(self, interaction: discord.Interaction, button: Button):
-        db_manager.log_action(interaction.user.id, "Click Live Chat Request")
+        await db_manager.log_action_async(interaction.user.id, "Click Live Chat Request")
         role = interaction.guild.get_role(ATTUNED_SOUL_ROLE_ID)
         embed = discord.Embed(title="💬 Live Chat Support Requested", description="**Support staff has been notified!**\n", color=COLOR_DANGER)
         embed.add_field(name="Staff Notification:", value=f"{role.mention if role else '@Attuned Soul'}", inline=False)
@@ -102,7 +102,7 @@ class QuestionView(View):
     
     @discord.ui.button(emoji="1️⃣", style=discord.ButtonStyle.primary, row=0, custom_id="question:q1")
     async def q1_button(self, interaction: discord.Interaction, button: Button):
-        db_manager.log_action(interaction.user.id, "Click Q1: How to Join")
+        await db_manager.log_action_async(interaction.user.id, "Click Q1: How to Join")
         embed = discord.Embed(title="📅 Registration Schedule", description="**When can I join SENSE?**\n", color=COLOR_SUCCESS)
         embed.add_field(name="Registration Schedule:", value="• **Open:** Saturdays & Sundays only\n• **Closed:** Monday through Friday", inline=False)
         embed.set_footer(text="Registration • Weekend Only")
@@ -111,13 +111,13 @@ class QuestionView(View):
     
     @discord.ui.button(emoji="2️⃣", style=discord.ButtonStyle.primary, row=0, custom_id="question:q2")
     async def q2_button(self, interaction: discord.Interaction, button: Button):
-        db_manager.log_action(interaction.user.id, "Click Q2: Server Rules")
+        await db_manager.log_action_async(interaction.user.id, "Click Q2: Server Rules")
         from handlers.responses import RULES_TEXT
         await interaction.response.send_message(RULES_TEXT, ephemeral=True)
     
     @discord.ui.button(emoji="3️⃣", style=discord.ButtonStyle.primary, row=0, custom_id="question:q3")
     async def q3_button(self, interaction: discord.Interaction, button: Button):
-        db_manager.log_action(interaction.user.id, "Click Q3: Game Tutorial")
+        await db_manager.log_action_async(interaction.user.id, "Click Q3: Game Tutorial")
         role = interaction.guild.get_role(ATTUNED_SOUL_ROLE_ID)
         embed = discord.Embed(title="🎮 Game Tutorial Request", description="**Tutorial assistance requested!**\n", color=COLOR_PRIMARY)
         embed.add_field(name="Staff Notification:", value=f"{role.mention if role else '@Attuned Soul'}", inline=False)
@@ -151,7 +151,7 @@ class RoleRequestView(View):
     
     @discord.ui.button(label="👑 Request Attuned Soul", style=discord.ButtonStyle.success, row=0, custom_id="role_request:verify")
     async def verify_roblox_button(self, interaction: discord.Interaction, button: Button):
-        db_manager.log_action(interaction.user.id, "Click Verify Roblox")
+        await db_manager.log_action_async(interaction.user.id, "Click Verify Roblox")
         await interaction.response.defer(ephemeral=True)
         
         display_name = interaction.user.display_name
@@ -197,7 +197,7 @@ class RoleRequestView(View):
     
     @discord.ui.button(label="❓ Help!", style=discord.ButtonStyle.secondary, row=0, custom_id="role_request:help")
     async def manual_help_button(self, interaction: discord.Interaction, button: Button):
-        db_manager.log_action(interaction.user.id, "Click Manual Help")
+        await db_manager.log_action_async(interaction.user.id, "Click Manual Help")
         role = interaction.guild.get_role(ATTUNED_SOUL_ROLE_ID)
         embed = discord.Embed(title="❓ Manual Role Request", description="**Staff assistance requested!**\n", color=COLOR_INFO)
         embed.add_field(name="", value=f"```text\n📋 Request Details:\n• Requested by: {interaction.user.display_name}\n• Type: Manual Role Verification\n• Status: 🟡 Pending Staff Review\n```", inline=False)
@@ -0,0 +1,39 @@
+"""Composite indexes matching the dashboard and detector query shapes
+
+Tables are created by DatabaseManager.create_tables(); this revision only
+adds indexes, and skips any that create_tables() already made on a fresh
+database.
+
+Revision ID: 0001_query_indexes
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = '0001_query_indexes'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    # Member messages in a time range (registration detector, activity warm-up, api_stats)
+    ('ix_messages_is_bot_timestamp', 'messages', ['is_bot', 'timestamp']),
+    # AI replies in a time range (api_stats, MaintenanceTools.get_stats)
+    ('ix_messages_is_ai_response_timestamp', 'messages', ['is_ai_response', 'timestamp']),
+    # One channel's recent history
+    ('ix_messages_channel_id_timestamp', 'messages', ['channel_id', 'timestamp']),
+    # Newest-first listings (/api/conversations, dashboard) and "today" counts
+    ('ix_messages_timestamp', 'messages', ['timestamp']),
+    # AI log, newest first
+    ('ix_ai_responses_created_at', 'ai_responses', ['created_at']),
+]
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
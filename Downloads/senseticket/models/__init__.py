@@ -7,10 +7,20 @@ from models.database import (
     AIResponse,
     StyleProfile,
     ChannelSettings,
+    CacheVersion,
     BotStatus,
+    ServiceStatus,
+    TicketState,
+    RegistrationBucket,
+    RegistrationSample,
+    MessageRollup,
+    ChannelRollup,
+    UserSketch,
+    RollupState,
     Action,
     DatabaseManager,
-    db_manager
+    db_manager,
+    dialect_insert
 )
 
 __all__ = [
@@ -19,8 +29,18 @@ __all__ = [
     'AIResponse',
     'StyleProfile',
     'ChannelSettings',
+    'CacheVersion',
     'BotStatus',
+    'ServiceStatus',
+    'TicketState',
+    'RegistrationBucket',
+    'RegistrationSample',
+    'MessageRollup',
+    'ChannelRollup',
+    'UserSketch',
+    'RollupState',
     'Action',
     'DatabaseManager',
-    'db_manager'
+    'db_manager',
+    'dialect_insert'
 ]
@@ -1,9 +1,13 @@
 # models/database.py
 # SQLAlchemy models for SENSE Bot
 
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Boolean, Float, JSON, ForeignKey
+from sqlalchemy import create_engine, event, make_url, Index, Column, Integer, String, DateTime, Boolean, Float, JSON, ForeignKey, LargeBinary
 from sqlalchemy.orm import relationship, sessionmaker, declarative_base
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
 from datetime import datetime
+import asyncio
 import os
 
 Base = declarative_base()
@@ -13,6 +17,14 @@ class Message(Base):
     Messages table - stores all Discord messages with anti-duplicate
     """
     __tablename__ = 'messages'
+    __table_args__ = (
+        # Member/AI messages in a time range, and newest-first listings
+        # (added by migrations/versions/0001_query_indexes.py)
+        Index('ix_messages_is_bot_timestamp', 'is_bot', 'timestamp'),
+        Index('ix_messages_is_ai_response_timestamp', 'is_ai_response', 'timestamp'),
+        Index('ix_messages_channel_id_timestamp', 'channel_id', 'timestamp'),
+        Index('ix_messages_timestamp', 'timestamp'),
+    )
     
     id = Column(Integer, primary_key=True)
     discord_message_id = Column(String, unique=True, nullable=False, index=True)  # Anti-duplicate
@@ -44,7 +56,7 @@ class AIResponse(Base):
     style_tags = Column(String)  # "ceria,kepo,short"
     feedback_score = Column(Integer, default=0)  # From reactions: 👍=+1, ❤️=+2, 😂=+1, 👎=-1
     confidence_score = Column(Float)  # AI confidence (0.0-1.0)
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
     
     # Relationships
     request_message = relationship("Message", foreign_keys=[request_message_id], back_populates="ai_requests")
@@ -89,6 +101,21 @@ class ChannelSettings(Base):
         return f"<ChannelSettings(channel={self.channel_id}, mode={self.ai_mode})>"
 
 
+class CacheVersion(Base):
+    """
+    Cache Versions table - bumped by writers so other processes can
+    detect that an in-memory cache is stale
+    """
+    __tablename__ = 'cache_versions'
+    
+    name = Column(String, primary_key=True)  # "channel_settings"
+    version = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f"<CacheVersion(name={self.name}, version={self.version})>"
+
+
 class BotStatus(Base):
     """
     Bot Status table - for dashboard monitoring
@@ -103,6 +130,136 @@ class BotStatus(Base):
         return f"<BotStatus(status={self.status}, heartbeat={self.last_heartbeat})>"
 
 
+class TicketState(Base):
+    """
+    Ticket States table - which ticket channels already got a Smart
+    Ticket Analysis, and its result
+    """
+    __tablename__ = 'ticket_states'
+    
+    channel_id = Column(String, primary_key=True)
+    guild_id = Column(String, nullable=False, index=True)
+    analysis = Column(JSON)  # {"summary": "...", "urgency": "High", ...}
+    analyzed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f"<TicketState(channel={self.channel_id}, analyzed_at={self.analyzed_at})>"
+
+
+class ServiceStatus(Base):
+    """
+    Service Status table - health of bot components (e.g. the Gemini
+    circuit breaker) for the dashboard
+    """
+    __tablename__ = 'service_status'
+    
+    name = Column(String, primary_key=True)  # "gemini"
+    state = Column(String, nullable=False)  # "closed", "open", "half_open"
+    details = Column(JSON)  # {"recent_failure_rate": 0.2, "last_error": "...", ...}
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f"<ServiceStatus(name={self.name}, state={self.state})>"
+
+
+class RegistrationBucket(Base):
+    """
+    Registration Buckets table - hourly counts of "member open/close"
+    statements, classified once when messages are ingested
+    """
+    __tablename__ = 'registration_buckets'
+    
+    hour = Column(DateTime, primary_key=True)  # UTC, truncated to the hour
+    open_count = Column(Integer, default=0, nullable=False)
+    close_count = Column(Integer, default=0, nullable=False)
+    
+    def __repr__(self):
+        return f"<RegistrationBucket(hour={self.hour}, open={self.open_count}, close={self.close_count})>"
+
+
+class RegistrationSample(Base):
+    """
+    Registration Samples table - the classified statements themselves,
+    shown as examples by the admin status command
+    """
+    __tablename__ = 'registration_samples'
+    
+    discord_message_id = Column(String, primary_key=True)
+    signal = Column(String, nullable=False)  # "OPEN", "CLOSE"
+    author_id = Column(String, nullable=False)
+    content = Column(String, nullable=False)
+    timestamp = Column(DateTime, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f"<RegistrationSample(signal={self.signal}, content='{self.content[:30]}...')>"
+
+
+class MessageRollup(Base):
+    """
+    Message Rollups table - hourly per-channel counts, maintained by the
+    rollup compactor (models/rollups.py) for the dashboard
+    """
+    __tablename__ = 'message_rollups'
+    
+    hour = Column(DateTime, primary_key=True)  # UTC, truncated to the hour
+    channel_id = Column(String, primary_key=True)
+    guild_id = Column(String, nullable=False)
+    message_count = Column(Integer, default=0, nullable=False)
+    member_count = Column(Integer, default=0, nullable=False)  # is_bot = False
+    ai_count = Column(Integer, default=0, nullable=False)  # is_ai_response = True
+    ai_length_sum = Column(Integer, default=0, nullable=False)  # total AI reply length
+    
+    def __repr__(self):
+        return f"<MessageRollup(hour={self.hour}, channel={self.channel_id}, messages={self.message_count})>"
+
+
+class ChannelRollup(Base):
+    """
+    Channel Rollups table - all-time per-channel totals (sum of the
+    hourly rollups), so dashboard totals read one row per channel
+    """
+    __tablename__ = 'channel_rollups'
+    
+    channel_id = Column(String, primary_key=True)
+    guild_id = Column(String, nullable=False)
+    message_count = Column(Integer, default=0, nullable=False)
+    member_count = Column(Integer, default=0, nullable=False)
+    ai_count = Column(Integer, default=0, nullable=False)
+    ai_length_sum = Column(Integer, default=0, nullable=False)
+    
+    def __repr__(self):
+        return f"<ChannelRollup(channel={self.channel_id}, messages={self.message_count})>"
+
+
+class UserSketch(Base):
+    """
+    User Sketches table - HyperLogLog registers of distinct message
+    authors, per UTC day ("2026-10-18") and for all time ("all")
+    """
+    __tablename__ = 'user_sketches'
+    
+    period = Column(String, primary_key=True)
+    registers = Column(LargeBinary, nullable=False)
+    
+    def __repr__(self):
+        return f"<UserSketch(period={self.period})>"
+
+
+class RollupState(Base):
+    """
+    Rollup State table - high-water mark (last Message.id) of each rollup
+    """
+    __tablename__ = 'rollup_state'
+    
+    name = Column(String, primary_key=True)  # "messages"
+    last_id = Column(Integer, default=0, nullable=False)  # folded into the rollups
+    seen_id = Column(Integer, default=0, nullable=False)  # max id seen on the previous run
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f"<RollupState(name={self.name}, last_id={self.last_id})>"
+
+
 class Action(Base):
     """
     Actions table - user interactions (buttons, commands)
@@ -118,29 +275,182 @@ class Action(Base):
         return f"<Action(user={self.user_id}, type={self.action_type})>"
 
 
+def dialect_insert(engine, table):
+    """
+    Return an INSERT construct for the engine's dialect so callers can use
+    ON CONFLICT clauses (supported by both SQLite and PostgreSQL)
+    """
+    if engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
+
+def apply_sqlite_profile(dbapi_connection, connection_record=None):
+    """
+    Per-connection SQLite settings: WAL lets the dashboard read while the
+    bot writes, NORMAL sync is durable across app crashes in WAL mode, and
+    busy_timeout makes writers wait for each other instead of failing
+    """
+    from core.config import (
+        SQLITE_JOURNAL_MODE, SQLITE_SYNCHRONOUS, SQLITE_BUSY_TIMEOUT_MS,
+        SQLITE_MMAP_SIZE, SQLITE_CACHE_SIZE_KB
+    )
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={int(SQLITE_BUSY_TIMEOUT_MS)}")
+        cursor.execute(f"PRAGMA mmap_size={int(SQLITE_MMAP_SIZE)}")
+        cursor.execute(f"PRAGMA cache_size={-int(SQLITE_CACHE_SIZE_KB)}")  # negative = KiB
+        cursor.execute("PRAGMA temp_store=MEMORY")
+    finally:
+        cursor.close()
+
+
+def resolve_database_url(database_url=None):
+    """
+    The configured DATABASE_URL (or the given one) as a URL object
+    Relative SQLite paths are anchored at the project directory to avoid CWD issues
+    """
+    if database_url is None:
+        from core.config import DATABASE_URL
+        database_url = DATABASE_URL
+
+    url = make_url(database_url)
+    if url.get_backend_name() == 'sqlite' and url.database and url.database != ':memory:' \
+            and not url.database.startswith('file:') and not os.path.isabs(url.database):
+        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        url = url.set(database=os.path.join(base_dir, url.database))
+    return url
+
+
+def engine_options(url):
+    """
+    create_engine() keyword arguments for the URL's backend
+    PostgreSQL gets a bounded pool that drops dead connections and a
+    per-statement timeout; SQLite keeps SQLAlchemy's defaults
+    """
+    if url.get_backend_name() != 'postgresql':
+        return {}
+
+    from core.config import (
+        DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_STATEMENT_TIMEOUT_MS
+    )
+    return {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': True,
+        'connect_args': {'options': f'-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}'}
+    }
+
+
 # Database connection and session management
 class DatabaseManager:
     """
     Database manager for creating engine and sessions
+    Uses DATABASE_URL unless a URL is given (SQLite or PostgreSQL)
     """
-    def __init__(self, database_url=None):
-        if database_url is None:
-            # Use absolute path to avoid CWD issues
-            base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-            db_path = os.path.join(base_dir, 'bot_data_v2.db')
-            database_url = f'sqlite:///{db_path}'
-            
-        self.engine = create_engine(database_url, echo=False)
+    def __init__(self, database_url=None, tune_sqlite=True):
+        url = resolve_database_url(database_url)
+        self.engine = create_engine(url, echo=False, **engine_options(url))
+        self.is_sqlite = self.engine.dialect.name == 'sqlite'
+        if self.is_sqlite and tune_sqlite and self.engine.url.database not in (None, '', ':memory:'):
+            event.listen(self.engine, 'connect', apply_sqlite_profile)
         self.SessionLocal = sessionmaker(bind=self.engine)
+        self._executor = None
         
     def create_tables(self):
         """Create all tables"""
         Base.metadata.create_all(self.engine)
         print("✅ Database tables created successfully")
         
+    def upgrade_schema(self):
+        """
+        Apply pending alembic migrations (migrations/versions) to this
+        database; tables themselves still come from create_tables()
+        """
+        from alembic import command
+        from alembic.config import Config
+        
+        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        config = Config(os.path.join(base_dir, 'alembic.ini'))
+        config.set_main_option('script_location', os.path.join(base_dir, 'migrations'))
+        config.set_main_option('version_locations', os.path.join(base_dir, 'migrations', 'versions'))
+        # ConfigParser interpolation: a literal % must be doubled
+        url = self.engine.url.render_as_string(hide_password=False)
+        config.set_main_option('sqlalchemy.url', url.replace('%', '%%'))
+        # Leave the host application's logging alone
+        config.attributes['configure_logger'] = False
+        command.upgrade(config, 'head')
+        
     def get_session(self):
         """Get a new database session"""
         return self.SessionLocal()
+
+    @contextmanager
+    def session_scope(self):
+        """Session that commits on success, rolls back on error and always closes"""
+        session = self.get_session()
+        try:
+            yield session
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    @property
+    def executor(self):
+        """Bounded thread pool for blocking database work"""
+        if self._executor is None:
+            from core.config import DB_EXECUTOR_WORKERS
+            self._executor = ThreadPoolExecutor(
+                max_workers=DB_EXECUTOR_WORKERS,
+                thread_name_prefix='db'
+            )
+        return self._executor
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Run a blocking function in the database thread pool
+        Use this from async handlers so the event loop never waits on I/O
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+
+    async def run_in_session(self, func, *args, **kwargs):
+        """
+        Run func(session, *args) inside session_scope() in the thread pool
+        """
+        def call():
+            with self.session_scope() as session:
+                return func(session, *args, **kwargs)
+        return await self.run(call)
+
+    def maintain(self):
+        """
+        Periodic SQLite upkeep: fold the WAL back into the main file so it
+        does not grow while readers are active, and refresh planner stats
+        Returns (busy, wal_pages, checkpointed_pages), or None if not SQLite
+        """
+        if not self.is_sqlite:
+            return None
+        with self.engine.connect() as conn:
+            busy, wal_pages, checkpointed = conn.exec_driver_sql("PRAGMA wal_checkpoint(PASSIVE)").one()
+            conn.exec_driver_sql("PRAGMA optimize")
+        return busy, wal_pages, checkpointed
+
+    def shutdown(self):
+        """Stop the thread pool and release pooled connections"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self.engine.dispose()
     
     def log_action(self, user_id, action_type):
         """Log user action"""
@@ -155,6 +465,60 @@ class DatabaseManager:
         finally:
             session.close()
 
+    def bump_cache_version(self, session, name):
+        """Increment a cache version inside the caller's transaction"""
+        row = session.get(CacheVersion, name)
+        if row is None:
+            session.add(CacheVersion(name=name, version=1))
+        else:
+            row.version += 1
+            row.updated_at = datetime.utcnow()
+
+    def get_cache_version(self, session, name):
+        """Current version of a cache (0 if never bumped)"""
+        row = session.get(CacheVersion, name)
+        return row.version if row else 0
+
+    def set_service_status(self, name, state, details=None):
+        """Upsert one service_status row"""
+        with self.session_scope() as session:
+            row = session.get(ServiceStatus, name)
+            if row is None:
+                session.add(ServiceStatus(name=name, state=state, details=details))
+            else:
+                row.state = state
+                row.details = details
+                row.updated_at = datetime.utcnow()
+
+    async def log_action_async(self, user_id, action_type):
+        """Log user action without blocking the event loop"""
+        await self.run(self.log_action, user_id, action_type)
+
+    def insert_messages(self, rows, hooks=()):
+        """
+        Bulk insert message rows, skipping duplicates on discord_message_id
+        Each hook(conn, rows) runs in the same transaction, so derived
+        tables are updated exactly when the messages are written
+        Returns the number of rows actually inserted
+        """
+        if not rows:
+            return 0
+
+        stmt = dialect_insert(self.engine, Message.__table__).on_conflict_do_nothing(
+            index_elements=['discord_message_id']
+        )
+        # executemany rowcount is not reliable on every driver; count the
+        # RETURNING rows instead where the dialect supports it
+        returning = self.engine.dialect.insert_executemany_returning
+        if returning:
+            stmt = stmt.returning(Message.id)
+        with self.engine.begin() as conn:
+            result = conn.execute(stmt, rows)
+            inserted = len(result.all()) if returning else result.rowcount
+            for hook in hooks:
+                hook(conn, rows)
+        return inserted
+
     def drop_tables(self):
         """Drop all tables (use with caution!)"""
         Base.metadata.drop_all(self.engine)
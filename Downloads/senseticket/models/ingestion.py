@@ -0,0 +1,169 @@
+# models/ingestion.py
+# Write-behind message ingestion queue
+
+import asyncio
+import time
+from collections import deque
+from sqlalchemy.exc import OperationalError
+from core.config import INGEST_BATCH_SIZE, INGEST_FLUSH_INTERVAL_MS, INGEST_MAX_QUEUE, INGEST_MAX_RETRIES
+from models.database import db_manager
+
+
+class MessageIngestQueue:
+    """
+    Buffers message rows in memory and writes them in batches from a
+    background task, so the gateway loop never waits on a commit
+
+    hooks are passed to insert_messages and run in each batch's transaction
+
+    A batch that fails max_retries times in a row is written one row at a
+    time, and rows that still fail on their own are dropped, so one bad
+    row cannot stall everything queued behind it
+    """
+    def __init__(self, db=None, batch_size=INGEST_BATCH_SIZE,
+                 flush_interval_ms=INGEST_FLUSH_INTERVAL_MS, max_queue=INGEST_MAX_QUEUE,
+                 max_retries=INGEST_MAX_RETRIES, hooks=None):
+        self.db = db or db_manager
+        self.hooks = list(hooks or ())
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self._failures = 0      # consecutive failures of the batch at the head
+
+        self._buffer = deque()
+        self._wakeup = None
+        self._flush_lock = None
+        self._task = None
+        self._closing = False
+
+        # Metrics
+        self.total_enqueued = 0
+        self.total_written = 0
+        self.total_dropped = 0
+        self.total_batches = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._flush_ms_sum = 0.0
+
+    def start(self):
+        """Start the background flush task (must be called inside the event loop)"""
+        if self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._closing = False
+        self._task = asyncio.create_task(self._run(), name="message-ingest-flush")
+
+    def enqueue(self, row: dict):
+        """Queue a message row; never blocks"""
+        if len(self._buffer) >= self.max_queue:
+            # Shed the oldest row rather than grow without bound
+            self._buffer.popleft()
+            self.total_dropped += 1
+
+        self._buffer.append(row)
+        self.total_enqueued += 1
+
+        if self._wakeup is not None and len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    @property
+    def depth(self) -> int:
+        """Number of rows waiting to be written"""
+        return len(self._buffer)
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"❌ Ingest flush error: {e}")
+
+    async def flush(self):
+        """Write everything currently queued"""
+        if self._flush_lock is None:
+            return
+
+        async with self._flush_lock:
+            while self._buffer:
+                batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+                started = time.perf_counter()
+
+                try:
+                    written = await self.db.run(self.db.insert_messages, batch, self.hooks)
+                    self._failures = 0
+                except Exception as e:
+                    self._failures += 1
+                    print(f"❌ Error writing {len(batch)} queued messages: {e}")
+                    if self._failures < self.max_retries:
+                        # Put the batch back and retry on the next tick
+                        self._buffer.extendleft(reversed(batch))
+                        return
+
+                    written, unwritten = await self._write_rows(batch)
+                    self.total_written += written
+                    if unwritten:
+                        self._buffer.extendleft(reversed(unwritten))
+                        return
+                    self._failures = 0
+                    continue
+
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                self.total_written += written
+                self.total_batches += 1
+                self.last_flush_ms = elapsed_ms
+                self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+                self._flush_ms_sum += elapsed_ms
+
+    async def _write_rows(self, batch):
+        """
+        Write a batch that keeps failing one row at a time, dropping rows
+        that fail on their own. Stops at an OperationalError (database down
+        or locked), which is not the row's fault
+        Returns (rows written, rows left to retry)
+        """
+        written = 0
+        for i, row in enumerate(batch):
+            try:
+                written += await self.db.run(self.db.insert_messages, [row], self.hooks)
+            except OperationalError as e:
+                print(f"❌ Database unavailable, keeping {len(batch) - i} queued messages: {e}")
+                return written, batch[i:]
+            except Exception as e:
+                self.total_dropped += 1
+                print(f"⚠️ Dropping message {row.get('discord_message_id')} that cannot be written: {e}")
+        return written, []
+
+    async def close(self):
+        """Stop the background task and flush whatever is left"""
+        if self._task is None:
+            return
+
+        self._closing = True
+        self._wakeup.set()
+        try:
+            await self._task
+        finally:
+            self._task = None
+
+        await self.flush()
+
+    def stats(self) -> dict:
+        """Queue depth and flush latency for monitoring"""
+        return {
+            'queue_depth': self.depth,
+            'enqueued': self.total_enqueued,
+            'written': self.total_written,
+            'dropped': self.total_dropped,
+            'batches': self.total_batches,
+            'last_flush_ms': round(self.last_flush_ms, 2),
+            'avg_flush_ms': round(self._flush_ms_sum / self.total_batches, 2) if self.total_batches else 0.0,
+            'max_flush_ms': round(self.max_flush_ms, 2)
+        }
@@ -0,0 +1,259 @@
+# models/rollups.py
+# Pre-aggregated message statistics for the dashboard
+
+import hashlib
+import math
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import delete, func, insert, select
+
+from core.config import ROLLUP_BATCH_SIZE
+from models.database import (
+    db_manager, dialect_insert, Message, MessageRollup, ChannelRollup, UserSketch, RollupState
+)
+
+HLL_PRECISION = 12          # 4096 registers, about 1.6% standard error
+ALL_TIME = 'all'
+STATE_NAME = 'messages'
+
+
+class HyperLogLog:
+    """
+    Distinct-count sketch: fixed size, and two sketches merge with an
+    element-wise max, so per-day sketches union into the all-time one
+    """
+    def __init__(self, registers=None, precision=HLL_PRECISION):
+        self.p = precision
+        self.m = 1 << precision
+        if registers:
+            self.registers = np.frombuffer(registers, dtype=np.uint8).copy()
+        else:
+            self.registers = np.zeros(self.m, dtype=np.uint8)
+
+    def add(self, value):
+        h = int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), 'big')
+        index = h >> (64 - self.p)
+        rest = (h << self.p) & 0xFFFFFFFFFFFFFFFF
+        # Position of the first 1 bit in the remaining 64 - p bits
+        rank = min(64 - rest.bit_length() + 1, 64 - self.p + 1)
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self) -> int:
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        raw = alpha * self.m * self.m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int32)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * self.m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            return int(round(self.m * math.log(self.m / zeros)))
+        return int(round(raw))
+
+    def to_bytes(self) -> bytes:
+        return self.registers.tobytes()
+
+
+def _hour(timestamp: datetime) -> datetime:
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+
+def _upsert_adding(session, model, keys, values):
+    """INSERT ... ON CONFLICT DO UPDATE that adds the counters to the stored row"""
+    stmt = dialect_insert(session.get_bind(), model.__table__).values(**keys, **values)
+    session.execute(stmt.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={name: getattr(model, name) + stmt.excluded[name]
+              for name in values if name != 'guild_id'}
+    ))
+
+
+def _apply(session, rows):
+    """Fold one batch of messages into the hourly, channel and sketch rollups"""
+    hourly = {}     # (hour, channel_id) -> counters
+    authors = {}    # day -> author ids
+
+    for row in rows:
+        counters = hourly.get((_hour(row.timestamp), row.channel_id))
+        if counters is None:
+            counters = hourly[(_hour(row.timestamp), row.channel_id)] = {
+                'guild_id': row.guild_id, 'message_count': 0, 'member_count': 0,
+                'ai_count': 0, 'ai_length_sum': 0
+            }
+        counters['message_count'] += 1
+        if not row.is_bot:
+            counters['member_count'] += 1
+        if row.is_ai_response:
+            counters['ai_count'] += 1
+            counters['ai_length_sum'] += row.length or 0
+        authors.setdefault(row.timestamp.strftime('%Y-%m-%d'), set()).add(row.author_id)
+
+    channels = {}
+    for (hour, channel_id), counters in hourly.items():
+        _upsert_adding(session, MessageRollup, {'hour': hour, 'channel_id': channel_id}, counters)
+        totals = channels.setdefault(channel_id, dict.fromkeys(counters, 0))
+        for name, value in counters.items():
+            totals[name] = value if name == 'guild_id' else totals[name] + value
+    for channel_id, totals in channels.items():
+        _upsert_adding(session, ChannelRollup, {'channel_id': channel_id}, totals)
+
+    stored = {row.period: row for row in session.query(UserSketch).filter(
+        UserSketch.period.in_(list(authors) + [ALL_TIME])
+    ).all()}
+    everyone = HyperLogLog(stored[ALL_TIME].registers if ALL_TIME in stored else None)
+    for day, author_ids in authors.items():
+        sketch = HyperLogLog(stored[day].registers if day in stored else None)
+        for author_id in author_ids:
+            sketch.add(author_id)
+        everyone.merge(sketch)
+        session.merge(UserSketch(period=day, registers=sketch.to_bytes()))
+    session.merge(UserSketch(period=ALL_TIME, registers=everyone.to_bytes()))
+
+
+def compact_rollups(db=None, batch_size=ROLLUP_BATCH_SIZE) -> int:
+    """
+    Fold messages above the high-water mark into the rollups (blocking)
+    Returns the number of messages folded in
+    """
+    db = db or db_manager
+
+    # The bound is fixed once per run; every batch below pages up to it
+    with db.session_scope() as session:
+        state = session.get(RollupState, STATE_NAME)
+        if state is None:
+            state = RollupState(name=STATE_NAME, last_id=0, seen_id=0)
+            session.add(state)
+
+        latest = session.query(func.max(Message.id)).scalar() or 0
+        if db.is_sqlite:
+            # SQLite serializes writers, so every id up to the max is committed
+            upper = latest
+        else:
+            # Elsewhere a lower id may still be in an open transaction; only
+            # fold ids that were already visible on the previous run
+            upper, state.seen_id = state.seen_id, latest
+
+    folded = 0
+    while True:
+        with db.session_scope() as session:
+            state = session.get(RollupState, STATE_NAME)
+            rows = session.query(
+                Message.id,
+                Message.guild_id,
+                Message.channel_id,
+                Message.author_id,
+                Message.timestamp,
+                Message.is_bot,
+                Message.is_ai_response,
+                func.length(Message.content).label('length')
+            ).filter(
+                Message.id > state.last_id,
+                Message.id <= upper
+            ).order_by(Message.id).limit(batch_size).all()
+
+            if rows:
+                _apply(session, rows)
+                state.last_id = rows[-1].id
+                folded += len(rows)
+
+        if len(rows) < batch_size:
+            return folded
+
+
+def prune_rollups(cutoff: datetime, db=None):
+    """
+    Drop rollups for data deleted before cutoff (blocking)
+    Channel totals and the all-time sketch are rebuilt from what is left
+    """
+    db = db or db_manager
+    with db.session_scope() as session:
+        session.execute(delete(MessageRollup).where(MessageRollup.hour < _hour(cutoff)))
+        session.execute(delete(ChannelRollup))
+        session.execute(insert(ChannelRollup).from_select(
+            ['channel_id', 'guild_id', 'message_count', 'member_count', 'ai_count', 'ai_length_sum'],
+            select(
+                MessageRollup.channel_id,
+                func.max(MessageRollup.guild_id),
+                func.sum(MessageRollup.message_count),
+                func.sum(MessageRollup.member_count),
+                func.sum(MessageRollup.ai_count),
+                func.sum(MessageRollup.ai_length_sum)
+            ).group_by(MessageRollup.channel_id)
+        ))
+
+        session.execute(delete(UserSketch).where(
+            UserSketch.period != ALL_TIME,
+            UserSketch.period < cutoff.strftime('%Y-%m-%d')
+        ))
+        everyone = HyperLogLog()
+        for (registers,) in session.query(UserSketch.registers).filter(UserSketch.period != ALL_TIME):
+            everyone.merge(HyperLogLog(registers))
+        session.merge(UserSketch(period=ALL_TIME, registers=everyone.to_bytes()))
+
+
+def dashboard_stats(session, since=None, top=5) -> dict:
+    """
+    Message statistics from the rollups plus the few messages above the
+    high-water mark the compactor has not folded in yet, so the cost
+    depends on the number of channels, not on the size of messages
+    since (optional) is truncated to the hour for the *_since counts
+    """
+    state = session.get(RollupState, STATE_NAME)
+    last_id = state.last_id if state else 0
+
+    channels = {row.channel_id: [row.message_count, row.member_count, row.ai_count, row.ai_length_sum]
+                for row in session.query(ChannelRollup).all()}
+
+    if since is not None:
+        since = _hour(since)
+
+    # One primary key range read; ordering by id keeps the planner on it
+    # rather than on an index that happens to cover a GROUP BY or DISTINCT
+    tail = session.query(
+        Message.channel_id,
+        Message.author_id,
+        Message.timestamp,
+        Message.is_bot,
+        Message.is_ai_response,
+        func.length(Message.content)
+    ).filter(Message.id > last_id).order_by(Message.id)
+
+    sketch = session.get(UserSketch, ALL_TIME)
+    users = HyperLogLog(sketch.registers if sketch else None)
+    member_since = ai_since = 0
+    for channel_id, author_id, timestamp, is_bot, is_ai, length in tail:
+        totals = channels.setdefault(channel_id, [0, 0, 0, 0])
+        totals[0] += 1
+        if not is_bot:
+            totals[1] += 1
+        if is_ai:
+            totals[2] += 1
+            totals[3] += length or 0
+        users.add(author_id)
+        if since is not None and timestamp >= since:
+            member_since += 0 if is_bot else 1
+            ai_since += 1 if is_ai else 0
+
+    total_ai = sum(c[2] for c in channels.values())
+    stats = {
+        'total_messages': sum(c[0] for c in channels.values()),
+        'member_messages': sum(c[1] for c in channels.values()),
+        'ai_messages': total_ai,
+        'unique_users': users.estimate(),
+        'avg_response_length': sum(c[3] for c in channels.values()) / total_ai if total_ai else 0.0,
+        'top_channels': sorted(((channel_id, c[0]) for channel_id, c in channels.items()),
+                               key=lambda item: item[1], reverse=True)[:top]
+    }
+
+    if since is not None:
+        member_rollup, ai_rollup = session.query(
+            func.coalesce(func.sum(MessageRollup.member_count), 0),
+            func.coalesce(func.sum(MessageRollup.ai_count), 0)
+        ).filter(MessageRollup.hour >= since).one()
+        stats['member_messages_since'] = int(member_rollup) + member_since
+        stats['ai_messages_since'] = int(ai_rollup) + ai_since
+
+    return stats
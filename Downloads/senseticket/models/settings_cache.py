@@ -0,0 +1,78 @@
+# models/settings_cache.py
+# Process-local cache of ChannelSettings with version-row invalidation
+
+from models.database import db_manager, ChannelSettings
+
+CHANNEL_SETTINGS_VERSION = 'channel_settings'
+
+
+class ChannelSettingsCache:
+    """
+    Keeps every ChannelSettings row in a dict so per-message lookups never
+    touch the database. Writers (dashboard toggle, maintenance tools) bump
+    the 'channel_settings' row in cache_versions; refresh() reloads only
+    when that version has changed.
+    """
+    def __init__(self, db=None):
+        self.db = db or db_manager
+        self._settings = {}
+        self.version = None
+        self.reloads = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self.version is not None
+
+    def get(self, channel_id):
+        """
+        Return (ai_enabled, ai_mode) for a channel, or None if the channel
+        has no settings row
+        """
+        return self._settings.get(str(channel_id))
+
+    def load(self):
+        """Load all settings unconditionally (blocking)"""
+        session = self.db.get_session()
+        try:
+            version = self.db.get_cache_version(session, CHANNEL_SETTINGS_VERSION)
+            rows = session.query(
+                ChannelSettings.channel_id,
+                ChannelSettings.ai_enabled,
+                ChannelSettings.ai_mode
+            ).all()
+        finally:
+            session.close()
+
+        # Swap in a new dict so readers never see a half-built cache
+        self._settings = {row.channel_id: (row.ai_enabled, row.ai_mode) for row in rows}
+        self.version = version
+        self.reloads += 1
+
+    def refresh(self) -> bool:
+        """
+        Reload if the version row changed since the last load (blocking)
+        Returns True when a reload happened
+        """
+        if not self.loaded:
+            self.load()
+            return True
+
+        session = self.db.get_session()
+        try:
+            version = self.db.get_cache_version(session, CHANNEL_SETTINGS_VERSION)
+        finally:
+            session.close()
+
+        if version == self.version:
+            return False
+
+        self.load()
+        return True
+
+    def invalidate(self, session):
+        """Mark the cache stale from inside a writer's transaction"""
+        self.db.bump_cache_version(session, CHANNEL_SETTINGS_VERSION)
+
+
+# Singleton instance
+channel_settings_cache = ChannelSettingsCache()
@@ -0,0 +1,82 @@
+# models/ticket_registry.py
+# In-memory registry of analyzed ticket channels, backed by ticket_states
+
+from datetime import datetime
+from models.database import db_manager, TicketState
+
+
+class TicketRegistry:
+    """
+    Answers "was this ticket already analyzed?" from a dict instead of
+    scanning channel history. Rows live in ticket_states and are loaded
+    once at startup; claim() reserves a channel while its analysis is in
+    flight so concurrent messages cannot trigger a second one.
+    """
+    def __init__(self, db=None):
+        self.db = db or db_manager
+        self._analyzed = {}     # channel_id -> (analysis, analyzed_at)
+        self._pending = set()   # channel ids with an analysis in flight
+
+    def load(self):
+        """Rebuild the registry from the database (blocking)"""
+        session = self.db.get_session()
+        try:
+            rows = session.query(
+                TicketState.channel_id,
+                TicketState.analysis,
+                TicketState.analyzed_at
+            ).all()
+        finally:
+            session.close()
+
+        self._analyzed = {row.channel_id: (row.analysis, row.analyzed_at) for row in rows}
+        return len(self._analyzed)
+
+    def is_analyzed(self, channel_id) -> bool:
+        return str(channel_id) in self._analyzed
+
+    def get(self, channel_id):
+        """(analysis, analyzed_at) for a channel, or None"""
+        return self._analyzed.get(str(channel_id))
+
+    def claim(self, channel_id) -> bool:
+        """Reserve a channel for analysis; False if it is done or already in flight"""
+        channel_id = str(channel_id)
+        if channel_id in self._analyzed or channel_id in self._pending:
+            return False
+        self._pending.add(channel_id)
+        return True
+
+    def release(self, channel_id):
+        """Give up a claim (analysis failed) so a later message can retry"""
+        self._pending.discard(str(channel_id))
+
+    def record(self, channel_id, guild_id, analysis):
+        """Store a finished analysis in memory and in ticket_states (blocking)"""
+        channel_id = str(channel_id)
+        analyzed_at = datetime.utcnow()
+        with self.db.session_scope() as session:
+            session.merge(TicketState(
+                channel_id=channel_id,
+                guild_id=str(guild_id),
+                analysis=analysis,
+                analyzed_at=analyzed_at
+            ))
+        # Mark done before dropping the claim so no message slips in between
+        self._analyzed[channel_id] = (analysis, analyzed_at)
+        self._pending.discard(channel_id)
+
+    def forget(self, channel_id):
+        """Drop a deleted ticket channel from memory and the database (blocking)"""
+        channel_id = str(channel_id)
+        self._analyzed.pop(channel_id, None)
+        self._pending.discard(channel_id)
+        with self.db.session_scope() as session:
+            session.query(TicketState).filter_by(channel_id=channel_id).delete()
+
+    def __len__(self):
+        return len(self._analyzed)
+
+
+# Singleton instance
+ticket_registry = TicketRegistry()
@@ -25,6 +25,68 @@ class AdminCog(commands.Cog):
         print("🛑 Bot shutting down via command...")
         await self.bot.close()
 
+    @commands.command(name="ingeststats")
+    async def ingest_stats(self, ctx):
+        """
+        Shows message ingest queue depth and flush latency (Owner only)
+        """
+        if ctx.author.id != SPECIAL_USER_ID:
+            await ctx.reply("Kamu bukan owner aku ya~ 😋")
+            return
+
+        ingest_queue = getattr(self.bot, 'ingest_queue', None)
+        if ingest_queue is None:
+            await ctx.reply("Logging cog belum jalan~")
+            return
+
+        stats = ingest_queue.stats()
+        embed = discord.Embed(title="📝 Ingest Queue", color=0x5865F2)
+        embed.add_field(name="Queue Depth", value=str(stats['queue_depth']), inline=True)
+        embed.add_field(name="Written", value=str(stats['written']), inline=True)
+        embed.add_field(name="Dropped", value=str(stats['dropped']), inline=True)
+        embed.add_field(name="Last Flush", value=f"{stats['last_flush_ms']} ms", inline=True)
+        embed.add_field(name="Avg Flush", value=f"{stats['avg_flush_ms']} ms", inline=True)
+        embed.add_field(name="Max Flush", value=f"{stats['max_flush_ms']} ms", inline=True)
+        await ctx.reply(embed=embed)
+
+    @commands.command(name="cachestats")
+    async def cache_stats(self, ctx):
+        """
+        Shows AI response cache, coalescing, rate limit and latency stats (Owner only)
+        """
+        if ctx.author.id != SPECIAL_USER_ID:
+            await ctx.reply("Kamu bukan owner aku ya~ 😋")
+            return
+
+        from handlers.response_cache import response_cache
+        from handlers.single_flight import single_flight
+        from handlers.rate_limiter import rate_limiter
+        from handlers.gemini_handler import gemini_latency
+
+        stats = response_cache.stats()
+        flights = single_flight.stats()
+        limits = rate_limiter.stats()
+        embed = discord.Embed(title="🧠 Response Cache", color=0x5865F2)
+        embed.add_field(name="Entries", value=str(stats['size']), inline=True)
+        embed.add_field(name="Hits", value=str(stats['hits']), inline=True)
+        embed.add_field(name="Near Hits", value=str(stats['near_hits']), inline=True)
+        embed.add_field(name="Misses", value=str(stats['misses']), inline=True)
+        embed.add_field(name="Hit Rate", value=f"{stats['hit_rate'] * 100:.1f}%", inline=True)
+        embed.add_field(name="Evicted / Expired", value=f"{stats['evictions']} / {stats['expirations']}", inline=True)
+        embed.add_field(name="Upstream Calls", value=str(flights['leaders']), inline=True)
+        embed.add_field(name="Coalesced", value=str(flights['coalesced']), inline=True)
+        embed.add_field(name="In Flight", value=str(flights['in_flight']), inline=True)
+        embed.add_field(name="Requests Left", value=f"{limits['requests_left']}/min", inline=True)
+        embed.add_field(name="Busy (chat / ticket)", value=f"{limits['rejected_chat']} / {limits['rejected_ticket']}", inline=True)
+        for mode, latency in gemini_latency.items():
+            timing = latency.stats()
+            embed.add_field(
+                name=f"Gemini {mode} (TTFB / total)",
+                value=f"{timing['avg_ttfb_ms']} / {timing['avg_total_ms']} ms",
+                inline=True
+            )
+        await ctx.reply(embed=embed)
+
 async def setup(bot):
     await bot.add_cog(AdminCog(bot))
     print("  🛡️ Admin cog loaded")
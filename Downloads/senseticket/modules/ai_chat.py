@@ -2,10 +2,29 @@
 # AI Chat cog with out-of-context filtering and hard-coded rules
 
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
+import asyncio
 import random
-from models.database import db_manager, Message, AIResponse, ChannelSettings
-from core.config import JOIN_SENSE_TEXT, AI_SYSTEM_PROMPT, SPECIAL_USER_ID
+from contextlib import aclosing
+from models.database import db_manager, Message, AIResponse
+from models.settings_cache import channel_settings_cache
+from core.compute import compute_executor
+from core.config import (
+    JOIN_SENSE_TEXT, AI_SYSTEM_PROMPT, SPECIAL_USER_ID, CHANNEL_SETTINGS_POLL_SECONDS,
+    AI_STREAMING, AI_STREAM_EDIT_INTERVAL
+)
+from handlers.intent_matcher import IntentMatcher
+
+JOIN_QUESTIONS = IntentMatcher([
+    ('join', [
+        ('cara', 'gabung', 'sense'),
+        ('cara', 'join', 'sense'),
+        ('gimana', 'gabung'),
+        ('how', 'join', 'sense'),
+        ('gabung', 'sense'),
+        ('daftar', 'sense')
+    ])
+])
 
 class AIChatCog(commands.Cog):
     """
@@ -14,21 +33,36 @@ class AIChatCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         
+    async def cog_load(self):
+        # Load all channel settings once, then only poll the version row
+        await db_manager.run(channel_settings_cache.load)
+        self.refresh_channel_settings.start()
+        
+    async def cog_unload(self):
+        self.refresh_channel_settings.cancel()
+        # Persist the retrieval index (held by the compute worker) so the next start only catches up
+        import analysis
+        try:
+            await compute_executor.run(analysis.save_smart_index, timeout=30)
+        except Exception as e:
+            print(f"❌ Could not save smart index: {e}")
+        
+    @tasks.loop(seconds=CHANNEL_SETTINGS_POLL_SECONDS)
+    async def refresh_channel_settings(self):
+        """
+        Reload cached channel settings when the dashboard bumps their version
+        """
+        try:
+            if await db_manager.run(channel_settings_cache.refresh):
+                print("🔄 Channel settings reloaded")
+        except Exception as e:
+            print(f"❌ Channel settings refresh error: {e}")
+        
     def is_join_question(self, content: str) -> bool:
         """
         Check if message is asking about joining Sense
         """
-        lower = content.lower()
-        keywords = [
-            ('cara', 'gabung', 'sense'),
-            ('cara', 'join', 'sense'),
-            ('gimana', 'gabung'),
-            ('how', 'join', 'sense'),
-            ('gabung', 'sense'),
-            ('daftar', 'sense')
-        ]
-        
-        return any(all(k in lower for k in combo) for combo in keywords)
+        return JOIN_QUESTIONS.match(content.lower()) is not None
     
     def is_out_of_context(self, content: str) -> bool:
         """
@@ -59,136 +93,199 @@ class AIChatCog(commands.Cog):
         """
         Check if AI should respond to this message
         """
-        # Check channel settings
-        session = db_manager.get_session()
-        try:
-            settings = session.query(ChannelSettings).filter_by(
-                channel_id=str(message.channel.id)
-            ).first()
+        # Check channel settings (in-memory, refreshed by refresh_channel_settings)
+        settings = channel_settings_cache.get(message.channel.id)
+        
+        if settings:
+            ai_enabled, ai_mode = settings
+            if not ai_enabled or ai_mode == 'off':
+                return False
             
-            if settings:
-                if not settings.ai_enabled or settings.ai_mode == 'off':
-                    return False
-                
-                if settings.ai_mode == 'mention_only':
-                    # Only respond if mentioned
-                    is_mentioned = self.bot.user.mentioned_in(message) and not message.mention_everyone
-                    is_reply = message.reference and message.reference.resolved and message.reference.resolved.author.id == self.bot.user.id
-                    return is_mentioned or is_reply
-            else:
-                # Default: mention_only
+            if ai_mode == 'mention_only':
+                # Only respond if mentioned
                 is_mentioned = self.bot.user.mentioned_in(message) and not message.mention_everyone
                 is_reply = message.reference and message.reference.resolved and message.reference.resolved.author.id == self.bot.user.id
                 return is_mentioned or is_reply
-                
-        finally:
-            session.close()
+        else:
+            # Default: mention_only
+            is_mentioned = self.bot.user.mentioned_in(message) and not message.mention_everyone
+            is_reply = message.reference and message.reference.resolved and message.reference.resolved.author.id == self.bot.user.id
+            return is_mentioned or is_reply
         
         return False
     
+    async def _find_context(self, message: discord.Message, query: str) -> list:
+        """
+        Smart context for a query, from the retrieval index in the compute worker
+        """
+        import analysis
+        try:
+            return await compute_executor.run(
+                analysis.find_smart_context, query, limit=10, threshold=0.1,
+                guild_id=str(message.guild.id) if message.guild else None,
+                channel_id=str(message.channel.id)
+            )
+        except asyncio.TimeoutError:
+            print("⚠️ Smart context timed out, answering without context")
+            return []
+    
     async def get_ai_response(self, message: discord.Message, query: str) -> str:
         """
         Get AI response using DeepSeek API with smart context
         """
         try:
-            import analysis
             from handlers.gemini_handler import generate_response
             
-            # Get context from database
-            results = analysis.find_smart_context(query, limit=10, threshold=0.1)
+            results = await self._find_context(message, query)
             
             # Try DeepSeek API
-            response = await generate_response(query, results)
+            # Mentions with the same question in one channel share a single call
+            response = await generate_response(query, results, coalesce_scope=str(message.channel.id))
             if response:
                 return response
-                
-            # Fallback to template logic if API fails
-            print("⚠️ DeepSeek API failed, checking cache...")
             
-            # Try to find cached response
-            cached_response = analysis.find_best_cached_response(query)
-            if cached_response:
-                print(f"✅ Found cached response: {cached_response[:30]}...")
-                return f"{cached_response} 🤖"
+            return await self._fallback_response(query, results)
             
-            print("⚠️ Cache miss, using fallback templates")
+        except Exception as e:
+            print(f"AI error: {e}")
+            return random.choice([
+                "aduh error nih, coba lagi ya! 😅",
+                "wah ada masalah, sorry! coba tag lagi 🙏"
+            ])
+    
+    async def _fallback_response(self, query: str, results: list) -> str:
+        """
+        Cached or template reply when Gemini gave nothing back
+        """
+        import analysis
+        
+        # Fallback to template logic if API fails
+        print("⚠️ DeepSeek API failed, checking cache...")
+        
+        # Try to find cached response
+        try:
+            cached_response = await compute_executor.run(analysis.find_best_cached_response, query)
+        except asyncio.TimeoutError:
+            cached_response = None
+        if cached_response:
+            print(f"✅ Found cached response: {cached_response[:30]}...")
+            return f"{cached_response} 🤖"
+        
+        print("⚠️ Cache miss, using fallback templates")
+        
+        if results and len(results) > 0:
+            relevant = [r for r in results if r['content'].lower() != query.lower() and len(r['content']) > 3]
             
-            if results and len(results) > 0:
-                relevant = [r for r in results if r['content'].lower() != query.lower() and len(r['content']) > 3]
+            if relevant:
+                best = relevant[0]
+                score = best['score']
+                
+                is_question = '?' in query or any(w in query.lower() for w in ['apa', 'siapa', 'kapan', 'dimana', 'kenapa', 'gimana', 'berapa'])
+                
+                # Check keyword relevance
+                query_words = set(query.lower().split())
+                match_words = set(best['content'].lower().split())
+                has_keywords = len(query_words.intersection(match_words)) > 0
                 
-                if relevant:
-                    best = relevant[0]
-                    score = best['score']
-                    
-                    is_question = '?' in query or any(w in query.lower() for w in ['apa', 'siapa', 'kapan', 'dimana', 'kenapa', 'gimana', 'berapa'])
-                    
-                    # Check keyword relevance
-                    query_words = set(query.lower().split())
-                    match_words = set(best['content'].lower().split())
-                    has_keywords = len(query_words.intersection(match_words)) > 0
-                    
-                    if is_question:
-                        if '?' in best['content']:
+                if is_question:
+                    if '?' in best['content']:
+                        return random.choice([
+                            "hmm gw juga penasaran nih 🤔",
+                            "nah itu dia! gw juga lagi cari tau wkwk",
+                            "menarik nih, tapi gw belum nemu jawabannya juga sih 😅",
+                            "waduh kurang tau juga gw, coba tanya sepuh lain deh 😆",
+                            "wah pertanyaan bagus! tapi gw masih blank nih hehe"
+                        ])
+                    else:
+                        if score > 0.5 and has_keywords:
                             return random.choice([
-                                "hmm gw juga penasaran nih 🤔",
-                                "nah itu dia! gw juga lagi cari tau wkwk",
-                                "menarik nih, tapi gw belum nemu jawabannya juga sih 😅",
-                                "waduh kurang tau juga gw, coba tanya sepuh lain deh 😆",
-                                "wah pertanyaan bagus! tapi gw masih blank nih hehe"
+                                f"oh iya! setau gw sih {best['content']} 😊",
+                                f"{best['content']} kok! beneran deh ✨",
+                                f"yup! {best['content']} 👍",
+                                f"nah iya, {best['content']} kan? bener gak? 😄",
+                                f"kayaknya sih {best['content']} ya, cmiiw! 👀"
                             ])
-                        else:
-                            if score > 0.5 and has_keywords:
-                                return random.choice([
-                                    f"oh iya! setau gw sih {best['content']} 😊",
-                                    f"{best['content']} kok! beneran deh ✨",
-                                    f"yup! {best['content']} 👍",
-                                    f"nah iya, {best['content']} kan? bener gak? 😄",
-                                    f"kayaknya sih {best['content']} ya, cmiiw! 👀"
-                                ])
-                            elif score > 0.3 and has_keywords:
-                                return random.choice([
-                                    f"hmm {best['content']} kali ya? 🤔",
-                                    f"kayaknya {best['content']} deh, tapi gw gak yakin 100%",
-                                    f"mungkin {best['content']}? coba cek lagi deh",
-                                    f"seinget gw sih {best['content']} ya..."
-                                ])
-                            else:
-                                return random.choice([
-                                    "hmm gw belum tau nih, sorry ya! 😅",
-                                    "wah gw belum pernah denger, menarik sih! ceritain dong",
-                                    "aduh kurang paham gw, skip dulu deh wkwk 🏃‍♂️",
-                                    "kurang tau euy, mungkin yang lain tau? 🤔"
-                                ])
-                    else:
-                        if score > 0.4 and has_keywords:
+                        elif score > 0.3 and has_keywords:
                             return random.choice([
-                                f"iya! {best['content']} 💯",
-                                f"bener banget! {best['content']} 🔥",
-                                f"nah setuju! {best['content']} banget sih",
-                                f"valid no debat! {best['content']} ✨",
-                                f"asli! {best['content']} 👍"
+                                f"hmm {best['content']} kali ya? 🤔",
+                                f"kayaknya {best['content']} deh, tapi gw gak yakin 100%",
+                                f"mungkin {best['content']}? coba cek lagi deh",
+                                f"seinget gw sih {best['content']} ya..."
                             ])
                         else:
                             return random.choice([
-                                "wah menarik nih! cerita lebih lanjut dong! 😮",
-                                "oh gitu ya! baru tau gw hehe, thanks infonya! 🙏",
-                                "serius? wah gokil sih kalo gitu 😆",
-                                "mantap! lanjutin ceritanya dong, kepo nih 👀"
+                                "hmm gw belum tau nih, sorry ya! 😅",
+                                "wah gw belum pernah denger, menarik sih! ceritain dong",
+                                "aduh kurang paham gw, skip dulu deh wkwk 🏃‍♂️",
+                                "kurang tau euy, mungkin yang lain tau? 🤔"
                             ])
-            
-            return random.choice([
-                "belum ada yang bahas ini sih, tapi gw pengen tau! cerita dong! 😊",
-                "hmm belum pernah denger, tapi menarik! lanjutin dong 👀",
-                "wah topik baru nih! gw nyimak aja deh hehe 🍿",
-                "gimana tuh maksudnya? gw kurang nangkep 😅"
-            ])
-            
+                else:
+                    if score > 0.4 and has_keywords:
+                        return random.choice([
+                            f"iya! {best['content']} 💯",
+                            f"bener banget! {best['content']} 🔥",
+                            f"nah setuju! {best['content']} banget sih",
+                            f"valid no debat! {best['content']} ✨",
+                            f"asli! {best['content']} 👍"
+                        ])
+                    else:
+                        return random.choice([
+                            "wah menarik nih! cerita lebih lanjut dong! 😮",
+                            "oh gitu ya! baru tau gw hehe, thanks infonya! 🙏",
+                            "serius? wah gokil sih kalo gitu 😆",
+                            "mantap! lanjutin ceritanya dong, kepo nih 👀"
+                        ])
+        
+        return random.choice([
+            "belum ada yang bahas ini sih, tapi gw pengen tau! cerita dong! 😊",
+            "hmm belum pernah denger, tapi menarik! lanjutin dong 👀",
+            "wah topik baru nih! gw nyimak aja deh hehe 🍿",
+            "gimana tuh maksudnya? gw kurang nangkep 😅"
+        ])
+    
+    async def stream_ai_reply(self, message: discord.Message, query: str) -> discord.Message:
+        """
+        Reply with a streamed Gemini answer: post the first chunk right away,
+        then edit the message as more text arrives (at most once per
+        AI_STREAM_EDIT_INTERVAL seconds). Falls back to the cached/template
+        reply if nothing was streamed.
+        """
+        from handlers.gemini_handler import stream_response
+        
+        results = await self._find_context(message, query)
+        loop = asyncio.get_running_loop()
+        reply = None
+        text = ''
+        last_edit = 0.0
+        
+        try:
+            async with aclosing(stream_response(query, results)) as chunks:
+                async for chunk in chunks:
+                    text += chunk
+                    if reply is None:
+                        # Discord rejects an empty message, so wait for real text
+                        if not text.strip():
+                            continue
+                        reply = await message.reply(text.strip()[:2000])
+                        last_edit = loop.time()
+                    elif loop.time() - last_edit >= AI_STREAM_EDIT_INTERVAL:
+                        reply = await reply.edit(content=text.strip()[:2000])
+                        last_edit = loop.time()
         except Exception as e:
-            print(f"AI error: {e}")
-            return random.choice([
-                "aduh error nih, coba lagi ya! 😅",
-                "wah ada masalah, sorry! coba tag lagi 🙏"
-            ])
+            print(f"AI stream error: {e}")
+        
+        if reply is None:
+            try:
+                fallback = await self._fallback_response(query, results)
+            except Exception as e:
+                print(f"AI error: {e}")
+                fallback = "aduh error nih, coba lagi ya! 😅"
+            return await message.reply(fallback)
+        
+        final = text.strip()[:2000]
+        if reply.content != final:
+            reply = await reply.edit(content=final)
+        return reply
     
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message):
@@ -231,7 +328,8 @@ class AIChatCog(commands.Cog):
         
         # Check common questions (including registration status)
         from handlers.responses import check_common_question
-        is_common, common_response = check_common_question(query.lower())
+        # Registration/crowd rules hit the database, so run the check off the loop
+        is_common, common_response = await db_manager.run(check_common_question, query.lower())
         if is_common:
             await message.reply(common_response)
             return
@@ -241,50 +339,58 @@ class AIChatCog(commands.Cog):
             await message.reply("Ini maksudnya apa? Gue kurang nangkep 😅")
             return
         
-        # Get AI response
-        response_text = await self.get_ai_response(message, query)
+        # Get AI response and send it
+        if AI_STREAMING:
+            response_msg = await self.stream_ai_reply(message, query)
+        else:
+            response_text = await self.get_ai_response(message, query)
+            response_msg = await message.reply(response_text)
         
-        # Send response
-        response_msg = await message.reply(response_text)
+        # Make sure the request message has been written by the ingest queue
+        ingest_queue = getattr(self.bot, 'ingest_queue', None)
+        if ingest_queue is not None:
+            await ingest_queue.flush()
         
         # Track in database
-        session = db_manager.get_session()
         try:
-            # Get request message ID
-            request_msg = session.query(Message).filter_by(
-                discord_message_id=str(message.id)
-            ).first()
-            
-            if request_msg:
-                # Manually log the AI response message since logging cog ignores bots
-                response_msg_db = Message(
-                    discord_message_id=str(response_msg.id),
-                    guild_id=str(response_msg.guild.id),
-                    channel_id=str(response_msg.channel.id),
-                    author_id=str(response_msg.author.id),
-                    content=response_msg.content,
-                    timestamp=response_msg.created_at,
-                    is_bot=True,
-                    is_ai_response=True
-                )
-                session.add(response_msg_db)
-                session.flush() # Get ID
-                
-                # Create AI Response record
-                ai_response = AIResponse(
-                    request_message_id=request_msg.id,
-                    response_message_id=response_msg_db.id,
-                    style_tags="ceria,kepo",
-                    confidence_score=0.7
-                )
-                session.add(ai_response)
-                session.commit()
+            await db_manager.run_in_session(self._track_ai_response, message.id, {
+                'discord_message_id': str(response_msg.id),
+                'guild_id': str(response_msg.guild.id),
+                'channel_id': str(response_msg.channel.id),
+                'author_id': str(response_msg.author.id),
+                'content': response_msg.content,
+                'timestamp': response_msg.created_at.replace(tzinfo=None)
+            })
         except Exception as e:
             print(f"Error tracking AI response: {e}")
-            session.rollback()
-        finally:
-            session.close()
-
+    
+    def _track_ai_response(self, session, request_discord_id, response_fields: dict):
+        """
+        Store the bot reply and link it to the request (runs in the DB thread pool)
+        """
+        # Get request message ID
+        request_msg = session.query(Message).filter_by(
+            discord_message_id=str(request_discord_id)
+        ).first()
+        
+        if request_msg:
+            # Manually log the AI response message since logging cog ignores bots
+            response_msg_db = Message(
+                is_bot=True,
+                is_ai_response=True,
+                **response_fields
+            )
+            session.add(response_msg_db)
+            session.flush() # Get ID
+            
+            # Create AI Response record
+            ai_response = AIResponse(
+                request_message_id=request_msg.id,
+                response_message_id=response_msg_db.id,
+                style_tags="ceria,kepo",
+                confidence_score=0.7
+            )
+            session.add(ai_response)
 
 async def setup(bot):
     """
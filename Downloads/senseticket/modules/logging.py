@@ -3,9 +3,10 @@
 
 import discord
 from discord.ext import commands
-from sqlalchemy.exc import IntegrityError
-from models.database import db_manager, Message
-from datetime import datetime
+from models.database import db_manager
+from models.ingestion import MessageIngestQueue
+from handlers.registration_detector import record_registration_signals, backfill_registration_signals
+from handlers.activity_counter import activity_counter
 
 class LoggingCog(commands.Cog):
     """
@@ -13,11 +14,34 @@ class LoggingCog(commands.Cog):
     """
     def __init__(self, bot):
         self.bot = bot
+        # Registration open/close statements are counted as messages are written
+        self.ingest_queue = MessageIngestQueue(hooks=[record_registration_signals])
+        # Shared so other cogs can flush before looking up a logged message
+        bot.ingest_queue = self.ingest_queue
+
+    async def cog_load(self):
+        try:
+            found = await db_manager.run(backfill_registration_signals)
+            if found:
+                print(f"📝 Backfilled {found} registration signals")
+        except Exception as e:
+            print(f"❌ Registration signal backfill error: {e}")
+        try:
+            await db_manager.run(activity_counter.load)
+        except Exception as e:
+            print(f"❌ Activity counter warm-up error: {e}")
+        self.ingest_queue.start()
+
+    async def cog_unload(self):
+        # Flush pending rows so a shutdown never loses queued messages
+        await self.ingest_queue.close()
+        stats = self.ingest_queue.stats()
+        print(f"📝 Ingest queue flushed ({stats['written']} written, {stats['dropped']} dropped)")
         
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message):
         """
-        Log all messages to database with anti-duplicate
+        Queue all messages for logging; duplicates are skipped at insert time
         """
         # Skip if:
         # - Message from bot (unless it's AI response)
@@ -28,36 +52,19 @@ class LoggingCog(commands.Cog):
         if message.author.bot:
             return
         
-        # Get database session
-        session = db_manager.get_session()
+        activity_counter.record(message.guild.id, message.channel.id, message.created_at)
         
-        try:
-            # Create message record
-            msg_record = Message(
-                discord_message_id=str(message.id),
-                guild_id=str(message.guild.id),
-                channel_id=str(message.channel.id),
-                author_id=str(message.author.id),
-                content=message.content,
-                timestamp=message.created_at,
-                is_bot=message.author.bot,
-                is_ai_response=getattr(message, '_is_ai_response', False)
-            )
-            
-            session.add(msg_record)
-            session.commit()
-            
-        except IntegrityError:
-            # Duplicate message (discord_message_id already exists)
-            session.rollback()
-            # Silently skip - this is expected for duplicate events
-            
-        except Exception as e:
-            session.rollback()
-            print(f"❌ Error logging message {message.id}: {e}")
-            
-        finally:
-            session.close()
+        self.ingest_queue.enqueue({
+            'discord_message_id': str(message.id),
+            'guild_id': str(message.guild.id),
+            'channel_id': str(message.channel.id),
+            'author_id': str(message.author.id),
+            'content': message.content,
+            # Naive UTC like the utcnow() defaults, so both backends store the same value
+            'timestamp': message.created_at.replace(tzinfo=None),
+            'is_bot': message.author.bot,
+            'is_ai_response': getattr(message, '_is_ai_response', False)
+        })
 
 
 async def setup(bot):
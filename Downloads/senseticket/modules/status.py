@@ -1,15 +1,49 @@
+import asyncio
 import discord
 from discord.ext import commands, tasks
 from models.database import db_manager, BotStatus
+from handlers.circuit_breaker import gemini_breaker
+from handlers.activity_counter import activity_counter
+from models.rollups import compact_rollups
+from core.config import SQLITE_MAINTENANCE_SECONDS, ROLLUP_INTERVAL_SECONDS
 from datetime import datetime
 
 class Status(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self._publish_tasks = set()
+        # Push breaker transitions to the dashboard as they happen
+        gemini_breaker.on_state_change = self._on_breaker_change
         self.heartbeat.start()
+        self.rollup_compactor.start()
+        if db_manager.is_sqlite:
+            self.db_maintenance.start()
 
     def cog_unload(self):
+        gemini_breaker.on_state_change = None
         self.heartbeat.cancel()
+        self.rollup_compactor.cancel()
+        self.db_maintenance.cancel()
+
+    def _on_breaker_change(self, breaker):
+        task = asyncio.create_task(self._publish_breaker(breaker))
+        self._publish_tasks.add(task)
+        task.add_done_callback(self._publish_tasks.discard)
+
+    async def _publish_breaker(self, breaker):
+        snapshot = breaker.snapshot()
+        try:
+            await db_manager.run(db_manager.set_service_status, breaker.name, snapshot['state'], snapshot)
+        except Exception as e:
+            print(f"❌ Service status error: {e}")
+
+    async def _publish_activity(self):
+        """Messages-per-minute series for the dashboard"""
+        snapshot = activity_counter.snapshot()
+        try:
+            await db_manager.run(db_manager.set_service_status, 'chat_activity', snapshot['state'], snapshot)
+        except Exception as e:
+            print(f"❌ Activity status error: {e}")
 
     @tasks.loop(seconds=60)
     async def heartbeat(self):
@@ -17,28 +51,59 @@ class Status(commands.Cog):
         Update bot status in database every 60 seconds
         """
         try:
-            session = db_manager.get_session()
-            try:
-                status = session.query(BotStatus).first()
-                if not status:
-                    status = BotStatus(
-                        status='online',
-                        last_heartbeat=datetime.utcnow()
-                    )
-                    session.add(status)
-                else:
-                    status.status = 'online'
-                    status.last_heartbeat = datetime.utcnow()
-                
-                session.commit()
-                # print("💓 Heartbeat sent")
-            except Exception as e:
-                print(f"❌ Heartbeat error: {e}")
-            finally:
-                session.close()
+            await db_manager.run(self._write_heartbeat)
+            await self._publish_breaker(gemini_breaker)
+            await self._publish_activity()
+            # print("💓 Heartbeat sent")
         except Exception as e:
             print(f"❌ Heartbeat task error: {e}")
 
+    def _write_heartbeat(self):
+        """
+        Upsert the BotStatus row (runs in the DB thread pool)
+        """
+        session = db_manager.get_session()
+        try:
+            status = session.query(BotStatus).first()
+            if not status:
+                status = BotStatus(
+                    status='online',
+                    last_heartbeat=datetime.utcnow()
+                )
+                session.add(status)
+            else:
+                status.status = 'online'
+                status.last_heartbeat = datetime.utcnow()
+            
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            print(f"❌ Heartbeat error: {e}")
+        finally:
+            session.close()
+
+    @tasks.loop(seconds=ROLLUP_INTERVAL_SECONDS)
+    async def rollup_compactor(self):
+        """
+        Fold newly logged messages into the dashboard rollup tables
+        """
+        try:
+            await db_manager.run(compact_rollups)
+        except Exception as e:
+            print(f"❌ Rollup compaction error: {e}")
+
+    @tasks.loop(seconds=SQLITE_MAINTENANCE_SECONDS)
+    async def db_maintenance(self):
+        """
+        Checkpoint the SQLite WAL and refresh query planner statistics
+        """
+        try:
+            busy, wal_pages, checkpointed = await db_manager.run(db_manager.maintain)
+            if busy or checkpointed < wal_pages:
+                print(f"🧹 WAL checkpoint partial ({checkpointed}/{wal_pages} pages, readers active)")
+        except Exception as e:
+            print(f"❌ Database maintenance error: {e}")
+
     @heartbeat.before_loop
     async def before_heartbeat(self):
         await self.bot.wait_until_ready()
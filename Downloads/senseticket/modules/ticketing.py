@@ -5,6 +5,9 @@ import discord
 from discord.ext import commands
 from core.config import TICKET_CATEGORY_ID, TICKET_CHANNEL_PREFIX
 from handlers import views
+from handlers.ticket_batcher import TicketAnalysisBatcher
+from models.database import db_manager
+from models.ticket_registry import ticket_registry
 
 class TicketingCog(commands.Cog):
     """
@@ -12,6 +15,17 @@ class TicketingCog(commands.Cog):
     """
     def __init__(self, bot):
         self.bot = bot
+        # Tickets opened together are analyzed together
+        self.analysis_batcher = TicketAnalysisBatcher()
+        
+    async def cog_load(self):
+        # Rebuild the analyzed-ticket registry so the check never scans history
+        count = await db_manager.run(ticket_registry.load)
+        print(f"  🎫 {count} analyzed ticket(s) loaded")
+        self.analysis_batcher.start()
+        
+    async def cog_unload(self):
+        await self.analysis_batcher.close()
         
     @commands.Cog.listener()
     async def on_guild_channel_create(self, channel):
@@ -86,42 +100,59 @@ class TicketingCog(commands.Cog):
             return
             
         # Check if we already analyzed this channel (prevent spam)
-        # We can check if the bot has sent an "Analysis" embed recently
-        history = []
-        async for msg in message.channel.history(limit=10):
-            history.append(msg)
-        for msg in history:
-            if msg.author == self.bot.user and msg.embeds and "Ticket Analysis" in (msg.embeds[0].title or ""):
-                return  # Already analyzed
-        
-        # Trigger Analysis
-        from handlers.gemini_handler import analyze_ticket
+        # claim() also blocks a second analysis while this one is in flight
+        if not ticket_registry.claim(message.channel.id):
+            return  # Already analyzed
         
-        # Send "Analyzing..." placeholder
-        temp_msg = await message.channel.send("🔍 *Analyzing ticket content...*")
+        try:
+            # Send "Analyzing..." placeholder
+            temp_msg = await message.channel.send("🔍 *Analyzing ticket content...*")
         
-        analysis = await analyze_ticket(message.content)
+            # Trigger Analysis (batched with other tickets opened around the same time)
+            analysis = await self.analysis_batcher.submit(message.content)
         
-        if analysis:
-            # Create Embed
-            color_map = {
-                'High': 0xED4245,   # Red
-                'Medium': 0xFFC107, # Yellow
-                'Low': 0x57F287     # Green
-            }
-            urgency = analysis.get('urgency', 'Medium')
-            color = color_map.get(urgency, 0x5865F2)
+            if analysis:
+                try:
+                    await db_manager.run(ticket_registry.record, message.channel.id, message.guild.id, analysis)
+                except Exception as e:
+                    ticket_registry.release(message.channel.id)
+                    print(f"❌ Error saving ticket state: {e}")
             
-            embed = discord.Embed(title="🧠 Smart Ticket Analysis", color=color)
-            embed.add_field(name="📝 Summary", value=analysis.get('summary', 'N/A'), inline=False)
-            embed.add_field(name="🎭 Sentiment", value=analysis.get('sentiment', 'N/A'), inline=True)
-            embed.add_field(name="🚨 Urgency", value=urgency, inline=True)
-            embed.add_field(name="📂 Category", value=analysis.get('category', 'General'), inline=True)
-            embed.set_footer(text="Powered by Google Gemini AI")
+                # Create Embed
+                color_map = {
+                    'High': 0xED4245,   # Red
+                    'Medium': 0xFFC107, # Yellow
+                    'Low': 0x57F287     # Green
+                }
+                urgency = analysis.get('urgency', 'Medium')
+                color = color_map.get(urgency, 0x5865F2)
             
-            await temp_msg.edit(content=None, embed=embed)
-        else:
-            await temp_msg.delete()
+                embed = discord.Embed(title="🧠 Smart Ticket Analysis", color=color)
+                embed.add_field(name="📝 Summary", value=analysis.get('summary', 'N/A'), inline=False)
+                embed.add_field(name="🎭 Sentiment", value=analysis.get('sentiment', 'N/A'), inline=True)
+                embed.add_field(name="🚨 Urgency", value=urgency, inline=True)
+                embed.add_field(name="📂 Category", value=analysis.get('category', 'General'), inline=True)
+                embed.set_footer(text="Powered by Google Gemini AI")
+            
+                await temp_msg.edit(content=None, embed=embed)
+            else:
+                # Let the next message in this ticket try again
+                ticket_registry.release(message.channel.id)
+                await temp_msg.delete()
+    
+        except BaseException:
+            # A failed send/analysis (or a cancelled batch) must not hold the
+            # claim until restart; after record() this is a no-op
+            ticket_registry.release(message.channel.id)
+            raise
+    
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel):
+        """
+        Forget closed tickets so ticket_states does not grow forever
+        """
+        if ticket_registry.is_analyzed(channel.id):
+            await db_manager.run(ticket_registry.forget, channel.id)
 
 
 async def setup(bot):
@@ -0,0 +1,85 @@
+# test_activity_counter.py
+# Tests for the in-memory sliding-window activity counters
+
+from datetime import datetime, timedelta
+
+from handlers.activity_counter import ActivityCounter
+
+
+class FakeClock:
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_levels_and_window():
+    clock = FakeClock()
+    counter = ActivityCounter(window_minutes=60, clock=clock)
+
+    for _ in range(4):
+        counter.record(1, 10)
+    assert counter.level() == 'LOW'
+
+    for _ in range(10):
+        counter.record(1, 11)
+    assert counter.level() == 'MEDIUM'
+    assert counter.count(guild_id=1) == 14
+    assert counter.count(channel_id=10) == 4
+    assert counter.count(guild_id=2) == 0
+
+    for _ in range(10):
+        counter.record(2, 20)
+    assert counter.level() == 'HIGH'
+    assert counter.level(guild_id=2) == 'MEDIUM'
+
+    # 16 minutes later everything has left the 15 minute window
+    clock.now += 16 * 60
+    assert counter.level() == 'LOW'
+    assert counter.count(minutes=30) == 24
+
+
+def test_series_and_slot_reuse():
+    clock = FakeClock(60 * 1000)
+    counter = ActivityCounter(window_minutes=5, clock=clock)
+
+    counter.record(1, 10)
+    clock.now += 60
+    counter.record(1, 10)
+    counter.record(1, 10)
+    assert counter.series() == [0, 0, 0, 1, 2]
+
+    # A slot reused a full window later must not keep the old count
+    clock.now += 5 * 60
+    counter.record(1, 10)
+    assert counter.series() == [0, 0, 0, 0, 1]
+
+    # Timestamps older than the window are ignored
+    counter.record(1, 10, timestamp=clock.now - 10 * 60)
+    assert counter.count(minutes=5) == 1
+
+
+def test_load_from_database(tmp_db):
+    now = datetime.utcnow()
+    rows = [{
+        'discord_message_id': str(i),
+        'guild_id': '1',
+        'channel_id': '10',
+        'author_id': '100',
+        'content': 'halo',
+        'timestamp': now - timedelta(minutes=minutes_ago),
+        'is_bot': is_bot,
+        'is_ai_response': False
+    } for i, (minutes_ago, is_bot) in enumerate([(1, False), (2, False), (3, True), (90, False)])]
+    tmp_db.insert_messages(rows)
+
+    counter = ActivityCounter(window_minutes=60)
+    assert counter.load(tmp_db) == 2
+    assert counter.count(minutes=15, guild_id='1') == 2
+    assert counter.snapshot()['guilds']['1'][-3:-1] == [1, 1]
+
+
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__, '-q'])
@@ -0,0 +1,197 @@
+# test_circuit_breaker.py
+# Tests for the Gemini circuit breaker
+
+import asyncio
+
+from aiohttp import web
+
+import handlers.gemini_handler as gemini_handler
+from handlers.circuit_breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+from handlers.http_client import http_client
+from models.database import ServiceStatus
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_opens_on_failure_rate_and_probes_after_cooldown():
+    clock = FakeClock()
+    changes = []
+    breaker = CircuitBreaker('test', failure_rate=0.5, min_calls=4, window=60,
+                             cooldown=30, half_open_probes=1, clock=clock)
+    breaker.on_state_change = lambda b: changes.append(b.state)
+
+    breaker.record_success()
+    breaker.record_failure("HTTP 503")
+    breaker.record_success()
+    assert breaker.state == CLOSED          # under min_calls
+    breaker.record_failure("HTTP 503")
+    assert breaker.state == OPEN            # 2 of 4 failed
+
+    assert not breaker.allow()
+    clock.now += 31
+    assert breaker.allow()                  # the single probe
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_failure("HTTP 429")
+    assert breaker.state == OPEN
+
+    clock.now += 31
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert changes == [OPEN, HALF_OPEN, OPEN, HALF_OPEN, CLOSED]
+    assert breaker.snapshot()['short_circuited'] == 2
+
+
+def test_old_failures_leave_the_window():
+    clock = FakeClock()
+    breaker = CircuitBreaker('test', failure_rate=0.5, min_calls=2, window=10, clock=clock)
+    breaker.record_failure()
+    clock.now += 11
+    breaker.record_success()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()['recent_calls'] == 2
+
+
+def test_open_circuit_skips_upstream(monkeypatch):
+    hits = []
+
+    async def unavailable(request):
+        hits.append(1)
+        return web.Response(status=503, text="overloaded")
+
+    async def scenario():
+        app = web.Application()
+        app.router.add_post('/v1beta/models/{model}', unavailable)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        monkeypatch.setattr(gemini_handler, 'GEMINI_API_BASE', f'http://127.0.0.1:{port}/v1beta')
+        try:
+            return [await gemini_handler.generate_response(f"pertanyaan {i}", use_cache=False)
+                    for i in range(5)]
+        finally:
+            await http_client.close()
+            await runner.cleanup()
+
+    breaker = CircuitBreaker('gemini', failure_rate=0.5, min_calls=2, cooldown=60)
+    monkeypatch.setattr(gemini_handler, 'gemini_breaker', breaker)
+    monkeypatch.setattr(gemini_handler, 'GEMINI_API_KEY', 'test-key')
+
+    assert asyncio.run(scenario()) == [None] * 5
+    assert len(hits) == 2
+    assert breaker.state == OPEN
+    assert breaker.short_circuited == 3
+
+
+def test_cancelled_probe_is_given_back(monkeypatch):
+    released = None
+
+    async def stalled(request):
+        await released.wait()
+        return web.Response(status=200, text="{}")
+
+    clock = FakeClock()
+    breaker = CircuitBreaker('gemini', failure_rate=0.5, min_calls=1, cooldown=30,
+                             half_open_probes=1, clock=clock)
+    breaker.record_failure("HTTP 503")
+    clock.now += 31
+    monkeypatch.setattr(gemini_handler, 'gemini_breaker', breaker)
+    monkeypatch.setattr(gemini_handler, 'GEMINI_API_KEY', 'test-key')
+
+    async def consume_stream():
+        return [chunk async for chunk in gemini_handler.stream_response("halo", use_cache=False)]
+
+    async def scenario():
+        nonlocal released
+        released = asyncio.Event()
+        app = web.Application()
+        app.router.add_post('/v1beta/models/{model}', stalled)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        monkeypatch.setattr(gemini_handler, 'GEMINI_API_BASE', f'http://127.0.0.1:{port}/v1beta')
+        try:
+            for call in (lambda: gemini_handler.generate_response("halo", use_cache=False),
+                         consume_stream,
+                         lambda: gemini_handler.analyze_tickets(["akun saya error"])):
+                # The caller gives up while the half-open probe is in flight
+                task = asyncio.create_task(call())
+                await asyncio.sleep(0.2)
+                assert breaker.state == HALF_OPEN
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+                assert breaker.allow()      # the slot came back for the next probe
+                breaker.record_ignored()
+        finally:
+            released.set()
+            await http_client.close()
+            await runner.cleanup()
+
+    asyncio.run(scenario())
+    assert breaker.state == HALF_OPEN
+
+
+def test_body_error_after_200_counts_once(monkeypatch):
+    async def truncated(reader, writer):
+        # Headers promise more body than is sent, then the connection drops
+        await reader.readuntil(b"\r\n\r\n")
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                     b"Content-Length: 500\r\n\r\n{\"candidates\": [")
+        await writer.drain()
+        writer.close()
+
+    breaker = CircuitBreaker('gemini', min_calls=10)
+    monkeypatch.setattr(gemini_handler, 'gemini_breaker', breaker)
+    monkeypatch.setattr(gemini_handler, 'GEMINI_API_KEY', 'test-key')
+
+    async def consume_stream():
+        return [chunk async for chunk in gemini_handler.stream_response("halo", use_cache=False)]
+
+    async def scenario():
+        server = await asyncio.start_server(truncated, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        monkeypatch.setattr(gemini_handler, 'GEMINI_API_BASE', f'http://127.0.0.1:{port}/v1beta')
+        try:
+            reply = await gemini_handler.generate_response("halo", use_cache=False)
+            chunks = await consume_stream()
+            return reply, chunks
+        finally:
+            await http_client.close()
+            server.close()
+            await server.wait_closed()
+
+    assert asyncio.run(scenario()) == (None, [])
+    # One outcome (the 200) per call, not a success plus a failure
+    assert [ok for _, ok in breaker._outcomes] == [True, True]
+
+
+def test_service_status_upsert(tmp_db):
+    tmp_db.set_service_status('gemini', OPEN, {'last_error': 'HTTP 503'})
+    tmp_db.set_service_status('gemini', CLOSED, {'last_error': None})
+
+    session = tmp_db.get_session()
+    try:
+        rows = session.query(ServiceStatus).all()
+        assert [(r.name, r.state, r.details) for r in rows] == [('gemini', CLOSED, {'last_error': None})]
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    import pytest
+    raise SystemExit(pytest.main([__file__, '-q']))
@@ -0,0 +1,45 @@
+# test_compute.py
+# Tests for the process-pool compute executor
+
+import asyncio
+import math
+import os
+import time
+
+from core.compute import ComputeExecutor, compute_executor
+
+
+def test_runs_in_worker_process_and_times_out():
+    executor = ComputeExecutor(workers=1, timeout=5, warm_up=False)
+
+    async def scenario():
+        worker_pid = await executor.run(os.getpid)
+        root = await executor.run(math.sqrt, 16)
+
+        timed_out = False
+        try:
+            await executor.run(time.sleep, 2, timeout=0.2)
+        except asyncio.TimeoutError:
+            timed_out = True
+        return worker_pid, root, timed_out
+
+    try:
+        worker_pid, root, timed_out = asyncio.run(scenario())
+    finally:
+        executor.shutdown()
+
+    assert worker_pid != os.getpid()
+    assert root == 4.0
+    assert timed_out
+    assert executor.timeouts == 1
+
+
+def test_bot_executor_has_one_index_owner():
+    # A second worker would hold its own index and prune the first one's snapshots
+    assert compute_executor.workers == 1
+
+
+if __name__ == "__main__":
+    test_runs_in_worker_process_and_times_out()
+    test_bot_executor_has_one_index_owner()
+    print("✅ Compute executor tests passed")
@@ -0,0 +1,58 @@
+# test_db_executor.py
+# Tests for the database thread pool used by async handlers
+
+import asyncio
+import threading
+
+import pytest
+
+from models.database import Action
+
+
+def count_actions(db):
+    with db.session_scope() as session:
+        return session.query(Action).count()
+
+
+def test_run_in_session_commits_off_the_loop(tmp_db):
+    def add_action(session, user_id):
+        session.add(Action(user_id=user_id, action_type='test'))
+        return threading.current_thread()
+
+    async def scenario():
+        return threading.current_thread(), await tmp_db.run_in_session(add_action, '1')
+
+    loop_thread, worker_thread = asyncio.run(scenario())
+    assert worker_thread is not loop_thread
+    assert worker_thread.name.startswith('db')
+    assert count_actions(tmp_db) == 1
+
+
+def test_run_in_session_rolls_back_on_error(tmp_db):
+    def add_then_fail(session):
+        session.add(Action(user_id='1', action_type='test'))
+        session.flush()
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        asyncio.run(tmp_db.run_in_session(add_then_fail))
+    assert count_actions(tmp_db) == 0
+
+
+def test_shutdown_stops_the_pool(tmp_db):
+    assert asyncio.run(tmp_db.run(lambda: 42)) == 42
+    executor = tmp_db.executor
+    workers = list(executor._threads)
+    assert workers
+
+    tmp_db.shutdown()
+    assert all(not thread.is_alive() for thread in workers)
+    with pytest.raises(RuntimeError):
+        executor.submit(lambda: None)
+
+    # The pool is recreated on the next call
+    assert asyncio.run(tmp_db.run(lambda: 7)) == 7
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, '-q'])
@@ -0,0 +1,63 @@
+# test_gemini_client.py
+# Tests for the shared Gemini HTTP client against a local fake server
+
+import asyncio
+import json
+
+from aiohttp import web
+
+import handlers.gemini_handler as gemini_handler
+from handlers.http_client import http_client
+
+
+def gemini_reply(text):
+    return {'candidates': [{'content': {'parts': [{'text': text}]}}]}
+
+
+async def start_fake_gemini(connections):
+    """Local stand-in for generativelanguage.googleapis.com"""
+    async def generate(request):
+        connections.add(id(request.transport))
+        prompt = (await request.json())['contents'][0]['parts'][0]['text']
+        if prompt.startswith('Analisis'):
+            return web.json_response(gemini_reply(json.dumps({'summary': 'ok', 'urgency': 'Low'})))
+        return web.json_response(gemini_reply(' halo juga~ '))
+
+    app = web.Application()
+    app.router.add_post('/v1beta/models/{model}', generate)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f'http://127.0.0.1:{port}/v1beta'
+
+
+def test_calls_reuse_one_pooled_connection(monkeypatch):
+    connections = set()
+
+    async def scenario():
+        runner, base = await start_fake_gemini(connections)
+        monkeypatch.setattr(gemini_handler, 'GEMINI_API_BASE', base)
+        monkeypatch.setattr(gemini_handler, 'GEMINI_API_KEY', 'test-key')
+        try:
+            await http_client.start()
+            replies = [await gemini_handler.generate_response("halo", use_cache=False) for _ in range(3)]
+            analysis = await gemini_handler.analyze_ticket("akun saya kena ban")
+            return replies, analysis
+        finally:
+            await http_client.close()
+            await runner.cleanup()
+
+    created_before = http_client.sessions_created
+    replies, analysis = asyncio.run(scenario())
+
+    assert replies == ['halo juga~'] * 3
+    assert analysis == {'summary': 'ok', 'urgency': 'Low'}
+    assert http_client.sessions_created == created_before + 1
+    assert len(connections) == 1
+
+
+if __name__ == "__main__":
+    import pytest
+    raise SystemExit(pytest.main([__file__, '-q']))
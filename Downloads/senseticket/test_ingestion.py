@@ -0,0 +1,139 @@
+# test_ingestion.py
+# Tests for the write-behind message ingestion queue
+
+import asyncio
+from datetime import datetime
+
+from sqlalchemy.exc import OperationalError
+
+from models.database import Message
+from models.ingestion import MessageIngestQueue
+
+
+def make_row(discord_id, content="halo semua"):
+    return {
+        'discord_message_id': str(discord_id),
+        'guild_id': '1',
+        'channel_id': '10',
+        'author_id': '100',
+        'content': content,
+        'timestamp': datetime.utcnow(),
+        'is_bot': False,
+        'is_ai_response': False
+    }
+
+
+def test_batches_and_skips_duplicates(tmp_db):
+    async def scenario():
+        queue = MessageIngestQueue(db=tmp_db, batch_size=10, flush_interval_ms=50)
+        queue.start()
+        for i in range(25):
+            queue.enqueue(make_row(i))
+        # Same discord ids again - must be ignored, not raise
+        for i in range(5):
+            queue.enqueue(make_row(i, content="duplicate"))
+        await queue.close()
+        return queue.stats()
+
+    stats = asyncio.run(scenario())
+
+    session = tmp_db.get_session()
+    try:
+        assert session.query(Message).count() == 25
+        assert session.query(Message).filter_by(content="duplicate").count() == 0
+    finally:
+        session.close()
+
+    assert stats['queue_depth'] == 0
+    assert stats['written'] == 25
+    assert stats['batches'] >= 3
+
+
+def test_interval_flush_without_full_batch(tmp_db):
+    async def scenario():
+        queue = MessageIngestQueue(db=tmp_db, batch_size=1000, flush_interval_ms=20)
+        queue.start()
+        queue.enqueue(make_row(1))
+        await asyncio.sleep(0.2)
+        depth = queue.depth
+        await queue.close()
+        return depth
+
+    assert asyncio.run(scenario()) == 0
+
+    session = tmp_db.get_session()
+    try:
+        assert session.query(Message).count() == 1
+    finally:
+        session.close()
+
+
+def test_max_queue_sheds_oldest(tmp_db):
+    queue = MessageIngestQueue(db=tmp_db, batch_size=10, max_queue=3)
+    for i in range(5):
+        queue.enqueue(make_row(i))
+
+    assert queue.depth == 3
+    assert queue.stats()['dropped'] == 2
+
+
+def test_poison_row_does_not_stall_later_rows(tmp_db):
+    async def scenario():
+        queue = MessageIngestQueue(db=tmp_db, batch_size=10, flush_interval_ms=20, max_retries=2)
+        queue.start()
+        for i in range(10):
+            row = make_row(i)
+            if i == 3:
+                row['timestamp'] = "not a date"     # rejected by the DateTime column
+            queue.enqueue(row)
+        await asyncio.sleep(0.3)
+        for i in range(10, 15):
+            queue.enqueue(make_row(i))
+        await asyncio.sleep(0.2)
+        depth = queue.depth
+        await queue.close()
+        return depth, queue.stats()
+
+    depth, stats = asyncio.run(scenario())
+
+    assert depth == 0
+    assert stats['written'] == 14
+    assert stats['dropped'] == 1
+    session = tmp_db.get_session()
+    try:
+        assert session.query(Message).count() == 14
+    finally:
+        session.close()
+
+
+def test_outage_keeps_rows_queued(tmp_db):
+    insert = tmp_db.insert_messages
+    outage = {'calls': 0}
+
+    def flaky_insert(rows, hooks=()):
+        # The first several writes hit a locked database
+        outage['calls'] += 1
+        if outage['calls'] <= 6:
+            raise OperationalError("INSERT", {}, Exception("database is locked"))
+        return insert(rows, hooks)
+
+    tmp_db.insert_messages = flaky_insert
+
+    async def scenario():
+        queue = MessageIngestQueue(db=tmp_db, batch_size=10, flush_interval_ms=20, max_retries=2)
+        queue.start()
+        for i in range(5):
+            queue.enqueue(make_row(i))
+        await asyncio.sleep(0.4)
+        await queue.close()
+        return queue.stats()
+
+    stats = asyncio.run(scenario())
+
+    assert stats['dropped'] == 0
+    assert stats['written'] == 5
+
+
+if __name__ == "__main__":
+    import pytest
+    raise SystemExit(pytest.main([__file__, '-q']))
@@ -0,0 +1,77 @@
+# test_intent_matcher.py
+# Tests for the compiled keyword-combo intent matcher
+
+import random
+
+from handlers.intent_matcher import IntentMatcher
+from handlers.responses import COMMON_INTENT_RULES, COMMON_INTENTS, check_common_question
+from handlers.registration_detector import STATEMENT_RULES, classify_statement
+
+
+def naive_match(rules, text):
+    """Reference semantics: the old if-chain of substring tests"""
+    for intent, combos in rules:
+        for combo in combos:
+            keywords = (combo,) if isinstance(combo, str) else combo
+            if all(k in text for k in keywords):
+                return intent
+    return None
+
+
+def naive_matches(rules, text):
+    return [intent for intent, combos in rules
+            if any(all(k in text for k in ((c,) if isinstance(c, str) else c)) for c in combos)]
+
+
+def test_overlapping_keywords():
+    matcher = IntentMatcher([
+        ('short', ['rule']),
+        ('long', [('rules', 'abc')]),
+        ('nested', [('ab', 'bc')]),
+    ])
+    # 'rules' and its prefix 'rule' start at the same offset
+    assert matcher.matches('the rules') == ['short']
+    assert matcher.matches('rulesabc') == ['short', 'long', 'nested']
+    # 'ab' and 'bc' overlap inside 'abc'
+    assert matcher.matches('abc') == ['nested']
+    assert matcher.match('nothing here') is None
+
+
+def test_priority_order():
+    assert COMMON_INTENTS.match('siapa kamu') == 'identity'
+    # 'hi' is a substring of 'this': greeting wins, as in the old chain
+    assert COMMON_INTENTS.match('this is who are you') == 'greeting'
+    assert COMMON_INTENTS.match('kamu tuh apa') is None
+    assert COMMON_INTENTS.match('makasih') == 'thanks'
+    assert COMMON_INTENTS.match('aturan server') == 'rules'
+
+
+def test_matches_naive_on_random_text():
+    rng = random.Random(7)
+    for rules in (COMMON_INTENT_RULES, STATEMENT_RULES):
+        matcher = IntentMatcher(rules)
+        words = [k for _, combos in rules for c in combos
+                 for k in ((c,) if isinstance(c, str) else c)]
+        words += ['sense', 'server', 'x', 'lah', 'dong', 'ini', '']
+        for _ in range(3000):
+            text = rng.choice(['', ' ', '-']).join(rng.choice(words) for _ in range(rng.randint(0, 6)))
+            assert matcher.match(text) == naive_match(rules, text), text
+            assert matcher.matches(text) == naive_matches(rules, text), text
+
+
+def test_check_common_question_static_intents():
+    assert check_common_question('cara gabung gimana')[1].startswith('✨ **Gabung')
+    assert check_common_question('zzz') == (False, None)
+
+
+def test_classify_statement():
+    assert classify_statement('member lagi buka nih') == 'OPEN'
+    assert classify_statement('masih tutup member') == 'CLOSE'
+    assert classify_statement('lagi buka gak') is None      # negated open, no close rule
+    assert classify_statement('belum open') == 'CLOSE'      # 'belum' only negates open statements
+    assert classify_statement('lagi buka?') is None
+
+
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__, '-q'])
@@ -0,0 +1,119 @@
+# test_query_plans.py
+# EXPLAIN QUERY PLAN guards: the hot dashboard / detector queries must use
+# the composite indexes from migrations/versions/0001_query_indexes.py
+
+import re
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+
+import app as dashboard
+from handlers import registration_detector
+from handlers.activity_counter import ActivityCounter
+from utils import maintenance
+
+# WHERE or ORDER BY on a time column
+TIME_FILTERED = re.compile(r'\b(WHERE|ORDER BY)\b.*\b(timestamp|created_at)\b', re.S)
+
+
+@pytest.fixture
+def db(tmp_db, monkeypatch):
+    tmp_db.insert_messages([{
+        'discord_message_id': str(i),
+        'guild_id': '1',
+        'channel_id': '10',
+        'author_id': '100',
+        'content': 'halo',
+        'timestamp': datetime.utcnow(),
+        'is_bot': False,
+        'is_ai_response': False
+    } for i in range(10)])
+    for module in (dashboard, registration_detector, maintenance):
+        monkeypatch.setattr(module, 'db_manager', tmp_db)
+    return tmp_db
+
+
+def query_plans(db, action):
+    """Run action() and return (sql, plan) for every SELECT it executed"""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        action()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+
+    plans = []
+    with db.engine.connect() as conn:
+        for statement, parameters in statements:
+            rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+            plans.append((statement, ' | '.join(row[-1] for row in rows)))
+    return plans
+
+
+def assert_no_time_scans(plans):
+    for statement, plan in plans:
+        if TIME_FILTERED.search(statement):
+            assert 'TEMP B-TREE' not in plan, (statement, plan)
+            assert not re.search(r'SCAN (messages|ai_responses)(?! USING)', plan), (statement, plan)
+
+
+def used(plans, index):
+    return any(index in plan for _, plan in plans)
+
+
+def test_api_stats(db):
+    client = dashboard.app.test_client()
+    plans = query_plans(db, lambda: client.get('/api/discord/stats'))
+    # Served from the rollups; messages is only read above the high-water mark
+    assert used(plans, 'message_rollups')
+    for statement, plan in plans:
+        if 'messages' in plan.replace('message_rollups', ''):
+            assert 'INTEGER PRIMARY KEY (rowid>?)' in plan, (statement, plan)
+    assert_no_time_scans(plans)
+
+
+def test_newest_first_listings(db):
+    client = dashboard.app.test_client()
+    plans = query_plans(db, lambda: client.get('/api/conversations?limit=5'))
+    assert used(plans, 'ix_messages_timestamp')
+    plans += query_plans(db, lambda: client.get('/api/discord/ai/logs'))
+    assert used(plans, 'ix_ai_responses_created_at')
+    assert_no_time_scans(plans)
+
+
+def test_maintenance_stats(db):
+    plans = query_plans(db, maintenance.MaintenanceTools.get_stats)
+    assert used(plans, 'ix_messages_is_ai_response_timestamp')
+    assert_no_time_scans(plans)
+
+
+def test_member_time_range_scans(db):
+    plans = query_plans(db, lambda: registration_detector.rebuild_registration_signals(db=db))
+    plans += query_plans(db, lambda: ActivityCounter().load(db))
+    assert used(plans, 'ix_messages_is_bot_timestamp')
+    assert_no_time_scans(plans)
+
+
+def test_migration_adds_indexes_to_existing_database(db):
+    with db.engine.begin() as conn:
+        for name in ('ix_messages_is_bot_timestamp', 'ix_messages_timestamp', 'ix_ai_responses_created_at'):
+            conn.exec_driver_sql(f"DROP INDEX {name}")
+
+    db.upgrade_schema()
+    db.upgrade_schema()  # already at head: no-op
+
+    with db.engine.connect() as conn:
+        indexes = {row[0] for row in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        version = conn.exec_driver_sql("SELECT version_num FROM alembic_version").scalar()
+    assert {'ix_messages_is_bot_timestamp', 'ix_messages_timestamp', 'ix_ai_responses_created_at'} <= indexes
+    assert version == '0001_query_indexes'
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, '-q'])
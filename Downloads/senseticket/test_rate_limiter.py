@@ -0,0 +1,76 @@
+# test_rate_limiter.py
+# Tests for the shared Gemini rate limiter
+
+import asyncio
+import time
+
+from handlers.rate_limiter import RateLimiter, GeminiBusy, PRIORITY_CHAT, PRIORITY_TICKET
+
+
+async def try_acquire(limiter, priority, tokens=0):
+    try:
+        await limiter.acquire(priority, tokens)
+        return True
+    except GeminiBusy:
+        return False
+
+
+def test_request_bucket_keeps_reserve_for_tickets():
+    limiter = RateLimiter(rpm=5, tpm=100000, max_concurrency=10, reserve=0.2,
+                          chat_max_wait=0, ticket_max_wait=0)
+
+    async def scenario():
+        chats = [await try_acquire(limiter, PRIORITY_CHAT) for _ in range(5)]
+        ticket = await try_acquire(limiter, PRIORITY_TICKET)
+        return chats, ticket
+
+    started = time.perf_counter()
+    chats, ticket = asyncio.run(scenario())
+
+    assert chats == [True, True, True, True, False]
+    assert ticket
+    assert time.perf_counter() - started < 0.5  # busy is signalled, not queued
+    assert limiter.stats()['rejected_chat'] == 1
+
+
+def test_token_budget_and_concurrency_cap():
+    limiter = RateLimiter(rpm=100, tpm=1000, max_concurrency=2, reserve=0.2,
+                          chat_max_wait=0.05, ticket_max_wait=0.05)
+
+    async def scenario():
+        first = await try_acquire(limiter, PRIORITY_CHAT, tokens=500)
+        # 500 left but chat must leave 200 for tickets
+        over_budget = await try_acquire(limiter, PRIORITY_CHAT, tokens=400)
+        # Last concurrency slot belongs to tickets
+        slot_for_chat = await try_acquire(limiter, PRIORITY_CHAT, tokens=10)
+        slot_for_ticket = await try_acquire(limiter, PRIORITY_TICKET, tokens=10)
+        return first, over_budget, slot_for_chat, slot_for_ticket
+
+    assert asyncio.run(scenario()) == (True, False, False, True)
+
+
+def test_waiters_resume_when_a_slot_is_released():
+    limiter = RateLimiter(rpm=100, tpm=100000, max_concurrency=1, chat_max_wait=1, ticket_max_wait=1)
+
+    async def scenario():
+        order = []
+
+        async def call(name, priority, hold):
+            async with limiter.limit(priority):
+                order.append(name)
+                await asyncio.sleep(hold)
+
+        first = asyncio.create_task(call('ticket-1', PRIORITY_TICKET, 0.05))
+        await asyncio.sleep(0.01)
+        await asyncio.gather(first, call('ticket-2', PRIORITY_TICKET, 0))
+        return order
+
+    assert asyncio.run(scenario()) == ['ticket-1', 'ticket-2']
+    assert limiter.stats()['active'] == 0
+
+
+if __name__ == "__main__":
+    test_request_bucket_keeps_reserve_for_tickets()
+    test_token_budget_and_concurrency_cap()
+    test_waiters_resume_when_a_slot_is_released()
+    print("✅ Rate limiter tests passed")
@@ -0,0 +1,94 @@
+# test_registration_signals.py
+# Tests for the ingestion-time registration open/close counters
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from models.database import Message, RegistrationBucket
+from models.ingestion import MessageIngestQueue
+from handlers import registration_detector
+from handlers.registration_detector import record_registration_signals, rebuild_registration_signals
+
+
+def make_row(discord_id, content, timestamp=None, author_id='100'):
+    return {
+        'discord_message_id': str(discord_id),
+        'guild_id': '1',
+        'channel_id': '10',
+        'author_id': author_id,
+        'content': content,
+        'timestamp': timestamp or datetime.now(timezone.utc),
+        'is_bot': False,
+        'is_ai_response': False
+    }
+
+
+def ingest(db, rows):
+    async def scenario():
+        queue = MessageIngestQueue(db=db, batch_size=4, flush_interval_ms=20,
+                                   hooks=[record_registration_signals])
+        queue.start()
+        for row in rows:
+            queue.enqueue(row)
+        await queue.close()
+
+    asyncio.run(scenario())
+
+
+def test_counts_once_per_message(monkeypatch, tmp_db):
+    monkeypatch.setattr(registration_detector, 'db_manager', tmp_db)
+
+    rows = [make_row(i, 'member lagi buka nih') for i in range(4)]
+    rows += [make_row(10 + i, 'masih tutup member', author_id='200') for i in range(2)]
+    rows += [make_row(20 + i, 'halo semua') for i in range(5)]
+    ingest(tmp_db, rows)
+    # Re-delivered messages must not be counted twice
+    ingest(tmp_db, rows[:3])
+
+    details = registration_detector.get_registration_status_details()
+    assert details['open_count'] == 4
+    assert details['close_count'] == 2
+    assert details['status'] == 'OPEN'
+    assert len(details['open_samples']) == 3
+    assert details['close_samples'][0]['user_id'] == '200'
+    assert registration_detector.get_registration_sentiment() == 'OPEN'
+    # Below the threshold the answer stays DEFAULT
+    assert registration_detector.get_registration_sentiment(min_threshold=10) == 'DEFAULT'
+
+
+def test_window_uses_hourly_buckets(monkeypatch, tmp_db):
+    monkeypatch.setattr(registration_detector, 'db_manager', tmp_db)
+
+    old = datetime.now(timezone.utc) - timedelta(days=10)
+    ingest(tmp_db, [make_row(i, 'masih tutup member', timestamp=old) for i in range(6)]
+           + [make_row(10 + i, 'member lagi buka nih') for i in range(2)])
+
+    with tmp_db.session_scope() as session:
+        assert session.query(RegistrationBucket).count() == 2
+
+    details = registration_detector.get_registration_status_details(days=7)
+    assert (details['open_count'], details['close_count']) == (2, 0)
+    assert registration_detector.get_registration_sentiment(days=30, min_threshold=5) == 'CLOSE'
+
+
+def test_rebuild_matches_ingestion(monkeypatch, tmp_db):
+    monkeypatch.setattr(registration_detector, 'db_manager', tmp_db)
+
+    now = datetime.utcnow()
+    rows = [make_row(i, text, timestamp=now - timedelta(hours=i))
+            for i, text in enumerate(['lagi buka', 'masih tutup', 'belum open', 'kapan open?', 'oke'] * 3)]
+    tmp_db.insert_messages(rows)  # written without the hook, like history from before the counters
+
+    assert rebuild_registration_signals(days=7, db=tmp_db) == 9
+    details = registration_detector.get_registration_status_details()
+    assert (details['open_count'], details['close_count']) == (3, 6)
+
+    # Rebuilding is idempotent
+    assert rebuild_registration_signals(days=7, db=tmp_db) == 9
+    with tmp_db.session_scope() as session:
+        assert session.query(Message).count() == 15
+
+
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__, '-q'])
@@ -0,0 +1,79 @@
+# test_response_cache.py
+# Tests for the TTL + LRU response cache in front of Gemini
+
+import asyncio
+
+import handlers.gemini_handler as gemini_handler
+from handlers.http_client import http_client
+from handlers.response_cache import ResponseCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+CONTEXT = [{'content': 'event mabar jam 8 malam'}, {'content': 'roleplay di server 2'}]
+
+
+def test_exact_and_near_duplicate_hits():
+    cache = ResponseCache(max_size=10, ttl=60, similarity=0.8)
+    cache.put("Kapan event mabar dimulai?", CONTEXT, "jam 8 malam ya~")
+
+    # Case, punctuation and mentions do not matter
+    assert cache.get("<@123> kapan EVENT mabar dimulai", CONTEXT) == "jam 8 malam ya~"
+    # Near-identical wording reuses the reply
+    assert cache.get("kapan event mabar dimulai kak", CONTEXT) == "jam 8 malam ya~"
+    # Different context never matches
+    assert cache.get("kapan event mabar dimulai", [{'content': 'lain'}]) is None
+    # Unrelated question misses
+    assert cache.get("cara daftar roleplay", CONTEXT) is None
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['near_hits'], stats['misses']) == (1, 1, 2)
+    assert stats['hit_rate'] == 0.5
+
+
+def test_near_duplicates_can_be_disabled():
+    cache = ResponseCache(near_duplicates=False)
+    cache.put("kapan event mabar dimulai", CONTEXT, "jam 8")
+    assert cache.get("kapan event mabar dimulai kak", CONTEXT) is None
+    assert cache.get("kapan event mabar dimulai", CONTEXT) == "jam 8"
+
+
+def test_ttl_and_lru_eviction():
+    clock = FakeClock()
+    cache = ResponseCache(max_size=2, ttl=30, near_duplicates=False, clock=clock)
+
+    cache.put("satu", None, "1")
+    cache.put("dua", None, "2")
+    assert cache.get("satu", None) == "1"   # satu is now most recently used
+    cache.put("tiga", None, "3")            # evicts dua
+    assert cache.get("dua", None) is None
+    assert cache.get("satu", None) == "1"
+
+    clock.now += 31
+    assert cache.get("tiga", None) is None
+    assert cache.stats()['evictions'] == 1
+    assert cache.stats()['expirations'] == 1
+
+
+def test_generate_response_skips_upstream_on_hit(monkeypatch):
+    cache = ResponseCache()
+    cache.put("halo sense", None, "halo juga~")
+    monkeypatch.setattr(gemini_handler, 'response_cache', cache)
+    monkeypatch.setattr(gemini_handler, 'GEMINI_API_KEY', 'test-key')
+
+    async def no_upstream():
+        raise AssertionError("cache hit must not open a connection")
+    monkeypatch.setattr(http_client, 'session', no_upstream)
+
+    assert asyncio.run(gemini_handler.generate_response("Halo, Sense!")) == "halo juga~"
+
+
+if __name__ == "__main__":
+    import pytest
+    raise SystemExit(pytest.main([__file__, '-q']))
@@ -0,0 +1,79 @@
+# test_response_pairs.py
+# Tests for the fallback AI response-pair store in analysis.py
+
+from datetime import datetime
+
+from sqlalchemy import event
+
+from models.database import Message, AIResponse
+import analysis
+
+
+def add_pairs(db, pairs):
+    """pairs: [(request, response, feedback_score)] -> AIResponse ids"""
+    ids = []
+    with db.session_scope() as session:
+        for request, response, feedback in pairs:
+            n = session.query(Message).count()
+            request_msg = Message(discord_message_id=f'm{n}', guild_id='1', channel_id='10',
+                                  author_id='100', content=request, timestamp=datetime.utcnow())
+            response_msg = Message(discord_message_id=f'm{n + 1}', guild_id='1', channel_id='10',
+                                   author_id='bot', content=response, timestamp=datetime.utcnow(),
+                                   is_bot=True, is_ai_response=True)
+            session.add_all([request_msg, response_msg])
+            session.flush()
+            pair = AIResponse(request_message_id=request_msg.id, response_message_id=response_msg.id,
+                              feedback_score=feedback)
+            session.add(pair)
+            session.flush()
+            ids.append(pair.id)
+    return ids
+
+
+def count_queries(db):
+    statements = []
+    event.listen(db.engine, 'before_cursor_execute',
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    return statements
+
+
+def test_single_query_and_incremental_update(tmp_db):
+    add_pairs(tmp_db, [(f"pertanyaan nomor {i} tentang roblox", f"jawaban {i}", 0) for i in range(50)])
+    store = analysis.ResponsePairStore(db=tmp_db)
+
+    statements = count_queries(tmp_db)
+    assert store.update(force=True) == 50
+    # One joined SELECT for all 50 pairs (no per-row lazy loads)
+    assert len([s for s in statements if s.lstrip().upper().startswith('SELECT')]) == 1
+    assert store.search("pertanyaan nomor 7 tentang roblox") == "jawaban 7"
+
+    add_pairs(tmp_db, [("kapan open member sense", "belum tau nih, pantengin pengumuman ya", 0)])
+    assert store.update(force=True) == 1
+    assert store.last_pair_id == 51
+    assert store.search("kapan open member") == "belum tau nih, pantengin pengumuman ya"
+    assert store.search("resep nasi goreng") is None
+
+
+def test_feedback_breaks_ties_but_not_threshold(tmp_db):
+    low, high = add_pairs(tmp_db, [
+        ("cara gabung sense gimana", "jawaban biasa", -1),
+        ("cara gabung sense gimana", "jawaban favorit", 3),
+    ])
+    store = analysis.ResponsePairStore(db=tmp_db, feedback_interval=0)
+    store.update(force=True)
+    assert store.search("cara gabung sense gimana") == "jawaban favorit"
+
+    # Scores updated by reactions are picked up without re-reading the pairs
+    with tmp_db.session_scope() as session:
+        session.get(AIResponse, low).feedback_score = 5
+        session.get(AIResponse, high).feedback_score = -2
+    store.update(force=True)
+    assert store.search("cara gabung sense gimana") == "jawaban biasa"
+
+    # Feedback never lets an unrelated pair through
+    assert store.search("main game apa") is None
+
+
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__, '-q'])
@@ -0,0 +1,29 @@
+# test_settings_cache.py
+# Tests for the in-memory ChannelSettings cache
+
+from models.database import ChannelSettings
+from models.settings_cache import ChannelSettingsCache
+
+
+def test_reload_only_after_version_bump(tmp_db):
+    cache = ChannelSettingsCache(db=tmp_db)
+    cache.load()
+    assert cache.get('42') is None
+
+    # Written without invalidating: cache stays as it was
+    with tmp_db.session_scope() as session:
+        session.add(ChannelSettings(channel_id='42', guild_id='1', ai_enabled=False, ai_mode='off'))
+    assert cache.refresh() is False
+    assert cache.get(42) is None
+
+    # Dashboard-style write bumps the version row
+    with tmp_db.session_scope() as session:
+        session.get(ChannelSettings, '42').ai_mode = 'free_chat'
+        cache.invalidate(session)
+    assert cache.refresh() is True
+    assert cache.get(42) == (False, 'free_chat')
+
+
+if __name__ == "__main__":
+    import pytest
+    raise SystemExit(pytest.main([__file__, '-q']))
@@ -0,0 +1,132 @@
+# test_single_flight.py
+# Tests for request coalescing of concurrent AI queries
+
+import asyncio
+
+from handlers.single_flight import SingleFlight
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_concurrent_matching_queries_share_one_call():
+    flight = SingleFlight(window_ms=1000, similarity=0.8)
+    calls = []
+
+    async def upstream(text):
+        calls.append(text)
+        await asyncio.sleep(0.05)
+        return f"jawaban untuk {text}"
+
+    async def ask(channel, text):
+        return await flight.do(channel, text, lambda: upstream(text))
+
+    async def scenario():
+        return await asyncio.gather(
+            ask('10', "kapan event mabar dimulai?"),
+            ask('10', "Kapan event mabar dimulai"),
+            ask('10', "kapan event mabar dimulai kak"),
+            ask('20', "kapan event mabar dimulai?"),      # other channel
+            ask('10', "cara daftar roleplay gimana"),      # different question
+        )
+
+    results = asyncio.run(scenario())
+
+    assert len(calls) == 3
+    assert results[0] == results[1] == results[2]
+    assert flight.stats() == {'in_flight': 0, 'leaders': 3, 'coalesced': 2}
+
+
+def test_window_and_error_fan_out():
+    clock = FakeClock()
+    flight = SingleFlight(window_ms=500, clock=clock)
+    calls = []
+
+    async def upstream():
+        calls.append(1)
+        return "ok"
+
+    async def failing():
+        await asyncio.sleep(0.02)
+        raise RuntimeError("upstream down")
+
+    async def scenario():
+        await flight.do('10', "halo sense", upstream)
+        await flight.do('10', "halo sense", upstream)   # inside the window
+        clock.now += 1
+        await flight.do('10', "halo sense", upstream)   # window passed
+
+        outcomes = await asyncio.gather(
+            flight.do('10', "server down ya", failing),
+            flight.do('10', "server down ya", failing),
+            return_exceptions=True
+        )
+        return outcomes
+
+    outcomes = asyncio.run(scenario())
+
+    assert len(calls) == 2
+    assert all(isinstance(o, RuntimeError) for o in outcomes)
+
+
+def test_cancelled_leader_does_not_cancel_others():
+    flight = SingleFlight(window_ms=5000)
+    calls = []
+
+    async def upstream():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    async def scenario():
+        leader = asyncio.create_task(flight.do('10', "halo sense", upstream))
+        await asyncio.sleep(0)
+        followers = [asyncio.create_task(flight.do('10', "halo sense", upstream)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        results = await asyncio.gather(leader, *followers, return_exceptions=True)
+
+        # A request inside the window does not inherit the cancellation either
+        late = await flight.do('10', "halo sense", upstream)
+        return results, late
+
+    results, late = asyncio.run(scenario())
+
+    assert isinstance(results[0], asyncio.CancelledError)
+    assert results[1:] == ["ok", "ok"]
+    assert late == "ok"
+    # The followers regrouped behind one new call; the late request reused it
+    assert len(calls) == 2
+    assert flight.stats()['in_flight'] == 0
+
+
+def test_failed_flight_is_not_reused():
+    flight = SingleFlight(window_ms=5000)
+
+    async def failing():
+        raise RuntimeError("upstream down")
+
+    async def upstream():
+        return "ok"
+
+    async def scenario():
+        try:
+            await flight.do('10', "server down ya", failing)
+        except RuntimeError:
+            pass
+        return await flight.do('10', "server down ya", upstream)
+
+    assert asyncio.run(scenario()) == "ok"
+
+
+if __name__ == "__main__":
+    test_concurrent_matching_queries_share_one_call()
+    test_window_and_error_fan_out()
+    test_cancelled_leader_does_not_cancel_others()
+    test_failed_flight_is_not_reused()
+    print("✅ Single-flight tests passed")
@@ -0,0 +1,163 @@
+# test_smart_index.py
+# Tests for the incremental smart context index in analysis.py
+
+from datetime import datetime
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.preprocessing import normalize
+
+import analysis
+
+
+def add_messages(db, contents, start=0, guild_id='1', channel_id='10', is_bot=False):
+    db.insert_messages([{
+        'discord_message_id': f'{guild_id}-{channel_id}-{start + i}',
+        'guild_id': guild_id,
+        'channel_id': channel_id,
+        'author_id': str(100 + i),
+        'content': content,
+        'timestamp': datetime.utcnow(),
+        'is_bot': is_bot,
+        'is_ai_response': False
+    } for i, content in enumerate(contents)])
+
+
+def test_incremental_update_uses_high_water_mark(tmp_db):
+    add_messages(tmp_db, [
+        "kapan open member sense ya",
+        "main roblox bareng yuk nanti malam",
+        "!command ignored",
+        "ok",
+    ])
+    add_messages(tmp_db, ["bot reply should not be indexed"], start=10, is_bot=True)
+
+    index = analysis.SmartContextIndex(db=tmp_db)
+    assert index.update(force=True) == 2
+    first_mark = index.last_indexed_id
+
+    # Nothing new: no rows appended
+    assert index.update(force=True) == 0
+    assert index.last_indexed_id == first_mark
+
+    add_messages(tmp_db, ["open member weekend ini katanya"], start=20)
+    assert index.update(force=True) == 1
+    assert index.n_docs == 3
+    assert index.last_indexed_id > first_mark
+
+
+def test_search_ranks_and_dedupes(tmp_db):
+    add_messages(tmp_db, [
+        "kapan open member sense ya",
+        "kapan open member sense ya",
+        "main roblox bareng yuk nanti malam",
+        "open member cuma weekend",
+    ])
+    index = analysis.SmartContextIndex(db=tmp_db)
+    index.update(force=True)
+
+    results = index.search("kapan open member", limit=3, threshold=0.1)
+    contents = [r['content'] for r in results]
+    assert contents[0] == "kapan open member sense ya"
+    assert len(contents) == len(set(contents))
+    assert "main roblox bareng yuk nanti malam" not in contents
+    assert all(results[i]['score'] >= results[i + 1]['score'] for i in range(len(results) - 1))
+
+
+def test_snapshot_roundtrip_then_catch_up(tmp_db, tmp_path):
+    storage = str(tmp_path / 'index')
+    add_messages(tmp_db, [
+        "kapan open member sense ya",
+        "main roblox bareng yuk nanti malam",
+        "open member cuma weekend",
+    ])
+    index = analysis.SmartContextIndex(db=tmp_db, storage_dir=storage)
+    index.update(force=True)
+    expected = index.search("kapan open member", limit=3, threshold=0.1)
+    index.save()
+
+    restored = analysis.SmartContextIndex(db=tmp_db, storage_dir=storage)
+    assert restored.load() is True
+    assert restored.n_docs == 3
+    assert restored.last_indexed_id == index.last_indexed_id
+    assert restored.search("kapan open member", limit=3, threshold=0.1) == expected
+
+    # Only rows above the stored high-water mark are fetched after load
+    add_messages(tmp_db, ["open member lagi buka sekarang"], start=50)
+    assert restored.update(force=True) == 1
+    assert restored.n_docs == 4
+
+
+def test_incompatible_snapshot_is_ignored(tmp_db, tmp_path):
+    storage = str(tmp_path / 'index')
+    add_messages(tmp_db, ["kapan open member sense ya"])
+    index = analysis.SmartContextIndex(db=tmp_db, storage_dir=storage, n_features=2 ** 18)
+    index.update(force=True)
+    index.save()
+
+    other = analysis.SmartContextIndex(db=tmp_db, storage_dir=storage)
+    assert other.load() is False
+    assert other.n_docs == 0
+
+
+def test_top_k_matches_full_sort():
+    matrix = normalize(sp.random(500, 64, density=0.1, format='csr', random_state=1, dtype=np.float32))
+    query = normalize(sp.random(1, 64, density=0.2, format='csr', random_state=2, dtype=np.float32))
+
+    rows, scores = analysis.top_k_scores(matrix, query, k=5, threshold=0.05)
+
+    dense = (matrix @ query.T).toarray().ravel()
+    expected = np.sort(dense[dense >= 0.05])[::-1][:5]
+    assert np.allclose(scores, expected)
+    assert np.allclose(dense[rows], scores)
+    assert analysis.top_k_scores(matrix, query, k=5, threshold=2.0)[0].size == 0
+
+
+def test_posting_search_matches_exhaustive_scoring():
+    # Dense-ish and very sparse corpora exercise both candidate paths
+    for n_terms, density in [(300, 0.02), (5000, 0.002)]:
+        matrix = normalize(sp.random(2000, n_terms, density=density, format='csr',
+                                     random_state=3, dtype=np.float32))
+        # Two segments, as after an incremental append
+        postings = analysis.PostingIndex.from_matrix(matrix[:1500]).appended(1500, matrix[1500:])
+
+        for seed in range(20):
+            query = normalize(sp.random(1, n_terms, density=density * 1.5, format='csr',
+                                        random_state=100 + seed, dtype=np.float32))
+            _, expected_scores = analysis.top_k_scores(matrix, query, k=8, threshold=0.05)
+            rows, scores = postings.search(query, k=8, threshold=0.05)
+            assert np.allclose(scores, expected_scores, atol=1e-5)
+            dense = (matrix @ query.T).toarray().ravel()
+            assert np.allclose(dense[rows], scores, atol=1e-5)
+
+
+def test_scoped_search_falls_back_to_wider_scopes(tmp_db):
+    add_messages(tmp_db, ["kapan open member sense ya"], guild_id='1', channel_id='10')
+    add_messages(tmp_db, ["open member weekend ini"], start=5, guild_id='1', channel_id='11')
+    add_messages(tmp_db, ["open member di server lain"], start=9, guild_id='2', channel_id='20')
+    scoped = analysis.ScopedContextIndex(db=tmp_db)
+
+    channel_only = scoped.search("open member", limit=5, threshold=0.05,
+                                 guild_id='1', channel_id='10', min_results=1)
+    assert [r['content'] for r in channel_only] == ["kapan open member sense ya"]
+
+    guild_wide = scoped.search("open member", limit=5, threshold=0.05,
+                               guild_id='1', channel_id='10', min_results=2)
+    assert {r['channel_id'] for r in guild_wide} == {'10', '11'}
+
+    everything = scoped.search("open member", limit=5, threshold=0.05,
+                               guild_id='1', channel_id='10', min_results=3)
+    assert {r['channel_id'] for r in everything} == {'10', '11', '20'}
+    # Narrow-scope hits stay first
+    assert everything[0]['channel_id'] == '10'
+
+    # Partitions keep independent high-water marks
+    assert set(scoped.partitions) == {'1', '2'}
+    add_messages(tmp_db, ["open member guild dua lagi"], start=30, guild_id='2', channel_id='20')
+    assert scoped.partitions['1'].update(force=True) == 0
+    assert scoped.partitions['2'].update(force=True) == 1
+
+
+if __name__ == "__main__":
+    import pytest
+    raise SystemExit(pytest.main([__file__, '-q']))
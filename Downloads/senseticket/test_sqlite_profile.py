@@ -0,0 +1,57 @@
+# test_sqlite_profile.py
+# Tests for the SQLite connection profile and maintenance in DatabaseManager
+
+from datetime import datetime
+
+from models.database import DatabaseManager, Message
+
+
+def pragma(db, name):
+    with db.engine.connect() as conn:
+        return conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+
+
+def test_profile_applied_on_connect(tmp_db, tmp_path):
+    assert pragma(tmp_db, 'journal_mode') == 'wal'
+    assert pragma(tmp_db, 'synchronous') == 1      # NORMAL
+    assert pragma(tmp_db, 'busy_timeout') == 5000
+    assert pragma(tmp_db, 'temp_store') == 2       # MEMORY
+    assert pragma(tmp_db, 'cache_size') < 0
+
+    untuned = DatabaseManager(f"sqlite:///{tmp_path / 'untuned.db'}", tune_sqlite=False)
+    assert pragma(untuned, 'journal_mode') == 'delete'
+
+
+def test_reader_not_blocked_by_open_write(tmp_db):
+    tmp_db.insert_messages([{
+        'discord_message_id': '1', 'guild_id': '1', 'channel_id': '10', 'author_id': '100',
+        'content': 'halo', 'timestamp': datetime.utcnow(), 'is_bot': False, 'is_ai_response': False
+    }])
+    dashboard = DatabaseManager(str(tmp_db.engine.url))
+
+    writer = tmp_db.get_session()
+    try:
+        writer.add(Message(discord_message_id='2', guild_id='1', channel_id='10',
+                           author_id='100', content='belum commit'))
+        writer.flush()  # holds the write lock
+
+        reader = dashboard.get_session()
+        try:
+            # With WAL the reader sees the last committed state immediately
+            assert reader.query(Message).count() == 1
+        finally:
+            reader.close()
+        writer.commit()
+    finally:
+        writer.close()
+
+
+def test_maintain_checkpoints_wal(tmp_db):
+    busy, wal_pages, checkpointed = tmp_db.maintain()
+    assert busy == 0
+    assert checkpointed == wal_pages
+
+
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__, '-q'])
@@ -0,0 +1,164 @@
+# test_streaming.py
+# Tests for streamed Gemini replies and progressive message edits
+
+import asyncio
+import json
+from contextlib import aclosing
+
+from aiohttp import web
+
+import handlers.gemini_handler as gemini_handler
+import modules.ai_chat as ai_chat
+from handlers.http_client import http_client
+from handlers.response_cache import ResponseCache
+
+CHUNKS = ["halo ", "juga, ", "ada yang ", "bisa kakak bantu~"]
+
+
+async def start_fake_stream(delay, chunks=CHUNKS):
+    """Local streamGenerateContent endpoint sending one SSE event per chunk"""
+    async def stream(request):
+        assert request.query['alt'] == 'sse'
+        response = web.StreamResponse(headers={'Content-Type': 'text/event-stream'})
+        await response.prepare(request)
+        for i, chunk in enumerate(chunks):
+            event = {'candidates': [{'content': {'parts': [{'text': chunk}]}}],
+                     'usageMetadata': {'totalTokenCount': 10 * (i + 1)}}
+            await response.write(f"data: {json.dumps(event)}\r\n\r\n".encode())
+            await asyncio.sleep(delay)
+        await response.write_eof()
+        return response
+
+    app = web.Application()
+    app.router.add_post('/v1beta/models/{model}', stream)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f'http://127.0.0.1:{port}/v1beta'
+
+
+def use_fake_gemini(monkeypatch, base):
+    monkeypatch.setattr(gemini_handler, 'GEMINI_API_BASE', base)
+    monkeypatch.setattr(gemini_handler, 'GEMINI_API_KEY', 'test-key')
+
+
+def test_stream_yields_chunks_and_measures_ttfb(monkeypatch):
+    cache = ResponseCache()
+    monkeypatch.setattr(gemini_handler, 'response_cache', cache)
+    latency = gemini_handler.LatencyStats()
+    monkeypatch.setitem(gemini_handler.gemini_latency, 'stream', latency)
+
+    async def scenario():
+        runner, base = await start_fake_stream(delay=0.05)
+        use_fake_gemini(monkeypatch, base)
+        try:
+            async with aclosing(gemini_handler.stream_response("halo sense")) as chunks:
+                received = [chunk async for chunk in chunks]
+            # Second ask is served whole from the response cache
+            async with aclosing(gemini_handler.stream_response("halo sense")) as chunks:
+                cached = [chunk async for chunk in chunks]
+            return received, cached
+        finally:
+            await http_client.close()
+            await runner.cleanup()
+
+    received, cached = asyncio.run(scenario())
+
+    assert received == CHUNKS
+    assert cached == [''.join(CHUNKS).strip()]
+    stats = latency.stats()
+    assert stats['calls'] == 1
+    assert stats['last_ttfb_ms'] < stats['last_total_ms']
+    assert stats['last_total_ms'] >= 150
+
+
+class FakeReply:
+    def __init__(self, content):
+        self.content = content
+        self.edits = []
+
+    async def edit(self, content):
+        self.content = content
+        self.edits.append(content)
+        return self
+
+
+class FakeChannel:
+    id = 10
+
+
+class FakeMessage:
+    channel = FakeChannel()
+    guild = None
+
+    def __init__(self):
+        self.replies = []
+
+    async def reply(self, content):
+        if not content:
+            raise ValueError("400 Bad Request: Cannot send an empty message")
+        reply = FakeReply(content)
+        self.replies.append(reply)
+        return reply
+
+
+def test_cog_posts_first_chunk_then_edits(monkeypatch):
+    monkeypatch.setattr(gemini_handler, 'response_cache', ResponseCache())
+    monkeypatch.setattr(ai_chat, 'AI_STREAM_EDIT_INTERVAL', 0.08)
+    cog = ai_chat.AIChatCog(bot=None)
+
+    async def no_context(message, query):
+        return []
+    monkeypatch.setattr(cog, '_find_context', no_context)
+
+    async def scenario():
+        runner, base = await start_fake_stream(delay=0.05)
+        use_fake_gemini(monkeypatch, base)
+        message = FakeMessage()
+        try:
+            reply = await cog.stream_ai_reply(message, "halo sense")
+            return message, reply
+        finally:
+            await http_client.close()
+            await runner.cleanup()
+
+    message, reply = asyncio.run(scenario())
+
+    assert len(message.replies) == 1
+    assert message.replies[0] is reply
+    assert reply.content == ''.join(CHUNKS).strip()
+    # Edits are throttled: fewer than one per chunk, but the final text always lands
+    assert 1 <= len(reply.edits) < len(CHUNKS)
+
+
+def test_cog_waits_for_text_before_first_reply(monkeypatch):
+    monkeypatch.setattr(gemini_handler, 'response_cache', ResponseCache())
+    cog = ai_chat.AIChatCog(bot=None)
+
+    async def no_context(message, query):
+        return []
+    monkeypatch.setattr(cog, '_find_context', no_context)
+
+    async def scenario():
+        # Streams often open with a bare newline
+        runner, base = await start_fake_stream(delay=0.01, chunks=["\n", " "] + CHUNKS)
+        use_fake_gemini(monkeypatch, base)
+        message = FakeMessage()
+        try:
+            reply = await cog.stream_ai_reply(message, "halo sense")
+            return message, reply
+        finally:
+            await http_client.close()
+            await runner.cleanup()
+
+    message, reply = asyncio.run(scenario())
+
+    assert len(message.replies) == 1
+    assert reply.content == ''.join(CHUNKS).strip()
+
+
+if __name__ == "__main__":
+    import pytest
+    raise SystemExit(pytest.main([__file__, '-q']))
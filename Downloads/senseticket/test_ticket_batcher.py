@@ -0,0 +1,91 @@
+# test_ticket_batcher.py
+# Tests for batched ticket analysis
+
+import asyncio
+import json
+import time
+
+from aiohttp import web
+
+import handlers.gemini_handler as gemini_handler
+from handlers.http_client import http_client
+from handlers.ticket_batcher import TicketAnalysisBatcher
+
+
+def test_full_batches_go_out_immediately_and_results_are_demuxed():
+    batches = []
+
+    async def fake_analyze(contents):
+        batches.append(list(contents))
+        return [{'summary': content.upper()} for content in contents]
+
+    async def scenario():
+        batcher = TicketAnalysisBatcher(analyze=fake_analyze, max_batch=4, slo_ms=5000)
+        started = time.perf_counter()
+        results = await asyncio.gather(*(batcher.submit(f"tiket {i}") for i in range(8)))
+        elapsed = time.perf_counter() - started
+        await batcher.close()
+        return results, elapsed, batcher.stats()
+
+    results, elapsed, stats = asyncio.run(scenario())
+
+    assert [r['summary'] for r in results] == [f"TIKET {i}" for i in range(8)]
+    assert [len(b) for b in batches] == [4, 4]
+    assert elapsed < 1  # full batches never wait for the SLO
+    assert stats['avg_batch_size'] == 4
+
+
+def test_partial_batch_is_sent_at_the_slo():
+    async def fake_analyze(contents):
+        return [None] * (len(contents) - 1)  # short reply
+
+    async def scenario():
+        batcher = TicketAnalysisBatcher(analyze=fake_analyze, max_batch=10, slo_ms=100)
+        started = time.perf_counter()
+        results = await asyncio.gather(batcher.submit("a"), batcher.submit("b"))
+        elapsed = time.perf_counter() - started
+        await batcher.close()
+        return results, elapsed
+
+    results, elapsed = asyncio.run(scenario())
+    assert results == [None, None]
+    assert 0.09 <= elapsed < 1
+
+
+def test_analyze_tickets_demultiplexes_by_id(monkeypatch):
+    prompts = []
+
+    async def generate(request):
+        body = await request.json()
+        prompts.append(body['contents'][0]['parts'][0]['text'])
+        assert body['generationConfig']['responseMimeType'] == 'application/json'
+        # Out of order, and ticket 2 missing
+        items = [{'id': 3, 'urgency': 'High'}, {'id': 1, 'urgency': 'Low'}]
+        return web.json_response({'candidates': [{'content': {'parts': [{'text': json.dumps(items)}]}}]})
+
+    async def scenario():
+        app = web.Application()
+        app.router.add_post('/v1beta/models/{model}', generate)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        monkeypatch.setattr(gemini_handler, 'GEMINI_API_BASE', f'http://127.0.0.1:{port}/v1beta')
+        monkeypatch.setattr(gemini_handler, 'GEMINI_API_KEY', 'test-key')
+        try:
+            return await gemini_handler.analyze_tickets(["akun kena ban", "halo", "server down"])
+        finally:
+            await http_client.close()
+            await runner.cleanup()
+
+    results = asyncio.run(scenario())
+
+    assert results == [{'urgency': 'Low'}, None, {'urgency': 'High'}]
+    assert len(prompts) == 1
+    assert "Tiket 3:\nserver down" in prompts[0]
+
+
+if __name__ == "__main__":
+    import pytest
+    raise SystemExit(pytest.main([__file__, '-q']))
@@ -0,0 +1,97 @@
+# test_ticket_registry.py
+# Tests for the analyzed-ticket registry
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import discord
+
+import modules.ticketing as ticketing
+from core.config import TICKET_CATEGORY_ID
+from models.ticket_registry import TicketRegistry
+
+
+def test_claim_record_and_reload(tmp_db):
+    registry = TicketRegistry(db=tmp_db)
+
+    assert registry.claim(111)
+    assert not registry.claim(111)          # analysis in flight
+    registry.release(111)
+    assert registry.claim(111)              # failed analysis can be retried
+
+    registry.record(111, 1, {'urgency': 'High'})
+    assert registry.is_analyzed('111')
+    assert not registry.claim(111)
+
+    # A restarted bot rebuilds the registry from ticket_states
+    restarted = TicketRegistry(db=tmp_db)
+    assert restarted.load() == 1
+    analysis, analyzed_at = restarted.get(111)
+    assert analysis == {'urgency': 'High'}
+    assert analyzed_at is not None
+    assert not restarted.claim(111)
+
+
+def test_forget_removes_closed_ticket(tmp_db):
+    registry = TicketRegistry(db=tmp_db)
+    registry.claim(222)
+    registry.record(222, 1, {'urgency': 'Low'})
+    registry.forget(222)
+
+    assert not registry.is_analyzed(222)
+    assert TicketRegistry(db=tmp_db).load() == 0
+
+
+def make_ticket_message(channel_id=333):
+    channel = MagicMock(spec=discord.TextChannel)
+    channel.id = channel_id
+    channel.category_id = TICKET_CATEGORY_ID
+    channel.name = f'ticket-{channel_id}'
+    channel.send = AsyncMock(return_value=MagicMock(edit=AsyncMock(), delete=AsyncMock()))
+    message = MagicMock()
+    message.author.bot = False
+    message.channel = channel
+    message.guild.id = 1
+    message.content = 'akun saya tidak bisa login sejak kemarin'
+    return message
+
+
+def test_failed_analysis_releases_claim(monkeypatch, tmp_db):
+    registry = TicketRegistry(db=tmp_db)
+    monkeypatch.setattr(ticketing, 'ticket_registry', registry)
+    monkeypatch.setattr(ticketing, 'db_manager', tmp_db)
+    cog = ticketing.TicketingCog(bot=None)
+    cog.analysis_batcher = MagicMock()
+
+    async def scenario():
+        # The placeholder cannot be sent (e.g. missing permissions)
+        message = make_ticket_message()
+        message.channel.send.side_effect = discord.DiscordException('Missing Permissions')
+        try:
+            await cog.on_message(message)
+        except discord.DiscordException:
+            pass
+        assert registry.claim(333)
+        registry.release(333)
+
+        # The batch is cancelled while the bot shuts down
+        cog.analysis_batcher.submit = AsyncMock(side_effect=asyncio.CancelledError)
+        try:
+            await cog.on_message(make_ticket_message())
+        except asyncio.CancelledError:
+            pass
+
+        # The next message is analyzed again
+        cog.analysis_batcher.submit = AsyncMock(return_value={'urgency': 'High', 'summary': 'login'})
+        message = make_ticket_message()
+        await cog.on_message(message)
+        return message
+
+    message = asyncio.run(scenario())
+    assert registry.is_analyzed(333)
+    message.channel.send.return_value.edit.assert_awaited_once()
+
+
+if __name__ == "__main__":
+    import pytest
+    raise SystemExit(pytest.main([__file__, '-q']))
@@ -4,6 +4,8 @@
 from models.database import db_manager, Message, AIResponse, StyleProfile, ChannelSettings
 from datetime import datetime, timedelta
 from sqlalchemy import func
+from models.settings_cache import channel_settings_cache
+from models.rollups import prune_rollups
 
 class MaintenanceTools:
     """
@@ -66,6 +68,9 @@ class MaintenanceTools:
             session.commit()
             print(f"✅ Deleted {deleted} old messages")
             
+            # Keep dashboard statistics in line with what is left
+            prune_rollups(cutoff_date, db=db_manager)
+            
             return deleted
             
         except Exception as e:
@@ -90,6 +95,7 @@ class MaintenanceTools:
                 settings.ai_enabled = True
                 settings.ai_mode = 'mention_only'
                 settings.updated_at = datetime.utcnow()
+                channel_settings_cache.invalidate(session)
                 session.commit()
                 print(f"✅ Reset settings for channel {channel_id}")
             else: